@@ -0,0 +1,132 @@
+"""Fixtures for the benchmarks.
+
+Every benchmark runs against all available backends (the file backend, SQLite
+and MongoDB via `mongomock`) and all requested scales (i.e. the numbers of
+documents in the database), see the `--scale` and `--backends` options.
+
+With `mongomock`, no unique index on `pk` is created and the documents of the
+query benchmarks are inserted directly, bypassing `commit` (see `insert`).
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import shutil
+import tempfile
+
+import pytest
+
+from blitzdb.backends.file import Backend as FileBackend
+
+from .documents import BenchmarkDirector, BenchmarkMovie, generate_movies
+
+BACKENDS = ["file", "sqlite", "mongomock"]
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("blitzdb benchmarks")
+    group.addoption(
+        "--scale",
+        default="10000",
+        help="Comma-separated numbers of documents to run the benchmarks with "
+        "(e.g. 10000,100000,1000000).",
+    )
+    group.addoption(
+        "--backends",
+        default=",".join(BACKENDS),
+        help="Comma-separated backends to run the benchmarks on "
+        "(default: %s)." % ",".join(BACKENDS),
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        scales = [int(scale) for scale in metafunc.config.getoption("scale").split(",")]
+        metafunc.parametrize("scale", scales, scope="session")
+    if "backend_name" in metafunc.fixturenames:
+        names = metafunc.config.getoption("backends").split(",")
+        for name in names:
+            if name not in BACKENDS:
+                raise pytest.UsageError("Unknown backend: %s" % name)
+        metafunc.parametrize("backend_name", names, scope="session")
+
+
+def create_backend(name, path):
+    if name == "file":
+        backend = FileBackend(path, autodiscover_classes=False)
+    elif name == "sqlite":
+        pytest.importorskip("sqlalchemy")
+        from sqlalchemy import create_engine
+        from blitzdb.backends.sql import Backend as SqlBackend
+
+        backend = SqlBackend(
+            engine=create_engine("sqlite:///:memory:"), autodiscover_classes=False
+        )
+    else:
+        mongomock = pytest.importorskip("mongomock")
+        from blitzdb.backends.mongo import Backend as MongoBackend
+
+        backend = MongoBackend(
+            mongomock.MongoClient()["blitzdb_benchmarks"], autodiscover_classes=False
+        )
+
+    backend.register(BenchmarkDirector)
+    backend.register(BenchmarkMovie)
+    if name == "sqlite":
+        backend.init_schema()
+        backend.create_schema()
+    # (mongomock does not use indexes for queries, and checking the unique
+    # index on `pk` makes its inserts quadratic, so we do not create it)
+    return backend
+
+
+def populate(backend, directors, movies):
+    for director in directors:
+        backend.save(director)
+    for movie in movies:
+        backend.save(movie)
+    backend.commit()
+
+
+def insert(backend, name, directors, movies):
+    """Inserts documents into a backend, like `populate` (which is measured
+    by the benchmarks), but as fast as possible."""
+    if name != "mongomock":
+        return populate(backend, directors, movies)
+
+    # mongomock upserts (which `commit` uses) scan the whole collection
+    for cls, documents in ((BenchmarkDirector, directors), (BenchmarkMovie, movies)):
+        collection = backend.get_collection_for_cls(cls)
+        backend.db[collection].insert_many(
+            [
+                dict(backend.serialize(document.attributes), _id=document.pk)
+                for document in documents
+            ]
+        )
+
+
+@pytest.fixture
+def empty_backend(backend_name):
+    """A backend without any documents."""
+    path = tempfile.mkdtemp()
+    try:
+        yield create_backend(backend_name, path)
+    finally:
+        shutil.rmtree(path)
+
+
+@pytest.fixture(scope="session")
+def populated_backend(backend_name, scale):
+    """A backend with `scale` movies, which is shared by all benchmarks that
+    do not change the number of documents."""
+    path = tempfile.mkdtemp()
+    try:
+        backend = create_backend(backend_name, path)
+        directors, movies = generate_movies(scale)
+        insert(backend, backend_name, directors, movies)
+        yield backend
+    finally:
+        shutil.rmtree(path)
+
+
+@pytest.fixture
+def backend(populated_backend):
+    return populated_backend
@@ -0,0 +1,66 @@
+"""Document classes and (deterministic) data for the benchmarks."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import random
+
+from blitzdb import Document
+from blitzdb.fields import (
+    CharField,
+    FloatField,
+    ForeignKeyField,
+    IntegerField,
+)
+
+GENRES = ["action", "comedy", "drama", "horror", "romance", "thriller"]
+
+
+class BenchmarkDirector(Document):
+
+    name = CharField(indexed=True)
+
+    class Meta(Document.Meta):
+        collection = "benchmark_director"
+        autoregister = False
+
+
+class BenchmarkMovie(Document):
+
+    title = CharField(indexed=True)
+    year = IntegerField(indexed=True)
+    rating = FloatField(indexed=True, nullable=True)
+    genre = CharField(indexed=True)
+    director = ForeignKeyField("BenchmarkDirector", nullable=True)
+
+    class Meta(Document.Meta):
+        collection = "benchmark_movie"
+        autoregister = False
+
+
+def generate_movies(n, seed=0, prefix=""):
+    """Generates `n` movies (with one director per 10 movies).
+
+    The data only depends on the arguments, so the results of different runs
+    (e.g. of different commits) can be compared.
+
+    :param prefix: A prefix for the primary keys of the documents.
+    """
+    rng = random.Random(seed)
+    directors = [
+        BenchmarkDirector({"pk": "%sd%d" % (prefix, i), "name": "Director %d" % i})
+        for i in range(max(n // 10, 1))
+    ]
+    movies = []
+    for i in range(n):
+        movie = {
+            "pk": "%sm%d" % (prefix, i),
+            "title": "Movie %d" % i,
+            "year": rng.randint(1950, 2020),
+            "genre": rng.choice(GENRES),
+            "tags": rng.sample(GENRES, 2),
+            "director": directors[i % len(directors)],
+        }
+        if i % 7:
+            # some movies do not have a rating, for the `$exists` queries
+            movie["rating"] = round(rng.uniform(1, 10), 1)
+        movies.append(BenchmarkMovie(movie))
+    return directors, movies
@@ -0,0 +1,85 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import random
+
+import pytest
+
+from blitzdb.queryset import QuerySet
+
+from .documents import BenchmarkMovie
+
+# the number of documents that get loaded from a query set
+PAGE_SIZE = 100
+
+# one query per operator of the file backend (see `blitzdb.backends.file.queries`)
+QUERIES = {
+    "equal": {"genre": "drama"},
+    "$regex": {"title": {"$regex": r"^Movie 1\d$"}},
+    "$exists": {"rating": {"$exists": False}},
+    "$and": {"$and": [{"genre": "drama"}, {"year": {"$gte": 2000}}]},
+    "$all": {"tags": {"$all": ["drama", "comedy"]}},
+    "$elemMatch": {"tags": {"$elemMatch": {"$in": ["drama", "comedy"]}}},
+    "$or": {"$or": [{"genre": "drama"}, {"year": {"$lt": 1960}}]},
+    "$gte": {"year": {"$gte": 2010}},
+    "$lte": {"year": {"$lte": 1960}},
+    "$gt": {"rating": {"$gt": 9.0}},
+    "$lt": {"rating": {"$lt": 2.0}},
+    "$ne": {"genre": {"$ne": "drama"}},
+    "$not": {"genre": {"$not": {"$in": ["drama", "comedy"]}}},
+    "$in": {"genre": {"$in": ["drama", "comedy"]}},
+}
+
+# operators that a backend does not support
+UNSUPPORTED = {
+    "file": ["$elemMatch"],
+    "sqlite": ["$regex", "$all", "$elemMatch"],
+    "mongomock": [],
+}
+
+
+def load_page(queryset):
+    return [document.pk for document in queryset[:PAGE_SIZE]]
+
+
+def test_get_by_pk(benchmark, backend, scale):
+    pks = ["m%d" % i for i in random.Random(0).sample(range(scale), 100)]
+
+    def get_documents():
+        for pk in pks:
+            backend.get(BenchmarkMovie, {"pk": pk})
+
+    benchmark(get_documents)
+
+
+@pytest.mark.parametrize("operator", sorted(QUERIES))
+def test_filter(benchmark, backend, backend_name, scale, operator):
+    if operator in UNSUPPORTED[backend_name]:
+        pytest.skip("%s does not support %s" % (backend_name, operator))
+
+    def filter_documents():
+        queryset = backend.filter(BenchmarkMovie, QUERIES[operator])
+        return len(queryset), load_page(queryset)
+
+    count, pks = benchmark(filter_documents)
+    assert count >= len(pks)
+
+
+@pytest.mark.parametrize("order", [QuerySet.ASCENDING, QuerySet.DESCENDING])
+def test_sort(benchmark, backend, scale, order):
+    def sort_documents():
+        queryset = backend.filter(BenchmarkMovie, {}).sort("year", order)
+        return load_page(queryset)
+
+    assert len(benchmark(sort_documents)) == min(PAGE_SIZE, scale)
+
+
+def test_related_documents(benchmark, backend, backend_name, scale):
+    # only the SQL backend can include related documents in a query, the
+    # other backends load them lazily
+    kwargs = {"include": ("director",)} if backend_name == "sqlite" else {}
+
+    def load_directors():
+        queryset = backend.filter(BenchmarkMovie, {"genre": "drama"}, **kwargs)
+        return [movie.director.name for movie in queryset[:PAGE_SIZE]]
+
+    benchmark(load_directors)
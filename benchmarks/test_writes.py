@@ -0,0 +1,58 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import itertools
+import random
+
+from .conftest import populate
+from .documents import BenchmarkMovie, generate_movies
+
+ROUNDS = 5
+
+
+def make_setup(n):
+    counter = itertools.count()
+
+    def setup():
+        # every round saves new documents
+        i = next(counter)
+        return generate_movies(n, seed=i, prefix="r%d-" % i), {}
+
+    return setup
+
+
+def test_save(benchmark, empty_backend):
+    """Saves 100 documents with one commit per document."""
+
+    def save(directors, movies):
+        for director in directors:
+            empty_backend.save(director)
+            empty_backend.commit()
+        for movie in movies:
+            empty_backend.save(movie)
+            empty_backend.commit()
+
+    benchmark.pedantic(save, setup=make_setup(100), rounds=ROUNDS)
+
+
+def test_bulk_save(benchmark, empty_backend):
+    """Saves 1000 documents with a single commit."""
+
+    def bulk_save(directors, movies):
+        populate(empty_backend, directors, movies)
+
+    benchmark.pedantic(bulk_save, setup=make_setup(1000), rounds=ROUNDS)
+
+
+def test_update(benchmark, backend, scale):
+    """Updates a field of 100 documents, with a single commit."""
+    pks = ["m%d" % i for i in random.Random(0).sample(range(scale), 100)]
+    movies = [backend.get(BenchmarkMovie, {"pk": pk}) for pk in pks]
+    ratings = itertools.cycle(range(1, 11))
+
+    def update():
+        rating = float(next(ratings))
+        for movie in movies:
+            backend.update(movie, {"rating": rating})
+        backend.commit()
+
+    benchmark(update)
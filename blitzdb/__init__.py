@@ -1,7 +1,7 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 from .backends.file import Backend as FileBackend
-from .document import Document
+from .document import Document, Record
 
 try:
     from .backends.mongo import Backend as MongoBackend
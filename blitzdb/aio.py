@@ -0,0 +1,299 @@
+"""Asyncio facade for blitzdb backends.
+
+The backends themselves are synchronous. An :py:class:`AsyncBackend` runs
+the operations of the backend it wraps on a small pool of worker threads
+that belongs to the facade, so awaiting a query never blocks the event loop
+and in-flight queries do not cost one thread each.
+
+How many calls run at the same time depends on the backend. The SQL backend
+keeps its connection and transactions per thread, so it gets several
+workers (`max_workers`, by default 5, like the connection pool of
+SQLAlchemy) and queries of different tasks overlap. The file and MongoDB
+backends keep their transactions and write caches in the backend itself,
+so they get a single worker, and all their calls run one after another.
+
+Transactions are scoped to tasks: a task that enters an
+``async with backend.transaction()`` block keeps one of the workers until
+the transaction has been committed or rolled back, and all of its calls run
+on that worker (and thus on the connection of the transaction). Other
+tasks use the remaining workers, so with a single worker they wait until
+the transaction is finished. The owner of a transaction is tracked through
+a context variable, so tasks spawned from within a transaction take part in
+it.
+
+.. note::
+
+    This module requires Python 3.7 or newer.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncBackend(object):
+
+    """Wraps a (synchronous) backend and exposes its API as coroutines.
+
+    Example::
+
+        async with AsyncBackend(SqlBackend(engine=engine)) as backend:
+            async with backend.transaction():
+                await backend.save(movie)
+
+            async for movie in await backend.filter(Movie, {"year": 1979}):
+                print(movie.title)
+
+    Leaving the `async with` block (or calling :py:meth:`close`) shuts down
+    the worker threads of the facade.
+
+    Documents that are returned by the facade are regular documents. Lazy
+    documents load their attributes synchronously when they are accessed,
+    so use :py:meth:`load` (or eager loading through `include`) to load
+    them from within the event loop. Since the backend is used from other
+    threads, in-memory SQLite databases need an engine that shares its
+    connection among threads (e.g. with a `StaticPool`), and thus a single
+    worker (`max_workers=1`), since the transactions of the workers would
+    share that connection as well.
+
+    :param backend: The backend to wrap.
+    :param max_workers: The number of worker threads for backends that can be
+                        used by several threads at the same time (see
+                        :py:attr:`blitzdb.backends.base.Backend.thread_safe`).
+                        Other backends always get a single worker.
+    """
+
+    default_max_workers = 5
+
+    def __init__(self, backend, max_workers=None):
+        if max_workers is None:
+            max_workers = self.default_max_workers
+        if max_workers < 1:
+            raise AttributeError("max_workers must be at least 1!")
+        if not backend.thread_safe:
+            max_workers = 1
+
+        self.backend = backend
+        # every worker is an executor with a single thread, so that all calls
+        # of a transaction can run on the same thread
+        self._workers = [ThreadPoolExecutor(max_workers=1) for i in range(max_workers)]
+        self._idle_workers = None
+        self._transaction = contextvars.ContextVar(
+            "blitzdb_transaction_%d" % id(self), default=None
+        )
+
+    @property
+    def idle_workers(self):
+        # the queue needs to be created from within the event loop
+        if self._idle_workers is None:
+            self._idle_workers = asyncio.Queue()
+            for worker in self._workers:
+                self._idle_workers.put_nowait(worker)
+        return self._idle_workers
+
+    @property
+    def in_transaction(self):
+        """Whether the current task is inside a transaction of this backend."""
+        return self._transaction.get() is not None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback_obj):
+        await self.close()
+        return False
+
+    async def close(self):
+        """Waits for the pending calls and shuts down the worker threads. The
+        facade cannot be used afterwards (the wrapped backend can)."""
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            shutdown = functools.partial(worker.shutdown, wait=True)
+            await loop.run_in_executor(None, shutdown)
+
+    async def run(self, f, *args, **kwargs):
+        """Runs `f(*args, **kwargs)` on the worker thread of the backend and
+        returns its result.
+
+        Use this to call functions that the facade does not wrap. Within a
+        transaction, the call runs on the worker of the transaction, otherwise
+        it waits for an idle worker.
+        """
+        call = functools.partial(f, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        transaction = self._transaction.get()
+        if transaction is not None:
+            return await loop.run_in_executor(transaction.worker, call)
+
+        worker = await self.idle_workers.get()
+        try:
+            return await loop.run_in_executor(worker, call)
+        finally:
+            self.idle_workers.put_nowait(worker)
+
+    def transaction(self):
+        """Returns an asynchronous context manager that opens a transaction
+        for the current task and commits it (or rolls it back if an exception
+        occurs) when the block is left."""
+        return AsyncTransaction(self)
+
+    async def get(self, cls, query, **kwargs):
+        return await self.run(self.backend.get, cls, query, **kwargs)
+
+    async def filter(self, cls, query, **kwargs):
+        """Filters documents (see :py:meth:`blitzdb.backends.base.Backend.filter`).
+
+        :returns: An :py:class:`AsyncQuerySet` instance.
+        """
+        queryset = await self.run(self.backend.filter, cls, query, **kwargs)
+        return AsyncQuerySet(self, queryset)
+
+    async def distinct(self, cls, key, query=None, with_counts=True):
+        return await self.run(
+            self.backend.distinct, cls, key, query=query, with_counts=with_counts
+        )
+
+    async def save(self, obj, *args, **kwargs):
+        return await self.run(self.backend.save, obj, *args, **kwargs)
+
+    async def save_multiple(self, objs):
+        """Saves several documents with a single call on the worker thread."""
+
+        def save_multiple():
+            for obj in objs:
+                self.backend.save(obj)
+
+        return await self.run(save_multiple)
+
+    async def update(self, obj, *args, **kwargs):
+        return await self.run(self.backend.update, obj, *args, **kwargs)
+
+    async def delete(self, obj):
+        return await self.run(self.backend.delete, obj)
+
+    async def commit(self):
+        return await self.run(self.backend.commit)
+
+    async def rollback(self):
+        return await self.run(self.backend.rollback)
+
+    async def load(self, obj):
+        """Loads the attributes of a lazy document."""
+        return await self.run(obj.load_if_lazy)
+
+
+class AsyncTransaction(object):
+
+    """A transaction of an :py:class:`AsyncBackend`, as returned by
+    :py:meth:`AsyncBackend.transaction`.
+
+    Nested transactions of the same task are passed on to the backend, which
+    decides how to handle them.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.transaction = None
+        self.worker = None
+        self._token = None
+
+    async def __aenter__(self):
+        backend = self.backend
+        loop = asyncio.get_running_loop()
+        outer_transaction = backend._transaction.get()
+        if outer_transaction is not None:
+            self.worker = outer_transaction.worker
+            self.transaction = await loop.run_in_executor(
+                self.worker, backend.backend.begin
+            )
+            return self
+
+        self.worker = await backend.idle_workers.get()
+        try:
+            self.transaction = await loop.run_in_executor(
+                self.worker, backend.backend.begin
+            )
+        except BaseException:
+            backend.idle_workers.put_nowait(self.worker)
+            raise
+
+        self._token = backend._transaction.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback_obj):
+        backend = self.backend
+        loop = asyncio.get_running_loop()
+        if exc_type:
+            f = functools.partial(backend.backend.rollback, self.transaction)
+        else:
+            f = functools.partial(backend.backend.commit, self.transaction)
+
+        try:
+            await loop.run_in_executor(self.worker, f)
+        finally:
+            if self._token is not None:
+                backend._transaction.reset(self._token)
+                self._token = None
+                backend.idle_workers.put_nowait(self.worker)
+        return False
+
+
+class AsyncQuerySet(object):
+
+    """Wraps a query set of the backend of an :py:class:`AsyncBackend`.
+
+    Supports asynchronous iteration (``async for doc in queryset``), which
+    fetches all documents of the query set with a single call.
+    """
+
+    def __init__(self, backend, queryset):
+        self.backend = backend
+        self.queryset = queryset
+
+    async def __aiter__(self):
+        for obj in await self.as_list():
+            yield obj
+
+    async def as_list(self):
+        return await self.backend.run(self.queryset.as_list)
+
+    async def count(self):
+        return await self.backend.run(len, self.queryset)
+
+    async def get(self, i):
+        """Returns the document at position `i` of the query set."""
+        return await self.backend.run(self.queryset.__getitem__, i)
+
+    async def sort(self, *args, **kwargs):
+        await self.backend.run(self.queryset.sort, *args, **kwargs)
+        return self
+
+    async def delete(self):
+        return await self.backend.run(self.queryset.delete)
+
+    async def values_list(self, *keys):
+        return await self.backend.run(self.queryset.values_list, *keys)
+
+    async def columns(self, *keys, **kwargs):
+        return await self.backend.run(self.queryset.columns, *keys, **kwargs)
+
+    async def aggregate(self, **aggregations):
+        return await self.backend.run(self.queryset.aggregate, **aggregations)
+
+    def group_by(self, *keys):
+        return AsyncGroupBy(self.backend, self.queryset.group_by(*keys))
+
+
+class AsyncGroupBy(object):
+
+    """Wraps the grouped query set returned by
+    :py:meth:`AsyncQuerySet.group_by`."""
+
+    def __init__(self, backend, group_by):
+        self.backend = backend
+        self.group_by = group_by
+
+    async def aggregate(self, **aggregations):
+        return await self.backend.run(self.group_by.aggregate, **aggregations)
@@ -0,0 +1,389 @@
+"""Recording of query workloads and index recommendations."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import contextlib
+import logging
+from collections import OrderedDict
+
+import six
+
+logger = logging.getLogger(__name__)
+
+
+def get_query_keys(query):
+    """Returns the keys that a query document uses (including the ones in
+    `$and`, `$or`, `$nor` and `$not` expressions)."""
+    keys = set()
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            for sub_query in value:
+                if isinstance(sub_query, dict):
+                    keys |= get_query_keys(sub_query)
+        elif key == "$not":
+            if isinstance(value, dict):
+                keys |= get_query_keys(value)
+        elif not key.startswith("$"):
+            keys.add(key)
+    return keys
+
+
+def get_sort_keys(sort):
+    """Returns the keys of a sort specification, e.g. `[("year", -1)]`, the
+    arguments of the `sort` calls of a MongoDB query set or a list of keys."""
+    keys = []
+    for item in sort or ():
+        if isinstance(item, six.string_types):
+            keys.append(item)
+        elif isinstance(item, (list, tuple)) and item:
+            if isinstance(item[0], six.string_types):
+                keys.append(item[0])
+            else:
+                keys.extend(get_sort_keys(item))
+    return keys
+
+
+class QueryShape(object):
+
+    """The queries of a workload with the same collection, query keys and sort
+    keys, together with their costs.
+
+    :param collection: The collection of the queries.
+    :param keys: The (sorted) keys of the query documents.
+    :param sort_keys: The keys that the queries get sorted by.
+    """
+
+    def __init__(self, collection, keys, sort_keys):
+        self.collection = collection
+        self.keys = keys
+        self.sort_keys = sort_keys
+        self.count = 0
+        self.duration = 0.0
+        self.max_duration = 0.0
+        self.full_scans = 0
+        self.errors = 0
+
+    def add(self, span, full_scan=False):
+        self.count += 1
+        self.duration += span.duration
+        self.max_duration = max(self.max_duration, span.duration)
+        if full_scan:
+            self.full_scans += 1
+        if span.error is not None:
+            self.errors += 1
+
+    def __repr__(self):
+        return "QueryShape(%r, %r, %r, count=%d, duration=%.6f)" % (
+            self.collection,
+            self.keys,
+            self.sort_keys,
+            self.count,
+            self.duration,
+        )
+
+
+class Workload(object):
+
+    """A listener that aggregates the queries of backends by their shape (see
+    :py:class:`QueryShape`).
+
+    .. code-block:: python
+
+        workload = Workload()
+        with backend.record_workload(workload):
+            run_the_application()
+
+        for shape in workload.shapes.values():
+            print(shape)
+
+    The costs are the ones of the query spans of the backends (see
+    :py:class:`blitzdb.backends.instrumentation.Span`), i.e. SQL and MongoDB
+    query sets that get counted and fetched count twice. Queries that fail
+    (e.g. queries over non-indexed fields of the SQL backend) get recorded as
+    `errors` of their shape.
+    """
+
+    query_spans = ("query", "execute", "count")
+
+    def __init__(self):
+        self.shapes = OrderedDict()
+
+    def get_shape(self, collection, keys, sort_keys):
+        shape_key = (collection, tuple(sorted(keys)), tuple(sort_keys))
+        if shape_key not in self.shapes:
+            self.shapes[shape_key] = QueryShape(*shape_key)
+        return self.shapes[shape_key]
+
+    def __call__(self, span):
+        if span.name in self.query_spans:
+            query = span.info.get("filter", span.info.get("query"))
+            if not isinstance(query, dict):
+                return
+            plan = span.info.get("plan") or {}
+            shape = self.get_shape(
+                span.collection, get_query_keys(query), get_sort_keys(plan.get("sort"))
+            )
+            shape.add(span, full_scan=bool(plan.get("full_scan")))
+
+        elif span.name == "sort" and "keys" in span.info:
+            # the file backend sorts query sets after querying them
+            sort_keys = get_sort_keys(span.info["keys"])
+            shape = self.get_shape(span.collection, (), sort_keys)
+            shape.add(span, full_scan=bool(span.info.get("ephemeral_indexes")))
+
+        elif span.name == "compile" and span.error is not None:
+            query = span.info.get("filter")
+            if isinstance(query, dict):
+                shape = self.get_shape(span.collection, get_query_keys(query), ())
+                shape.add(span)
+
+    @property
+    def collections(self):
+        collections = []
+        for shape in self.shapes.values():
+            if shape.collection not in collections:
+                collections.append(shape.collection)
+        return collections
+
+    @contextlib.contextmanager
+    def recording(self, instrumentation):
+        """Returns a context manager that records the queries of the given
+        instrumentation within its block."""
+        instrumentation.add_listener(self)
+        try:
+            yield self
+        finally:
+            instrumentation.remove_listener(self)
+
+
+class IndexAdvisor(object):
+
+    """Recommends persistent indexes for the queries of a workload, and finds
+    the indexes that the workload does not use.
+
+    For every query shape that no index covers, the advisor recommends an
+    index over the keys of its query documents, followed by its sort keys. If
+    the backend only supports single-key indexes (like the file backend),
+    it recommends an index for every key instead. Ephemeral indexes (which
+    the file backend creates for queries and loses on restart) do not count.
+
+    .. code-block:: python
+
+        with backend.record_workload() as workload:
+            run_the_application()
+
+        advisor = IndexAdvisor(backend, workload)
+        for recommendation in advisor.recommend():
+            print(recommendation)
+
+        # creates the recommended indexes in the database
+        advisor.apply()
+
+    Indexes that the SQL backend cannot create (e.g. over keys without a
+    column) get logged and skipped by :py:meth:`apply`, they need a field
+    with `indexed=True` instead.
+
+    :param backend: The backend to advise.
+    :param workload: A :py:class:`Workload` of the backend.
+    :param min_count: The minimal number of queries of a shape for an index
+                      to be recommended.
+    """
+
+    def __init__(self, backend, workload, min_count=1):
+        self.backend = backend
+        self.workload = workload
+        self.min_count = min_count
+
+    def get_persistent_indexes(self, collection):
+        return [
+            index
+            for index in self.backend.get_index_info(collection)
+            if not index["ephemeral"]
+        ]
+
+    def _is_covered(self, keys, sort_keys, indexes):
+        index_keys = [index["keys"] for index in indexes]
+        if not self.backend.composite_indexes:
+            return all((key,) in index_keys for key in list(keys) + list(sort_keys))
+
+        n = len(keys)
+        m = n + len(sort_keys)
+        for index in index_keys:
+            if set(index[:n]) == set(keys) and tuple(index[n:m]) == tuple(sort_keys):
+                return True
+        return False
+
+    def recommend(self):
+        """Returns the recommended indexes, ordered by the total duration of
+        the queries that need them.
+
+        :returns: A list of dictionaries with the `collection` and the `keys`
+                  of each index, the number of queries that need it (`count`),
+                  their total `duration`, their number of `full_scans` and
+                  `errors` and a `reason`.
+        """
+        indexes = {}
+        recommendations = OrderedDict()
+
+        for shape in self.workload.shapes.values():
+            if shape.count < self.min_count:
+                continue
+            if shape.collection not in indexes:
+                indexes[shape.collection] = self.get_persistent_indexes(
+                    shape.collection
+                )
+            collection_indexes = indexes[shape.collection]
+
+            sort_keys = tuple(key for key in shape.sort_keys if key not in shape.keys)
+            if not shape.keys and not sort_keys:
+                continue
+
+            if self.backend.composite_indexes:
+                if self._is_covered(shape.keys, sort_keys, collection_indexes):
+                    continue
+                candidates = [tuple(shape.keys) + sort_keys]
+            else:
+                candidates = [
+                    (key,)
+                    for key in tuple(shape.keys) + sort_keys
+                    if not self._is_covered((key,), (), collection_indexes)
+                ]
+
+            for keys in candidates:
+                recommendation = recommendations.setdefault(
+                    (shape.collection, keys),
+                    {
+                        "collection": shape.collection,
+                        "keys": keys,
+                        "count": 0,
+                        "duration": 0.0,
+                        "full_scans": 0,
+                        "errors": 0,
+                    },
+                )
+                recommendation["count"] += shape.count
+                recommendation["duration"] += shape.duration
+                recommendation["full_scans"] += shape.full_scans
+                recommendation["errors"] += shape.errors
+
+        # an index also serves the queries over a prefix of its keys
+        for (collection, keys), recommendation in list(recommendations.items()):
+            for (other_collection, other_keys), other in recommendations.items():
+                if (
+                    other_collection == collection
+                    and len(other_keys) > len(keys)
+                    and set(other_keys[: len(keys)]) == set(keys)
+                ):
+                    for name in ("count", "duration", "full_scans", "errors"):
+                        other[name] += recommendation[name]
+                    del recommendations[(collection, keys)]
+                    break
+
+        for recommendation in recommendations.values():
+            if recommendation["errors"]:
+                reason = "%d failed queries (over keys without an index?)"
+                reason_count = recommendation["errors"]
+            elif recommendation["full_scans"]:
+                reason = "%d full scans of the collection"
+                reason_count = recommendation["full_scans"]
+            else:
+                reason = "%d queries without a matching index"
+                reason_count = recommendation["count"]
+            recommendation["reason"] = reason % reason_count
+
+        return sorted(
+            recommendations.values(),
+            key=lambda recommendation: (
+                -recommendation["duration"],
+                -recommendation["count"],
+            ),
+        )
+
+    def apply(self, recommendations=None):
+        """Creates the recommended (persistent) indexes.
+
+        :param recommendations: The recommendations to apply (by default, the
+                                ones of :py:meth:`recommend`).
+        :returns: The recommendations whose indexes have been created.
+        """
+        if recommendations is None:
+            recommendations = self.recommend()
+
+        applied = []
+        for recommendation in recommendations:
+            fields = OrderedDict((key, 1) for key in recommendation["keys"])
+            try:
+                self.backend.create_index(recommendation["collection"], fields=fields)
+            except (AttributeError, ValueError) as e:
+                logger.warning(
+                    "Cannot create an index over %s in collection %s: %s",
+                    ", ".join(recommendation["keys"]),
+                    recommendation["collection"],
+                    e,
+                )
+                continue
+            applied.append(recommendation)
+        return applied
+
+    def _get_used_prefix(self, index_keys, shape):
+        """Returns the number of leading keys of an index that the queries of
+        a shape can use (like :py:meth:`_is_covered`, the keys of the query
+        come first, in any order, followed by the sort keys)."""
+        keys = set(shape.keys)
+        n = 0
+        while n < len(index_keys) and index_keys[n] in keys:
+            n += 1
+        if n == len(keys):
+            for key in shape.sort_keys:
+                if n < len(index_keys) and index_keys[n] == key:
+                    n += 1
+                else:
+                    break
+        return n
+
+    def unused_indexes(self, collections=None):
+        """Returns the indexes that the queries of the workload do not (fully)
+        use, but that have to be updated on every write.
+
+        Since an index can only be used from its first key on, an index is
+        unused if no query uses its first key, even if its later keys appear
+        in the queries. Composite indexes of which the queries only use the
+        first keys get reported as well, with the keys that are used in
+        `used_keys` (an index over these keys would serve the same queries).
+
+        Unique indexes (including primary keys) and ephemeral indexes are
+        never reported.
+
+        :param collections: The collections to check (by default, the ones
+                            that the workload queries).
+        :returns: A list of dictionaries as returned by
+                  :py:meth:`blitzdb.backends.base.Backend.get_index_info`,
+                  together with their `collection` and their `used_keys`
+                  (empty for unused indexes).
+        """
+        if collections is None:
+            collections = self.workload.collections
+
+        unused = []
+        for collection in collections:
+            shapes = [
+                shape
+                for shape in self.workload.shapes.values()
+                if shape.collection == collection
+            ]
+
+            indexes = self.get_persistent_indexes(collection)
+            unique_keys = [index["keys"] for index in indexes if index["unique"]]
+            for index in indexes:
+                # (an index over the keys of a unique one is part of the schema)
+                if index["unique"] or index["keys"] in unique_keys:
+                    continue
+                used = max(
+                    [self._get_used_prefix(index["keys"], shape) for shape in shapes]
+                    or [0]
+                )
+                if used < len(index["keys"]):
+                    index = dict(index)
+                    index["collection"] = collection
+                    index["used_keys"] = index["keys"][:used]
+                    unused.append(index)
+        return unused
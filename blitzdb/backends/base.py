@@ -1,12 +1,15 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import abc
-import copy
 import inspect
 import logging
+import time
+from collections import OrderedDict
 
 import six
 
+from blitzdb.backends.advisor import Workload
+from blitzdb.backends.instrumentation import Instrumentation, Profile
 from blitzdb.document import Document, document_classes
 
 logger = logging.getLogger(__name__)
@@ -27,7 +30,56 @@ class InTransaction(BaseException):
     transaction gets called inside a transaction."""
 
 
+def encode_as_str(obj):
+    """Converts a string (or another object) to text."""
+    if six.PY3:
+        return str(obj)
+
+    else:
+        if isinstance(obj, six.text_type):
+            return obj
+
+        elif isinstance(obj, str):
+            return six.text_type(obj)
+
+        else:
+            return six.text_type(str(obj), errors="replace")
+
+
+# types whose values `serialize` returns unchanged
+PRIMITIVE_TYPES = (bool, float, type(None), six.text_type) + six.integer_types
+
+serialize_kinds = {}
+
+
+def get_serialize_kind(cls):
+    """Returns how `serialize` handles values of the given type (`primitive`,
+    `dict`, `str`, `list`, `document` or `other`), with a cache per type."""
+    try:
+        return serialize_kinds[cls]
+    except KeyError:
+        pass
+
+    if cls in PRIMITIVE_TYPES:
+        kind = "primitive"
+    elif issubclass(cls, dict):
+        kind = "dict"
+    elif issubclass(cls, six.string_types):
+        kind = "str"
+    elif issubclass(cls, (list, tuple)):
+        kind = "list"
+    elif issubclass(cls, Document):
+        kind = "document"
+    else:
+        kind = "other"
+    serialize_kinds[cls] = kind
+    return kind
+
+
 class ComplexEncoder(object):
+
+    simple = True
+
     @classmethod
     def encode(cls, obj, path):
         if isinstance(obj, complex):
@@ -44,6 +96,9 @@ class ComplexEncoder(object):
 
 
 class ComplexQueryEncoder(object):
+
+    simple = True
+
     @classmethod
     def encode(cls, obj, path):
         if isinstance(obj, complex):
@@ -55,6 +110,53 @@ class ComplexQueryEncoder(object):
         return obj
 
 
+class GroupCommit(object):
+
+    """Decides when the writes of a backend in autocommit mode get committed.
+
+    Without any bounds, every write gets committed right away. Otherwise
+    writes are batched and committed together once `size` writes are
+    pending or `interval` seconds have passed since the last commit (at the
+    time of the next write), so that a backend commits at most every
+    `interval` seconds.
+
+    :param interval: The minimal time between two commits (in seconds).
+    :param size: The maximal number of pending writes.
+    """
+
+    def __init__(self, interval=None, size=None):
+        self.interval = interval
+        self.size = size
+        self.reset()
+
+    @property
+    def enabled(self):
+        return self.interval is not None or self.size is not None
+
+    @property
+    def pending(self):
+        return self.operations > 0
+
+    def reset(self):
+        """Gets called after a commit."""
+        self.operations = 0
+        self.last_commit = time.time()
+
+    def add(self, operations=1):
+        """Registers writes and returns whether they need to be committed now."""
+        self.operations += operations
+        if self.size is None and self.interval is None:
+            return True
+
+        if self.size is not None and self.operations >= self.size:
+            return True
+
+        if self.interval is not None:
+            return time.time() - self.last_commit >= self.interval
+
+        return False
+
+
 class Backend(object):
 
     """Abstract base class for all backend implementations. Provides operations
@@ -63,6 +165,8 @@ class Backend(object):
 
     :param autodiscover_classes: If set to `True`, document classes will be discovered automatically,
                                  using a global list of all classes generated by the Document metaclass.
+    :param slow_query_time: If set, queries that take longer than this number of seconds get logged
+                            together with their plan (see :py:class:`blitzdb.backends.instrumentation.Instrumentation`).
 
     *The `Meta` attribute*
 
@@ -78,17 +182,29 @@ class Backend(object):
     standard_encoders = [ComplexEncoder]
     query_encoders = [ComplexQueryEncoder]
 
+    # whether the backend supports indexes over several keys
+    composite_indexes = True
+
+    # whether several threads can use the backend at the same time (each one
+    # with its own transactions)
+    thread_safe = False
+
     def __init__(
         self,
         autodiscover_classes=True,
         autoload_embedded=True,
         allow_documents_in_query=True,
+        slow_query_time=None,
     ):
         self.classes = {}
         self.deprecated_classes = {}
         self.collections = {}
+        self._class_names = {}
+        self._class_meta = {}
+        self._meta_attributes = {}
         self._autoload_embedded = autoload_embedded
         self._allow_documents_in_query = allow_documents_in_query
+        self.instrumentation = Instrumentation(slow_query_time=slow_query_time)
         if autodiscover_classes:
             self.autodiscover_classes()
 
@@ -108,7 +224,18 @@ class Backend(object):
 
         if cls in self.classes:
             del self.collections[self.classes[cls]["collection"]]
-            del self.classes[cls]
+            self._remove_class(cls)
+
+    def _remove_class(self, cls):
+        del self.classes[cls]
+        self._class_meta.clear()
+        if self._class_names.get(cls.__name__) is cls:
+            # another registered class with the same name takes its place
+            del self._class_names[cls.__name__]
+            for other_cls in self.classes:
+                if other_cls.__name__ == cls.__name__:
+                    self._class_names[cls.__name__] = other_cls
+                    break
 
     def register(self, cls, parameters=None, overwrite=False):
         """Explicitly register a new document class for use in the backend.
@@ -154,9 +281,15 @@ class Backend(object):
         delete_list = []
 
         def register_class(collection_name, cls):
+            if cls in self.classes:
+                old_collection = self.classes[cls]["collection"]
+                if self.collections.get(old_collection) is cls:
+                    del self.collections[old_collection]
             self.collections[collection_name] = cls
             self.classes[cls] = parameters.copy()
             self.classes[cls]["collection"] = collection_name
+            self._class_names.setdefault(cls.__name__, cls)
+            self._class_meta.clear()
 
         if collection_name in self.collections:
             old_cls = self.collections[collection_name]
@@ -166,7 +299,7 @@ class Backend(object):
                     % (old_cls, cls, collection_name)
                 )
                 self.deprecated_classes[old_cls] = self.classes[old_cls]
-                del self.classes[old_cls]
+                self._remove_class(old_cls)
                 register_class(collection_name, cls)
                 return True
 
@@ -180,6 +313,16 @@ class Backend(object):
         return False
 
     def get_meta_attributes(self, cls):
+        """Returns the (user-defined) attributes of the `Meta` class of a
+        document class.
+
+        The attributes are only inspected once per class.
+        """
+        if cls not in self._meta_attributes:
+            self._meta_attributes[cls] = self._get_meta_attributes(cls)
+        return self._meta_attributes[cls].copy()
+
+    def _get_meta_attributes(self, cls):
         def get_user_attributes(cls):
             if six.PY2:
                 boring = dir(type(b"dummy", (object,), {}))
@@ -223,22 +366,29 @@ class Backend(object):
         :param convert_keys_to_str: If `True`, converts all dictionary keys to string (this is e.g. required for the MongoDB backend)
         :param embed_level: If `embed_level > 0`, instances of `Document` classes will be embedded instead of referenced.
                             The value of the parameter will get decremented by 1 when calling `serialize` on child objects.
+        :param encoders: Additional encoders, which get applied to every value after the standard encoders.
+                         If all encoders set `simple = True` (see :py:meth:`_serialize_simple`), a faster
+                         serializer gets used.
         :param autosave: Whether to automatically save embedded objects without a primary key to the database.
         :param for_query: If true, only the `pk` and `__collection__` attributes will be included in document references.
 
         :returns: The serialized object.
         """
 
+        if encoders is None:
+            encoders = []
+
+        all_encoders = self.standard_encoders + encoders
+        if path is None and all(
+            getattr(encoder, "simple", False) for encoder in all_encoders
+        ):
+            return self._serialize_simple(
+                obj, all_encoders, convert_keys_to_str, embed_level, autosave, for_query
+            )
+
         if path is None:
             path = []
 
-        def get_value(obj, key):
-            key_fragments = key.split(".")
-            current_dict = obj
-            for key_fragment in key_fragments:
-                current_dict = current_dict[key_fragment]
-            return current_dict
-
         serialize_with_opts = lambda value, *args, **kwargs: self.serialize(
             value,
             *args,
@@ -249,26 +399,9 @@ class Backend(object):
             **kwargs
         )
 
-        if encoders is None:
-            encoders = []
-
-        for encoder in self.standard_encoders + encoders:
+        for encoder in all_encoders:
             obj = encoder.encode(obj, path=path)
 
-        def encode_as_str(obj):
-            if six.PY3:
-                return str(obj)
-
-            else:
-                if isinstance(obj, six.text_type):
-                    return obj
-
-                elif isinstance(obj, str):
-                    return six.text_type(obj)
-
-                else:
-                    return six.text_type(str(obj), errors="replace")
-
         if isinstance(obj, dict):
             output_obj = {}
             for key, value in obj.items():
@@ -292,69 +425,114 @@ class Backend(object):
             except DoNotSerialize:
                 pass
         elif isinstance(obj, Document):
-            collection = self.get_collection_for_obj(obj)
-            if embed_level > 0:
-                try:
-                    output_obj = self.serialize(obj, embed_level=embed_level - 1)
-                except obj.DoesNotExist:  # cannot load object, ignoring...
-                    output_obj = self.serialize(
-                        obj.lazy_attributes, embed_level=embed_level - 1
-                    )
-                except DoNotSerialize:
-                    pass
-            elif obj.embed:
-                output_obj = self.serialize(obj)
-            else:
-                if obj.pk == None and autosave:
-                    obj.save(self)
-
-                if obj._lazy:
-                    # We make sure that all attributes that are already present get included in the reference
-                    output_obj = {}
-                    if obj.get_pk_name() in output_obj:
-                        del output_obj[obj.get_pk_name()]
-                    output_obj["pk"] = obj.pk
-                    output_obj["__collection__"] = self.classes[obj.__class__][
-                        "collection"
-                    ]
-                else:
-                    if for_query and not self._allow_documents_in_query:
-                        raise ValueError("Documents are not allowed in queries!")
-
-                    if for_query:
-                        output_obj = {
-                            "$elemMatch": {
-                                "pk": obj.pk,
-                                "__collection__": self.classes[obj.__class__][
-                                    "collection"
-                                ],
-                            }
-                        }
-                    else:
-                        ref = "%s:%s" % (
-                            self.classes[obj.__class__]["collection"],
-                            str(obj.pk),
-                        )
-                        output_obj = {
-                            "__ref__": ref,
-                            "pk": obj.pk,
-                            "__collection__": self.classes[obj.__class__]["collection"],
-                        }
+            output_obj = self.serialize_document(obj, embed_level, autosave, for_query)
+        else:
+            output_obj = obj
+        return output_obj
 
-                if (
-                    hasattr(obj, "Meta")
-                    and hasattr(obj.Meta, "dbref_includes")
-                    and obj.Meta.dbref_includes
-                ):
-                    for include_key in obj.Meta.dbref_includes:
-                        try:
-                            value = get_value(obj, include_key)
-                            output_obj[include_key.replace(".", "_")] = value
-                        except KeyError:
-                            continue
+    def _serialize_simple(
+        self, obj, encoders, convert_keys_to_str, embed_level, autosave, for_query
+    ):
+        """Serializes an object like :py:meth:`serialize` if all encoders are
+        simple, i.e. ignore the path of the value that they encode and leave
+        primitive values (strings, numbers, booleans and `None`) unchanged
+        (when encoding and decoding them).
+
+        Encoders declare this with a `simple = True` attribute. Paths are not
+        tracked then, primitive values are returned right away and the
+        handling of every other value is looked up by its type.
+        """
+
+        def serialize(obj):
+            kind = serialize_kinds.get(obj.__class__) or get_serialize_kind(
+                obj.__class__
+            )
+            if kind == "primitive":
+                return obj
 
+            for encoder in encoders:
+                obj = encoder.encode(obj, path=None)
+            kind = serialize_kinds.get(obj.__class__) or get_serialize_kind(
+                obj.__class__
+            )
+
+            if kind == "dict":
+                output_obj = {}
+                for key, value in obj.items():
+                    if convert_keys_to_str:
+                        key = encode_as_str(key)
+                    try:
+                        output_obj[key] = serialize(value)
+                    except DoNotSerialize:
+                        pass
+                return output_obj
+            elif kind == "list":
+                return [serialize(value) for value in obj]
+            elif kind == "str":
+                return encode_as_str(obj)
+            elif kind == "document":
+                return self.serialize_document(obj, embed_level, autosave, for_query)
+            return obj
+
+        return serialize(obj)
+
+    def serialize_document(self, obj, embed_level=0, autosave=True, for_query=False):
+        """Serializes a `Document` that is part of an object passed to
+        :py:meth:`serialize`, either by embedding it or as a reference to it
+        (see :py:meth:`serialize` for the parameters)."""
+
+        class_meta = self.get_class_meta(obj.__class__)
+        collection = class_meta["collection"]
+        if embed_level > 0:
+            try:
+                output_obj = self.serialize(obj, embed_level=embed_level - 1)
+            except obj.DoesNotExist:  # cannot load object, ignoring...
+                output_obj = self.serialize(
+                    obj.lazy_attributes, embed_level=embed_level - 1
+                )
+        elif obj.embed:
+            output_obj = self.serialize(obj)
         else:
-            output_obj = obj
+            # we read the primary key directly if we can (`obj.pk` looks up
+            # its name on every call)
+            try:
+                pk = obj.lazy_attributes[class_meta["pk_name"]]
+            except KeyError:
+                pk = obj.pk
+            if pk == None and autosave:
+                obj.save(self)
+                pk = obj.pk
+
+            if obj._lazy:
+                # We make sure that all attributes that are already present get included in the reference
+                output_obj = {"pk": pk, "__collection__": collection}
+            else:
+                if for_query and not self._allow_documents_in_query:
+                    raise ValueError("Documents are not allowed in queries!")
+
+                if for_query:
+                    output_obj = {
+                        "$elemMatch": {"pk": pk, "__collection__": collection}
+                    }
+                else:
+                    output_obj = {
+                        "__ref__": "%s:%s" % (collection, str(pk)),
+                        "pk": pk,
+                        "__collection__": collection,
+                    }
+
+            if class_meta["dbref_includes"]:
+                # lazy documents only get loaded if an include is missing
+                attributes = obj if obj._lazy else obj.attributes
+                for output_key, key_fragments in class_meta["dbref_includes"]:
+                    try:
+                        value = attributes
+                        for key_fragment in key_fragments:
+                            value = value[key_fragment]
+                    except KeyError:
+                        continue
+                    output_obj[output_key] = value
+
         return output_obj
 
     def deserialize(self, obj, encoders=None, embedded=False, create_instance=True):
@@ -371,7 +549,11 @@ class Backend(object):
         if not encoders:
             encoders = []
 
-        for encoder in encoders + self.standard_encoders:
+        all_encoders = encoders + self.standard_encoders
+        if all(getattr(encoder, "simple", False) for encoder in all_encoders):
+            return self._deserialize_simple(obj, all_encoders, create_instance)
+
+        for encoder in all_encoders:
             obj = encoder.decode(obj)
 
         if isinstance(obj, dict):
@@ -381,30 +563,73 @@ class Backend(object):
                 and obj["__collection__"] in self.collections
                 and "pk" in obj
             ):
-                # for backwards compatibility
-                attributes = copy.deepcopy(obj)
-                del attributes["__collection__"]
-                if "__ref__" in attributes:
-                    del attributes["__ref__"]
-                if "__lazy__" in attributes:
-                    lazy = attributes["__lazy__"]
-                    del attributes["__lazy__"]
-                else:
-                    lazy = True
+                # `create_instance` deserializes (and copies) the fields
+                attributes = {
+                    key: value
+                    for key, value in obj.items()
+                    if key not in ("__collection__", "__ref__", "__lazy__")
+                }
                 output_obj = self.create_instance(
-                    obj["__collection__"], attributes, lazy=lazy
+                    obj["__collection__"], attributes, lazy=obj.get("__lazy__", True)
                 )
             else:
                 output_obj = {}
                 for key, value in obj.items():
                     output_obj[key] = self.deserialize(value, encoders=encoders)
         elif isinstance(obj, (list, tuple)):
-            output_obj = list(map(lambda x: self.deserialize(x), obj))
+            output_obj = [self.deserialize(value, encoders=encoders) for value in obj]
         else:
             output_obj = obj
 
         return output_obj
 
+    def _deserialize_simple(self, obj, encoders, create_instance):
+        """Deserializes an object like :py:meth:`deserialize` if all encoders
+        are simple (see :py:meth:`_serialize_simple`).
+
+        Primitive values are returned right away and references are turned
+        into lazy instances straight from their fields, without copying them
+        first.
+        """
+        collections = self.collections
+
+        def deserialize(obj, create_instance=True):
+            kind = serialize_kinds.get(obj.__class__) or get_serialize_kind(
+                obj.__class__
+            )
+            if kind == "primitive":
+                return obj
+
+            for encoder in encoders:
+                obj = encoder.decode(obj)
+            kind = serialize_kinds.get(obj.__class__) or get_serialize_kind(
+                obj.__class__
+            )
+
+            if kind == "dict":
+                if (
+                    create_instance
+                    and "__collection__" in obj
+                    and obj["__collection__"] in collections
+                    and "pk" in obj
+                ):
+                    # `create_instance` deserializes (and copies) the fields
+                    attributes = {
+                        key: value
+                        for key, value in obj.items()
+                        if key not in ("__collection__", "__ref__", "__lazy__")
+                    }
+                    lazy = obj.get("__lazy__", True)
+                    return self.create_instance(
+                        obj["__collection__"], attributes, lazy=lazy
+                    )
+                return {key: deserialize(value) for key, value in obj.items()}
+            elif kind == "list":
+                return [deserialize(value) for value in obj]
+            return obj
+
+        return deserialize(obj, create_instance)
+
     def create_instance(
         self,
         collection_or_class,
@@ -413,6 +638,7 @@ class Backend(object):
         call_hook=True,
         deserialize=True,
         db_loader=None,
+        attribute_loader=None,
     ):
         """Creates an instance of a `Document` class corresponding to the given
         collection name or class.
@@ -429,6 +655,8 @@ class Backend(object):
             "lazy": lazy,
             "db_loader": db_loader,
         }
+        if attribute_loader is not None:
+            creation_args["attribute_loader"] = attribute_loader
 
         if collection_or_class in self.classes:
             cls = collection_or_class
@@ -464,6 +692,29 @@ class Backend(object):
     def current_transaction(self):
         pass
 
+    def profile(self):
+        """Returns a context manager that collects the timed spans and the
+        counters of all operations of the backend within its block (see
+        :py:class:`blitzdb.backends.instrumentation.Profile`)."""
+        return Profile(self.instrumentation)
+
+    def record_workload(self, workload=None):
+        """Returns a context manager that records the shapes and the costs of
+        the queries within its block, e.g. for an
+        :py:class:`blitzdb.backends.advisor.IndexAdvisor`.
+
+        :param workload: A :py:class:`blitzdb.backends.advisor.Workload` to add
+                         the queries to (by default, a new one).
+        """
+        if workload is None:
+            workload = Workload()
+        return workload.recording(self.instrumentation)
+
+    def flush(self):
+        """Commits all writes that the backend has batched in autocommit mode
+        (see :py:class:`GroupCommit`). Backends that do not batch writes do
+        nothing here."""
+
     def transaction(self, implicit=False):
         """This returns a context guard which will automatically open and close
         a transaction."""
@@ -521,6 +772,35 @@ class Backend(object):
         collection = self.classes[cls]["collection"]
         return collection
 
+    def get_class_meta(self, cls):
+        """Returns the metadata of a document class that is needed to
+        serialize its documents, i.e. its collection name, the name of its
+        primary key and its `dbref_includes` (as `(output key, key fragments)`
+        tuples).
+
+        The metadata gets computed once per class and is reset when classes
+        get registered or unregistered.
+
+        :param cls: The document class for which to return the metadata.
+        """
+        try:
+            return self._class_meta[cls]
+        except KeyError:
+            pass
+
+        collection = self.get_collection_for_cls(cls)
+        meta = getattr(cls, "Meta", None)
+        class_meta = {
+            "collection": collection,
+            "pk_name": cls.get_pk_name(),
+            "dbref_includes": [
+                (include_key.replace(".", "_"), include_key.split("."))
+                for include_key in getattr(meta, "dbref_includes", None) or ()
+            ],
+        }
+        self._class_meta[cls] = class_meta
+        return class_meta
+
     def get_collection_for_cls_name(self, cls_name):
         """Returns the collection name for a given document class.
 
@@ -528,11 +808,10 @@ class Backend(object):
 
         :returns: The collection name for the given class.
         """
-        for cls in self.classes:
-            if cls.__name__ == cls_name:
-                return self.classes[cls]["collection"]
-
-        raise AttributeError("Unknown class name: %s" % cls_name)
+        try:
+            return self.classes[self._class_names[cls_name]]["collection"]
+        except KeyError:
+            raise AttributeError("Unknown class name: %s" % cls_name)
 
     def get_cls_for_collection(self, collection):
         """Return the class for a given collection name.
@@ -541,11 +820,10 @@ class Backend(object):
 
         :returns: A reference to the class for the given collection name.
         """
-        for cls, params in self.classes.items():
-            if params["collection"] == collection:
-                return cls
-
-        raise AttributeError("Unknown collection: %s" % collection)
+        try:
+            return self.collections[collection]
+        except KeyError:
+            raise AttributeError("Unknown collection: %s" % collection)
 
     def call_hook(self, name, obj, *args, **kwargs):
         try:
@@ -602,3 +880,59 @@ class Backend(object):
              differ from backend to backend. Consult the documentation of the given
              backend that you use to find out which queries are supported.
         """
+
+    def explain(self, cls_or_collection, query, sort=None, include=None):
+        """Returns how the backend would run a query, without running it.
+
+        :param cls_or_collection: The class or collection of the documents.
+        :param query: The query (as passed to :py:meth:`filter`).
+        :param sort: A key or a list of `(key, order)` tuples to sort by.
+        :param include: The related documents to include (SQL backend only).
+        :returns: A dictionary that describes the plan of the query. The entries
+                  that all backends return are `collection`, `query`, `indexes`
+                  (the indexes used), `full_scan` (whether all documents of the
+                  collection get read, or `None` if unknown), `estimated_count`
+                  (`None` if unknown) and `warnings` (a list of messages, e.g.
+                  about full scans). The other entries depend on the backend.
+        """
+        raise NotImplementedError(
+            "%s does not support explain" % self.__class__.__name__
+        )
+
+    def get_index_info(self, cls_or_collection):
+        """Returns the indexes of a collection.
+
+        :param cls_or_collection: The class or collection of the documents.
+        :returns: A list of dictionaries with the `name` of each index, its
+                  `keys` (a tuple), whether it is `unique` and whether it is
+                  `ephemeral` (i.e. not stored in the database).
+        """
+        raise NotImplementedError(
+            "%s does not support get_index_info" % self.__class__.__name__
+        )
+
+    def distinct(self, cls_or_collection, key, query=None, with_counts=True):
+        """Returns the distinct values of a given key, together with the number
+        of documents that have each value.
+
+        The SQL backend computes the values with a single `GROUP BY` and the
+        MongoDB backend with the aggregation pipeline. The file backend counts
+        the values with the index of the key if there is one; otherwise it has
+        to load every matching document, so create an index for keys that you
+        often need the distinct values of.
+
+        :param cls_or_collection: The class or collection of the documents.
+        :param key: The (possibly nested) key to return the values of.
+        :param query: If given, only the documents matching this query are
+                      taken into account.
+        :param with_counts: Whether to count the documents for every value.
+        :returns: An ordered dict that maps every value to its number of
+                  documents if `with_counts` is `True`, otherwise a list of
+                  the values (both sorted by value).
+        """
+        queryset = self.filter(cls_or_collection, query or {})
+        groups = queryset.group_by(key).aggregate(__count__="count")
+        if not with_counts:
+            return [group[key] for group in groups]
+
+        return OrderedDict((group[key], group["__count__"]) for group in groups)
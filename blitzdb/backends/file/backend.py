@@ -1,5 +1,6 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
+import copy
 import os
 import os.path
 import uuid
@@ -9,11 +10,13 @@ import six
 
 import blitzdb
 from blitzdb.backends.base import Backend as BaseBackend
-from blitzdb.backends.base import NotInTransaction
+from blitzdb.backends.base import GroupCommit, NotInTransaction
 from blitzdb.document import Document
 from blitzdb.helpers import delete_value, get_value, set_value
 
 from .index import Index, TransactionalIndex
+from .journal import Journal, write_file
+from .lock import FileLock
 from .queries import compile_query
 from .queryset import QuerySet
 from .serializers import JsonSerializer, PickleSerializer
@@ -56,14 +59,40 @@ class Backend(BaseBackend):
         The configuration dictionary. If not specified, Blitz will try to load
         it from disk.  If this fails, the default configuration will be used
         instead.
+    :param multiprocess:
+        If `True`, several processes can use the database at the same time
+        (requires `fcntl`, i.e. a POSIX system). Commits are serialized with
+        an exclusive lock on the database and increase the commit sequence
+        number stored in `config.json`. Before running a query, the backend
+        checks the sequence number and reloads the indexes of all collections
+        that other processes have changed in the meantime. All processes that
+        use the database need to enable this mode.
+
+    With the default (transactional) store and index classes, every commit
+    gets written to a journal with a single `fsync` before the documents are
+    stored. Changed indexes are only written to disk when the journal grows
+    beyond `journal_size` bytes (see :py:meth:`checkpoint`). When the
+    database is opened, all commits in the journal are applied again, so a
+    crash during a commit cannot leave the indexes and documents in an
+    inconsistent state. Set the `journal` config value to `False` to write
+    all indexes on every commit instead.
 
     .. warning::
         It might seem tempting to use the `autocommit` config and not having to
         worry about calling `commit` by hand. Please be advised that this can
-        incur a significant overhead in write time since a `commit` will
-        trigger a complete rewrite of all indexes to disk.
+        incur a significant overhead in write time since every `commit` will
+        be flushed to disk (or, without the journal, will trigger a complete
+        rewrite of all indexes to disk).
+
+        To reduce this overhead, the `autocommit_interval` (in seconds) and
+        `autocommit_batch_size` config values let the backend commit batches
+        of writes (see :py:class:`blitzdb.backends.base.GroupCommit`). Pending
+        writes get committed before every query and when calling
+        :py:meth:`flush`.
     """
 
+    composite_indexes = False
+
     # the default configuration values.
     default_config = {
         "indexes": {},
@@ -72,11 +101,17 @@ class Backend(BaseBackend):
         "index_store_class": "basic",
         "serializer_class": "json",
         "autocommit": False,
+        "autocommit_interval": None,
+        "autocommit_batch_size": None,
+        "journal": True,
+        "journal_size": 8 * 1024 * 1024,
     }
 
     config_defaults = {}
 
-    def __init__(self, path, config=None, overwrite_config=False, **kwargs):
+    def __init__(
+        self, path, config=None, overwrite_config=False, multiprocess=False, **kwargs
+    ):
 
         self._path = os.path.abspath(path)
         if not os.path.exists(path):
@@ -87,7 +122,20 @@ class Backend(BaseBackend):
         self.in_transaction = False
         self.indexes = defaultdict(lambda: {})
         self.index_stores = defaultdict(lambda: {})
-        self.load_config(config, overwrite_config)
+        self.multiprocess = multiprocess
+        self._changed_collections = set()
+        self._refreshed_collections = set()
+        if multiprocess:
+            self.lock = FileLock(os.path.join(self._path, "lock"))
+            with self.lock():
+                self.load_config(config, overwrite_config)
+                self.init_journal()
+        else:
+            self.lock = None
+            self.load_config(config, overwrite_config)
+            self.init_journal()
+        self._sequence = self._config.get("sequence", 0)
+        self._group_commit = GroupCommit()
         self._auto_transaction = False
         self.begin()
 
@@ -102,8 +150,24 @@ class Backend(BaseBackend):
         if value not in (True, False):
             raise TypeError("Value must be boolean!")
 
+        if not value:
+            self.flush()
         self.config["autocommit"] = value
 
+    def autocommit_writes(self, operations=1):
+        """Commits the given number of writes in autocommit mode, or batches
+        them until a group commit is due."""
+        group_commit = self._group_commit
+        group_commit.interval = self._config.get("autocommit_interval")
+        group_commit.size = self._config.get("autocommit_batch_size")
+        if group_commit.add(operations):
+            self.commit()
+
+    def flush(self):
+        """Commits all writes that have been batched in autocommit mode."""
+        if self._group_commit.pending:
+            self.commit()
+
     def begin(self):
         """Start a new transaction."""
         if self.in_transaction:  # we're already in a transaction...
@@ -136,10 +200,13 @@ class Backend(BaseBackend):
         return serializer_classes[self.config["serializer_class"]]
 
     def rollback(self, transaction=None):
-        """Roll back a transaction."""
+        """Roll back a transaction (including the writes that have been
+        batched in autocommit mode)."""
         if not self.in_transaction:
             raise NotInTransaction
 
+        # (before rebuilding indexes, which would flush the batched writes)
+        self._group_commit.reset()
         for collection, store in self.stores.items():
             store.rollback()
             indexes = self.indexes[collection]
@@ -153,6 +220,8 @@ class Backend(BaseBackend):
                     indexes_to_rebuild.append(key)
             if indexes_to_rebuild:
                 self.rebuild_indexes(collection, indexes_to_rebuild)
+        self._changed_collections = set()
+        self._refreshed_collections = set()
         self.in_transaction = False
 
     def commit(self, transaction=None):
@@ -162,16 +231,223 @@ class Backend(BaseBackend):
 
             This operation can be **expensive** in runtime if a large number of
             documents (>100.000) is contained in the database, since it will
-            cause all database indexes to be written to disk.
+            cause all database indexes to be written to disk (when the journal
+            is disabled or gets checkpointed).
         """
+        if self.multiprocess:
+            with self.lock():
+                # we apply our changes on top of the ones of other processes
+                self.refresh()
+                self._commit()
+                if self._changed_collections:
+                    self.increase_sequence(self._changed_collections)
+                    self.save_config()
+        else:
+            self._commit()
+
+        # ephemeral indexes that were rebuilt while we had pending changes
+        # do not contain these changes
+        for collection in self._changed_collections & self._refreshed_collections:
+            self.drop_ephemeral_indexes(collection)
+        self._changed_collections = set()
+        self._refreshed_collections = set()
+        self._group_commit.reset()
+        self.in_transaction = False
+        self.begin()
+
+    def _commit(self):
+        if self.journal is not None:
+            self.write_journal()
+
         for collection in self.collections:
             store = self.get_collection_store(collection)
             store.commit()
             indexes = self.get_collection_indexes(collection)
             for index in indexes.values():
-                index.commit()
-        self.in_transaction = False
-        self.begin()
+                index.commit(save=self.journal is None)
+
+        if self.journal is not None:
+            for indexes in self.indexes.values():
+                for index in indexes.values():
+                    index.journal_sequence = self.journal.sequence
+            if self.journal.size > self._config["journal_size"]:
+                self._checkpoint()
+
+    def init_journal(self):
+        if (
+            self._config["journal"]
+            and self._config["store_class"] == "transactional"
+            and self._config["index_class"] == "transactional"
+        ):
+            self.journal = Journal(os.path.join(self._path, "journal"))
+            self.recover()
+        else:
+            self.journal = None
+
+    def write_journal(self):
+        """Writes all pending changes of the stores and the (persistent)
+        indexes to the journal as a single record."""
+        record = {"stores": {}, "indexes": {}}
+        for collection in self.collections:
+            store = self.get_collection_store(collection)
+            updates, deletes = changes = store.get_changes()
+            if updates or deletes:
+                record["stores"][collection] = changes
+            index_changes = {}
+            for index in self.get_collection_indexes(collection).values():
+                if not index.ephemeral and index.has_changes():
+                    index_changes[index.id] = index.get_changes()
+            if index_changes:
+                record["indexes"][collection] = index_changes
+
+        if record["stores"] or record["indexes"]:
+            self.journal.append(record)
+
+    def replay_journal(self, collection, index):
+        """Applies the changes of all commits in the journal that a (loaded)
+        persistent index does not contain yet."""
+        if self.journal is None or index.ephemeral:
+            return
+
+        for sequence, record in self.journal.get_records(after=index.journal_sequence):
+            changes = record["indexes"].get(collection, {}).get(index.id)
+            if changes is not None:
+                index.apply_changes(changes)
+            index.journal_sequence = sequence
+
+    def recover(self):
+        """Writes the documents of all commits in the journal to the stores
+        (as they might have been lost in a crash) and checkpoints the
+        journal."""
+        records = self.journal.get_records()
+        if not records:
+            return
+
+        for sequence, record in records:
+            for collection, changes in record["stores"].items():
+                self.get_collection_store(collection).apply_changes(changes)
+        self._checkpoint()
+
+    def checkpoint(self):
+        """Writes all indexes that have been changed by the commits in the
+        journal to disk and empties the journal.
+
+        This happens automatically when the journal grows beyond the
+        `journal_size` config value (in bytes).
+        """
+        if self.journal is None:
+            return
+
+        if self.multiprocess:
+            with self.lock():
+                self.refresh()
+                self._checkpoint()
+        else:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        records = self.journal.get_records()
+        if not records:
+            return
+
+        # the documents have been stored without flushing them to disk
+        changed_indexes = set()
+        for sequence, record in records:
+            for collection, (updates, deletes) in record["stores"].items():
+                store = self.get_collection_store(collection)
+                for store_key in updates:
+                    store.sync_blob(store_key)
+            for collection, index_changes in record["indexes"].items():
+                for index_id in index_changes:
+                    changed_indexes.add((collection, index_id))
+
+        sequence = self.journal.sequence
+        for collection, index_id in changed_indexes:
+            index = self.get_persistent_index(collection, index_id)
+            if index is None:
+                # the index does not exist anymore or will be rebuilt
+                continue
+
+            index.journal_sequence = sequence
+            index.save_to_store(sync=True)
+        self.journal.reset(sequence)
+
+    def get_persistent_index(self, collection, index_id):
+        """Returns the persistent index with the given id, which gets loaded
+        from its store if it is not in use."""
+        for index in self.get_collection_indexes(collection).values():
+            if index.id == index_id and not index.ephemeral:
+                return index
+
+        for params in self._config["indexes"].get(collection, {}).values():
+            if params.get("id") == index_id:
+                index = self.IndexClass(
+                    params,
+                    serializer=lambda x: self.serialize(x, autosave=False),
+                    deserializer=lambda x: self.deserialize(x),
+                    store=self.get_index_store(collection, index_id),
+                )
+                if not index.loaded:
+                    return None
+
+                self.replay_journal(collection, index)
+                return index
+
+        return None
+
+    def refresh(self):
+        """Loads the changes that other processes have committed to the
+        database since the last refresh.
+
+        Only the indexes of collections that have been changed get reloaded,
+        ephemeral indexes of these collections get dropped (and recreated
+        when needed). Does nothing unless the backend is in multi-process
+        mode.
+        """
+        if not self.multiprocess:
+            return
+
+        with self.lock(exclusive=False):
+            config = self.read_config()
+        if config.get("sequence", 0) == self._sequence:
+            return
+
+        with self.lock():
+            config = self.read_config()
+            sequences = config.get("sequences", {})
+            self._config = config
+            last_sequence = self._sequence
+            self._sequence = config.get("sequence", 0)
+            for collection in list(self.collections):
+                if sequences.get(collection, 0) <= last_sequence:
+                    continue
+
+                self._refreshed_collections.add(collection)
+                self.drop_ephemeral_indexes(collection)
+                indexes_to_rebuild = []
+                for key, index in self.indexes[collection].items():
+                    if index.load_from_store():
+                        self.replay_journal(collection, index)
+                    else:
+                        indexes_to_rebuild.append(key)
+                # another process might have created new indexes
+                self.init_indexes(collection)
+                self.rebuild_indexes(collection, indexes_to_rebuild)
+
+    def increase_sequence(self, collections):
+        """Increases the commit sequence number and marks the given
+        collections as changed by the new commit (needs to be called with
+        the exclusive lock held and the config saved afterwards)."""
+        self._sequence += 1
+        self._config["sequence"] = self._sequence
+        for collection in collections:
+            self._config["sequences"][collection] = self._sequence
+
+    def drop_ephemeral_indexes(self, collection):
+        indexes = self.indexes[collection]
+        for key, index in list(indexes.items()):
+            if index.ephemeral:
+                del indexes[key]
 
     def rebuild_index(self, collection, key):
         """Rebuild a given index using the objects stored in the database.
@@ -268,13 +544,18 @@ class Backend(BaseBackend):
             self.create_index(cls.get_pk_name(), collection)
         return self.indexes[collection][cls.get_pk_name()]
 
-    def load_config(self, config=None, overwrite_config=False):
+    def read_config(self):
         config_file = os.path.join(self._path, "config.json")
-        if os.path.exists(config_file):
-            with open(config_file, "rb") as config_file:
-                # configuration is always stored in JSON format
-                self._config = JsonSerializer.deserialize(config_file.read())
-        else:
+        if not os.path.exists(config_file):
+            return None
+
+        with open(config_file, "rb") as config_file:
+            # configuration is always stored in JSON format
+            return JsonSerializer.deserialize(config_file.read())
+
+    def load_config(self, config=None, overwrite_config=False):
+        self._config = self.read_config()
+        if self._config is None:
             if config:
                 self._config = config.copy()
             else:
@@ -284,15 +565,40 @@ class Backend(BaseBackend):
 
         for key, value in self.default_config.items():
             if key not in self._config:
-                self._config[key] = value
+                # the defaults must not be shared (e.g. `indexes`)
+                self._config[key] = copy.deepcopy(value)
         if "version" not in self._config:
             self._config["version"] = blitzdb.__version__
+        if self.multiprocess:
+            self._config.setdefault("sequence", 0)
+            self._config.setdefault("sequences", {})
         self.save_config()
 
     def save_config(self):
+        if self.multiprocess:
+            with self.lock():
+                self._save_config()
+        else:
+            self._save_config()
+
+    def _save_config(self):
+        if self.multiprocess:
+            # we keep the sequence numbers and indexes of other processes
+            config = self.read_config()
+            if config is not None:
+                self._config["sequence"] = max(
+                    self._config.get("sequence", 0), config.get("sequence", 0)
+                )
+                sequences = self._config.setdefault("sequences", {})
+                for collection, sequence in config.get("sequences", {}).items():
+                    sequences[collection] = max(sequences.get(collection, 0), sequence)
+                indexes = self._config["indexes"]
+                for collection, params in config.get("indexes", {}).items():
+                    for key, index_params in params.items():
+                        indexes.setdefault(collection, {}).setdefault(key, index_params)
+
         config_file = os.path.join(self._path, "config.json")
-        with open(config_file, "wb") as config_file:
-            config_file.write(JsonSerializer.serialize(self._config))
+        write_file(config_file, JsonSerializer.serialize(self._config))
 
     @property
     def config(self):
@@ -373,11 +679,32 @@ class Backend(BaseBackend):
             index = self.indexes[collection][key]
             for obj in all_objects:
                 index.add_key(self.serialize(obj.attributes), obj._store_key)
-            index.commit()
+            if self.journal is None:
+                index.commit()
+                continue
+
+            index.commit(save=False)
+            if not index.ephemeral:
+                # the index contains all commits in the journal
+                self.journal.update()
+                index.journal_sequence = self.journal.sequence
+                index.save_to_store(sync=True)
 
     def create_indexes(
         self, cls_or_collection, params_list, ephemeral=False, unique=False
     ):
+        if self.multiprocess and not ephemeral:
+            with self.lock():
+                self.refresh()
+                return self._create_indexes(
+                    cls_or_collection, params_list, ephemeral=ephemeral, unique=unique
+                )
+
+        return self._create_indexes(
+            cls_or_collection, params_list, ephemeral=ephemeral, unique=unique
+        )
+
+    def _create_indexes(self, cls_or_collection, params_list, ephemeral, unique):
         indexes = []
         keys = []
 
@@ -392,8 +719,12 @@ class Backend(BaseBackend):
         for params in params_list:
             if not isinstance(params, dict):
                 params = {"key": params}
-            if params["key"] in self.indexes[collection]:
-                return  # Index already exists
+            index = self.indexes[collection].get(params["key"])
+            if index is not None:
+                if ephemeral or not index.ephemeral:
+                    return  # Index already exists
+                # an ephemeral index gets replaced by a persistent one
+                del self.indexes[collection][params["key"]]
 
             if "id" not in params:
                 params["id"] = uuid.uuid4().hex
@@ -409,12 +740,19 @@ class Backend(BaseBackend):
                 store=index_store,
                 unique=unique,
             )
+            if index.loaded:
+                self.replay_journal(collection, index)
             self.indexes[collection][params["key"]] = index
 
             if collection not in self._config["indexes"]:
                 self._config["indexes"][collection] = {}
 
             if not ephemeral:
+                if self.multiprocess and (
+                    params["key"] not in self._config["indexes"][collection]
+                ):
+                    # other processes need to load the new index
+                    self.increase_sequence([collection])
                 self._config["indexes"][collection][params["key"]] = params
                 self.save_config()
 
@@ -429,21 +767,57 @@ class Backend(BaseBackend):
     def get_collection_indexes(self, collection):
         return self.indexes[collection] if collection in self.indexes else {}
 
+    def get_index_info(self, cls_or_collection):
+        """Returns the indexes of a collection.
+
+        See :py:meth:`blitzdb.backends.base.Backend.get_index_info`. The file
+        backend only has single-key indexes, which are `ephemeral` if they have
+        been created for a query (or a sort) and get lost on restart.
+        """
+        if not isinstance(cls_or_collection, six.string_types):
+            collection = self.get_collection_for_cls(cls_or_collection)
+        else:
+            collection = cls_or_collection
+
+        pk_name = self.get_cls_for_collection(collection).get_pk_name()
+        return [
+            {
+                "name": key,
+                "keys": (key,),
+                "unique": index.unique or key == pk_name,
+                "ephemeral": index.ephemeral,
+            }
+            for key, index in sorted(self.get_collection_indexes(collection).items())
+        ]
+
     def encode_attributes(self, attributes):
         return self.SerializerClass.serialize(attributes)
 
     def decode_attributes(self, data):
         return self.SerializerClass.deserialize(data)
 
-    def get_object(self, cls, key):
+    def get_attributes(self, cls, key):
+        """Returns the (deserialized) attributes of the document with the
+        given store key."""
         collection = self.get_collection_for_cls(cls)
         store = self.get_collection_store(collection)
+        instrumentation = self.instrumentation
         try:
-            data = self.deserialize(self.decode_attributes(store.get_blob(key)))
+            with instrumentation.span("read", collection):
+                blob = store.get_blob(key)
         except IOError:
             raise cls.DoesNotExist
 
-        obj = self.create_instance(cls, data)
+        instrumentation.count("documents")
+        with instrumentation.span("decode", collection):
+            return self.deserialize(self.decode_attributes(blob))
+
+    def get_object(self, cls, key):
+        data = self.get_attributes(cls, key)
+        collection = self.get_collection_for_cls(cls)
+        with self.instrumentation.span("construct", collection):
+            # the data has been deserialized already
+            obj = self.create_instance(cls, data, deserialize=False)
         return obj
 
     def update(self, obj, set_fields=None, unset_fields=None, update_obj=True):
@@ -504,9 +878,10 @@ class Backend(BaseBackend):
 
         for key, index in indexes.items():
             index.add_key(serialized_attributes, store_key)
+        self._changed_collections.add(collection)
 
         if self.config["autocommit"]:
-            self.commit()
+            self.autocommit_writes()
 
         return obj
 
@@ -522,9 +897,10 @@ class Backend(BaseBackend):
                 pass
             for index in indexes.values():
                 index.remove_key(store_key)
+        self._changed_collections.add(collection)
 
         if self.config["autocommit"]:
-            self.commit()
+            self.autocommit_writes(len(store_keys))
 
     def delete(self, obj):
 
@@ -566,6 +942,8 @@ class Backend(BaseBackend):
                 indexes_to_create.append(sort_key)
 
         self.create_indexes(cls, indexes_to_create, ephemeral=True)
+        if indexes_to_create:
+            self.instrumentation.count("ephemeral_indexes", len(indexes_to_create))
 
         def sort_by_keys(keys, sort_keys):
             if not sort_keys:
@@ -585,7 +963,10 @@ class Backend(BaseBackend):
 
             return fl
 
-        return flatten(sort_by_keys(keys, sort_keys))
+        with self.instrumentation.span(
+            "sort", collection, keys=sort_keys, ephemeral_indexes=indexes_to_create
+        ):
+            return flatten(sort_by_keys(keys, sort_keys))
 
     def _canonicalize_query(self, query):
 
@@ -613,11 +994,57 @@ class Backend(BaseBackend):
 
         return transform_query(query)
 
+    def _get_query_conditions(self, cls, collection, compiled_query):
+        """Returns the `(key, expression)` conditions of a compiled query (a
+        `None` key stands for all documents of the collection)."""
+        store = self.get_collection_store(collection)
+        conditions = []
+
+        def condition_collector(key, expression):
+            conditions.append((key, expression))
+            return QuerySet(self, cls, store, [])
+
+        compiled_query(condition_collector)
+        return conditions
+
+    def _get_query_keys(self, cls, collection, compiled_query):
+        """Returns the keys of the indexes that a compiled query uses and the
+        ones of them that do not exist yet."""
+        indexes = self.get_collection_indexes(collection)
+        keys = []
+        for key, expression in self._get_query_conditions(
+            cls, collection, compiled_query
+        ):
+            if key is not None and key not in keys:
+                keys.append(key)
+        return keys, [key for key in keys if key not in indexes]
+
+    def _run_query(self, cls, collection, compiled_query):
+        """Runs a compiled query with the indexes (which must all exist)."""
+        store = self.get_collection_store(collection)
+        indexes = self.get_collection_indexes(collection)
+
+        def query_function(key, expression):
+            if key is None:
+                return QuerySet(
+                    self, cls, store, self.get_pk_index(collection).get_all_keys()
+                )
+
+            qs = QuerySet(self, cls, store, indexes[key].get_keys_for(expression))
+            return qs
+
+        return compiled_query(query_function)
+
     def filter(self, cls_or_collection, query, initial_keys=None):
 
         if not isinstance(query, dict):
             raise AttributeError("Query parameters must be dict!")
 
+        if initial_keys is None:
+            # sub-queries of query sets keep the state of their parent
+            self.flush()
+            self.refresh()
+
         if not isinstance(cls_or_collection, six.string_types):
             collection = self.get_collection_for_cls(cls_or_collection)
             cls = cls_or_collection
@@ -625,32 +1052,124 @@ class Backend(BaseBackend):
             collection = cls_or_collection
             cls = self.get_cls_for_collection(collection)
 
-        store = self.get_collection_store(collection)
-        indexes = self.get_collection_indexes(collection)
-        compiled_query = compile_query(self._canonicalize_query(query))
+        instrumentation = self.instrumentation
 
-        indexes_to_create = []
+        with instrumentation.span("query", collection, query=query) as query_span:
+            with instrumentation.span("compile", collection):
+                compiled_query = compile_query(self._canonicalize_query(query))
 
-        def query_function(key, expression):
-            if key is None:
-                return QuerySet(
-                    self, cls, store, self.get_pk_index(collection).get_all_keys()
+            with instrumentation.span("index", collection):
+                keys, indexes_to_create = self._get_query_keys(
+                    cls, collection, compiled_query
                 )
+                if indexes_to_create:
+                    self.create_indexes(cls, indexes_to_create, ephemeral=True)
+                    instrumentation.count("ephemeral_indexes", len(indexes_to_create))
 
-            qs = QuerySet(self, cls, store, indexes[key].get_keys_for(expression))
-            return qs
+                query_set = self._run_query(cls, collection, compiled_query)
 
-        def index_collector(key, expressions):
-            if key not in indexes and key not in indexes_to_create and key is not None:
-                indexes_to_create.append(key)
-            return QuerySet(self, cls, store, [])
+            query_span.info["plan"] = {
+                "indexes": keys,
+                "ephemeral_indexes": indexes_to_create,
+                # creating an index reads all documents of the collection
+                "full_scan": bool(indexes_to_create),
+            }
+
+        return query_set
 
-        # We collect all the indexes that we need to create
-        compiled_query(index_collector)
+    def explain(self, cls_or_collection, query, sort=None, include=None):
+        """Returns how the backend runs a query, without running it (or
+        creating any indexes).
 
-        if indexes_to_create:
-            self.create_indexes(cls, indexes_to_create, ephemeral=True)
+        See :py:meth:`blitzdb.backends.base.Backend.explain` for the parameters.
+
+        `indexes` contains the keys of the existing indexes that the query
+        uses. `conditions` describes the conditions of the query, with the
+        number of documents that match them (`count`) if the index of their
+        key exists. Keys without an index get an ephemeral index when the
+        query runs, which reads all documents of the collection (a full scan).
+        The `estimated_count` of the query is exact if all its indexes exist.
+        """
+        if not isinstance(query, dict):
+            raise AttributeError("Query parameters must be dict!")
 
-        query_set = compiled_query(query_function)
+        self.flush()
+        self.refresh()
 
-        return query_set
+        if not isinstance(cls_or_collection, six.string_types):
+            collection = self.get_collection_for_cls(cls_or_collection)
+            cls = cls_or_collection
+        else:
+            collection = cls_or_collection
+            cls = self.get_cls_for_collection(collection)
+
+        canonical_query = self._canonicalize_query(query)
+        compiled_query = compile_query(canonical_query)
+        indexes = self.get_collection_indexes(collection)
+        # (get_pk_index would create the index if it does not exist yet)
+        pk_name = cls.get_pk_name()
+        pk_index = indexes.get(pk_name)
+        documents = len(pk_index.get_all_keys()) if pk_index is not None else None
+
+        conditions = []
+        keys = []
+        for key, expression in self._get_query_conditions(
+            cls, collection, compiled_query
+        ):
+            if key is None:
+                # the condition matches all documents (from the primary index)
+                key = pk_name
+            else:
+                condition = {"key": key, "index": None, "count": None}
+                if key in indexes:
+                    index = indexes[key]
+                    condition["index"] = (
+                        "ephemeral" if index.ephemeral else "persistent"
+                    )
+                    condition["count"] = len(index.get_keys_for(expression))
+                conditions.append(condition)
+            if key not in keys:
+                keys.append(key)
+
+        if sort is None:
+            sort_keys = []
+        elif not isinstance(sort, (list, tuple)):
+            sort_keys = [(sort, QuerySet.ASCENDING)]
+        else:
+            sort_keys = list(sort)
+
+        for key, order in sort_keys:
+            if key not in keys:
+                keys.append(key)
+
+        missing_keys = [key for key in keys if key not in indexes]
+
+        warnings = [
+            "No index on '%s': creating an ephemeral index reads all %s documents "
+            "(use `create_index` to create a persistent index)."
+            % (key, documents if documents is not None else "the")
+            for key in missing_keys
+        ]
+        if include:
+            warnings.append(
+                "The file backend does not support includes, related documents "
+                "get loaded lazily."
+            )
+
+        if missing_keys:
+            estimated_count = None
+        else:
+            estimated_count = len(self._run_query(cls, collection, compiled_query))
+
+        return {
+            "collection": collection,
+            "query": canonical_query,
+            "sort": sort_keys,
+            "indexes": [key for key in keys if key in indexes],
+            "conditions": conditions,
+            "ephemeral_indexes": missing_keys,
+            "full_scan": bool(missing_keys),
+            "documents": documents,
+            "estimated_count": estimated_count,
+            "warnings": warnings,
+        }
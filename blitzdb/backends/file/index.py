@@ -2,13 +2,18 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import copy
+import logging
 from collections import defaultdict
 
+from six.moves import cPickle
+
 from blitzdb.backends.base import NotInTransaction
 
 from .queryset import QuerySet
 from .serializers import PickleSerializer as Serializer
 
+logger = logging.getLogger(__name__)
+
 
 class NonUnique(BaseException):
     """Index uniqueness constraint violated."""
@@ -33,6 +38,10 @@ class Index(object):
     :type store: object
     """
 
+    # the version of the format in which the index gets stored
+    # (see `save_to_data`)
+    FORMAT_VERSION = 2
+
     def __init__(self, params, serializer, deserializer, store=None, unique=False):
         """Initalize internal state."""
         self._params = params
@@ -45,6 +54,9 @@ class Index(object):
         self._index = None
         self._reverse_index = None
         self._undefined_keys = None
+        self._hashed_keys = None
+        # the sequence number of the last journal record the index contains
+        self.journal_sequence = 0
         self.clear()
 
         if store:
@@ -59,6 +71,16 @@ class Index(object):
         self._index = defaultdict(list)
         self._reverse_index = defaultdict(list)
         self._undefined_keys = {}
+        self._hashed_keys = {}
+
+    @property
+    def id(self):
+        """Return the id under which the index gets stored.
+
+        :return: index id
+        :rtype: str
+        """
+        return self._params.get("id")
 
     @property
     def key(self):
@@ -73,6 +95,14 @@ class Index(object):
         """
         return self._params["key"]
 
+    @property
+    def unique(self):
+        """Return whether the indexed values must be unique.
+
+        :rtype: bool
+        """
+        return self._unique
+
     def get_value(self, attributes, key=None):
         """Get value to be indexed from document attributes.
 
@@ -98,9 +128,11 @@ class Index(object):
 
         return value
 
-    def save_to_store(self):
+    def save_to_store(self, sync=False):
         """Save index to store.
 
+        :param sync: Replace the stored index atomically and flush it to disk
+        :type sync: bool
         :raise AttributeError: If no datastore is defined
         """
         if not self._store:
@@ -108,7 +140,10 @@ class Index(object):
 
         saved_data = self.save_to_data(in_place=True)
         data = Serializer.serialize(saved_data)
-        self._store.store_blob(data, "all_keys_with_undefined")
+        if sync:
+            self._store.store_blob(data, "all_keys_with_undefined", sync=True)
+        else:
+            self._store.store_blob(data, "all_keys_with_undefined")
 
     def get_all_keys(self):
         """Get all keys indexed.
@@ -139,19 +174,32 @@ class Index(object):
         if not self._store:
             raise AttributeError("No datastore defined!")
 
-        if self._store.has_blob("all_keys"):
-            data = Serializer.deserialize(self._store.get_blob("all_keys"))
-            self.load_from_data(data)
-            return True
-
-        elif self._store.has_blob("all_keys_with_undefined"):
-            blob = self._store.get_blob("all_keys_with_undefined")
-            data = Serializer.deserialize(blob)
-            self.load_from_data(data, with_undefined=True)
-            return True
-
-        else:
-            return False
+        try:
+            if self._store.has_blob("all_keys"):
+                data = Serializer.deserialize(self._store.get_blob("all_keys"))
+                self.load_from_data(data)
+                return True
+
+            elif self._store.has_blob("all_keys_with_undefined"):
+                blob = self._store.get_blob("all_keys_with_undefined")
+                data = Serializer.deserialize(blob)
+                self.load_from_data(data, with_undefined=True)
+                return True
+
+        except (
+            cPickle.UnpicklingError,
+            EOFError,
+            IndexError,
+            KeyError,
+            TypeError,
+            ValueError,
+        ) as e:
+            # the index is corrupted (e.g. by a crash while it was written),
+            # so it needs to be rebuilt
+            logger.warning("Cannot load index %s, rebuilding it: %r", self.key, e)
+            self.clear()
+
+        return False
 
     def sort_keys(self, keys, order=QuerySet.ASCENDING):
         """Sort keys.
@@ -193,27 +241,65 @@ class Index(object):
     def save_to_data(self, in_place=False):
         """Save index to data structure.
 
+        The data structure is a dict that contains the version of its format
+        (`FORMAT_VERSION`), the index items, the undefined keys, the keys of
+        hashed values and the journal sequence number.
+
+        .. admonition:: Format versions
+
+            Older versions of BlitzDB stored indexes without a version: as an
+            `(index items, undefined keys)` tuple (version 0), to which
+            version 1 appended the keys of hashed values and the journal
+            sequence number. Indexes in these formats still get loaded and
+            are upgraded to the current format the next time they are saved.
+            Indexes in a newer format than the current one cannot be loaded
+            and get rebuilt from the documents.
+
         :param in_place: Do not copy index value to a new list object
         :type in_place: bool
         :return: Index data structure
-        :rtype: list
+        :rtype: dict
         """
         if in_place:
-            return [list(self._index.items()), list(self._undefined_keys.keys())]
+            index = list(self._index.items())
+        else:
+            index = [(key, values[:]) for key, values in self._index.items()]
 
-        return (
-            [(key, values[:]) for key, values in self._index.items()],
-            list(self._undefined_keys.keys()),
-        )
+        return {
+            "version": self.FORMAT_VERSION,
+            "index": index,
+            "undefined_keys": list(self._undefined_keys.keys()),
+            "hashed_keys": list(self._hashed_keys.keys()),
+            "journal_sequence": self.journal_sequence,
+        }
 
     def load_from_data(self, data, with_undefined=False):
         """Load index structure.
 
-        :param with_undefined: Load undefined keys as well
+        Data in older formats gets loaded as well (see
+        :py:meth:`save_to_data`).
+
+        :param with_undefined: Load undefined keys as well (only used for
+                               data without a format version)
         :type with_undefined: bool
+        :raise ValueError: If the data has a newer format than we support
         """
-        if with_undefined:
-            defined_values, undefined_values = data
+        hashed_values = None
+        self.journal_sequence = 0
+        if isinstance(data, dict):
+            if data["version"] > self.FORMAT_VERSION:
+                raise ValueError("Unsupported index format: %s" % data["version"])
+            defined_values = data["index"]
+            undefined_values = data["undefined_keys"]
+            hashed_values = data["hashed_keys"]
+            self.journal_sequence = data["journal_sequence"]
+        elif with_undefined:
+            # format versions 0 and 1
+            defined_values, undefined_values = data[:2]
+            if len(data) > 2:
+                hashed_values = data[2]
+            if len(data) > 3:
+                self.journal_sequence = data[3]
         else:
             defined_values = data
             undefined_values = None
@@ -226,6 +312,10 @@ class Index(object):
             self._undefined_keys = {key: True for key in undefined_values}
         else:
             self._undefined_keys = {}
+        if hashed_values is None:
+            # older indexes do not tell us which values are hashes
+            hashed_values = self._reverse_index.keys()
+        self._hashed_keys = {key: True for key in hashed_values}
 
     def get_hash_for(self, value):
         """Get hash for a given value.
@@ -273,6 +363,59 @@ class Index(object):
         """
         return self._undefined_keys.keys()
 
+    def get_indexed_value(self, store_key):
+        """Get the indexed value for a given store key.
+
+        :param store_key: The key for the document in the store
+        :type store_key: str
+        :return: The indexed value (`None` if the document does not define it)
+        :rtype: object
+        :raise KeyError: If the index does not contain the value itself (e.g.
+                         because the value is a list or a dict, of which only
+                         hashes get stored)
+        """
+        if store_key in self._undefined_keys:
+            return None
+
+        if store_key in self._hashed_keys:
+            raise KeyError(store_key)
+
+        hash_values = self._reverse_index.get(store_key)
+        if not hash_values or len(hash_values) > 1:
+            raise KeyError(store_key)
+
+        return hash_values[0]
+
+    def get_value_counts(self, store_keys=None):
+        """Count the documents per indexed value.
+
+        :param store_keys: Only count documents with these keys (all if None)
+        :type store_keys: set(str)
+        :return: The number of documents per value (`None` for documents
+                 that do not define the value)
+        :rtype: dict
+        :raise KeyError: If the index only contains the hash of some value
+        """
+        counts = {}
+        for hash_value, keys in self._index.items():
+            if store_keys is not None:
+                keys = [key for key in keys if key in store_keys]
+            if not keys:
+                continue
+
+            for key in keys:
+                if key in self._hashed_keys:
+                    raise KeyError(key)
+
+            counts[hash_value] = len(keys)
+
+        undefined_keys = self._undefined_keys.keys()
+        if store_keys is not None:
+            undefined_keys = [key for key in undefined_keys if key in store_keys]
+        if undefined_keys:
+            counts[None] = counts.get(None, 0) + len(undefined_keys)
+        return counts
+
     # The following two operations change the value of the index
 
     def add_hashed_value(self, hash_value, store_key):
@@ -314,11 +457,14 @@ class Index(object):
                 values = value
                 hash_value = self.get_hash_for(value)
                 self.add_hashed_value(hash_value, store_key)
+                self.add_hashed_key(store_key)
             else:
                 values = [value]
 
             for value in values:
                 hash_value = self.get_hash_for(value)
+                if hash_value is not value:
+                    self.add_hashed_key(store_key)
                 self.add_hashed_value(hash_value, store_key)
         else:
             self.add_undefined(store_key)
@@ -331,6 +477,14 @@ class Index(object):
         """
         self._undefined_keys[store_key] = True
 
+    def add_hashed_key(self, store_key):
+        """Mark that the index only contains the hash of the value of a key.
+
+        :param store_key: The key for the document in the store
+        :type store_key: str
+        """
+        self._hashed_keys[store_key] = True
+
     def remove_key(self, store_key):
         """Remove key from the index.
 
@@ -339,6 +493,8 @@ class Index(object):
         """
         if store_key in self._undefined_keys:
             del self._undefined_keys[store_key]
+        if store_key in self._hashed_keys:
+            del self._hashed_keys[store_key]
         if store_key in self._reverse_index:
             for value in self._reverse_index[store_key]:
                 self._index[value].remove(store_key)
@@ -364,6 +520,7 @@ class TransactionalIndex(Index):
         self._add_cache = defaultdict(list)
         self._reverse_add_cache = defaultdict(list)
         self._undefined_cache = {}
+        self._hashed_cache = {}
         self._remove_cache = {}
 
     def begin(self):
@@ -373,24 +530,57 @@ class TransactionalIndex(Index):
         """
         self.commit()
 
-    def commit(self):
-        """Commit current transaction."""
-        if not self._add_cache and not self._remove_cache and not self._undefined_cache:
+    def commit(self, save=True):
+        """Commit current transaction.
+
+        :param save: Save the index to its store (if it is not ephemeral)
+        :type save: bool
+        """
+        if not self.has_changes():
             return
 
-        for store_key, hash_values in self._add_cache.items():
-            for hash_value in hash_values:
-                super(TransactionalIndex, self).add_hashed_value(hash_value, store_key)
-        for store_key in self._remove_cache:
-            super(TransactionalIndex, self).remove_key(store_key)
-        for store_key in self._undefined_cache:
-            super(TransactionalIndex, self).add_undefined(store_key)
-        if not self.ephemeral:
+        self.apply_changes(self.get_changes())
+        if save and not self.ephemeral:
             self.save_to_store()
 
         self._init_cache()
         self._in_transaction = True
 
+    def has_changes(self):
+        """Return whether the current transaction changed the index."""
+        return bool(self._add_cache or self._remove_cache or self._undefined_cache)
+
+    def get_changes(self):
+        """Get the changes of the current transaction.
+
+        :return: Added hash values per key, removed keys, undefined keys and
+                 keys with hashed values
+        :rtype: tuple
+        """
+        return (
+            dict(self._add_cache),
+            list(self._remove_cache),
+            list(self._undefined_cache),
+            list(self._hashed_cache),
+        )
+
+    def apply_changes(self, changes):
+        """Apply committed changes (as returned by `get_changes`) to the index.
+
+        :param changes: The changes to apply
+        :type changes: tuple
+        """
+        add_values, remove_keys, undefined_keys, hashed_keys = changes
+        for store_key, hash_values in add_values.items():
+            for hash_value in hash_values:
+                super(TransactionalIndex, self).add_hashed_value(hash_value, store_key)
+        for store_key in remove_keys:
+            super(TransactionalIndex, self).remove_key(store_key)
+        for store_key in undefined_keys:
+            super(TransactionalIndex, self).add_undefined(store_key)
+        for store_key in hashed_keys:
+            super(TransactionalIndex, self).add_hashed_key(store_key)
+
     def rollback(self):
         """Drop changes from current transaction."""
         if not self._in_transaction:
@@ -407,6 +597,15 @@ class TransactionalIndex(Index):
         """
         self._undefined_cache[store_key] = True
 
+    def add_hashed_key(self, store_key):
+        """Mark the value of a key as hashed in the context of the current
+        transaction.
+
+        :param store_key: The key for the document in the store
+        :type store_key: str
+        """
+        self._hashed_cache[store_key] = True
+
     def add_hashed_value(self, hash_value, store_key):
         """Add hashed value in the context of the current transaction.
 
@@ -437,6 +636,42 @@ class TransactionalIndex(Index):
             del self._add_cache[store_key]
         if store_key in self._undefined_cache:
             del self._undefined_cache[store_key]
+        if store_key in self._hashed_cache:
+            del self._hashed_cache[store_key]
+
+    def get_indexed_value(self, store_key):
+        """Get the committed indexed value for a given store key.
+
+        :param store_key: The key for the document in the store
+        :type store_key: str
+        :return: The indexed value (`None` if the document does not define it)
+        :rtype: object
+        :raise KeyError: If the value is not available or has uncommitted
+                         changes
+        """
+        if (
+            store_key in self._add_cache
+            or store_key in self._remove_cache
+            or store_key in self._undefined_cache
+        ):
+            raise KeyError(store_key)
+
+        return super(TransactionalIndex, self).get_indexed_value(store_key)
+
+    def get_value_counts(self, store_keys=None):
+        """Count the documents per committed indexed value.
+
+        :param store_keys: Only count documents with these keys (all if None)
+        :type store_keys: set(str)
+        :return: The number of documents per value
+        :rtype: dict
+        :raise KeyError: If the index has uncommitted changes or only contains
+                         the hash of some value
+        """
+        if self.has_changes():
+            raise KeyError
+
+        return super(TransactionalIndex, self).get_value_counts(store_keys)
 
     def get_keys_for(self, value, include_uncommitted=False):
         """Get keys for a given value.
@@ -0,0 +1,181 @@
+"""Write-ahead journal of the file backend."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import struct
+import zlib
+
+from .serializers import PickleSerializer as Serializer
+
+
+class Journal(object):
+
+    """An append-only log of the commits to a file database.
+
+    Every commit gets appended as a single record that contains all its
+    changes and gets flushed to disk with a single `fsync`. Records are
+    numbered with consecutive sequence numbers. When the changes of all
+    records have been written to the stores and indexes, the journal can be
+    reset (see :py:meth:`reset`), which starts a new (empty) journal that
+    continues the sequence numbers of the old one.
+
+    Every record is prefixed with its length and a checksum, so a record
+    that has only been partially written (e.g. due to a crash) is detected
+    and ignored, together with everything after it.
+
+    :param path: The path of the journal file.
+    """
+
+    MAGIC = b"BLITZDB-JOURNAL1"
+    HEADER = struct.Struct(">Q")
+    RECORD_HEADER = struct.Struct(">II")
+
+    def __init__(self, path):
+        self.path = path
+        self.sequence = 0
+        self._base = 0
+        self._records = []
+        self._offset = None
+        self._inode = None
+
+    @property
+    def size(self):
+        """The size of all valid records in the journal (in bytes)."""
+        if self._offset is None:
+            return 0
+
+        return self._offset - len(self.MAGIC) - self.HEADER.size
+
+    def get_records(self, after=None):
+        """Returns the records in the journal as `(sequence, record)` tuples.
+
+        :param after: Only return records with a higher sequence number.
+        """
+        self.update()
+        if after is None:
+            return list(self._records)
+
+        return [
+            (sequence, record) for sequence, record in self._records if sequence > after
+        ]
+
+    def update(self):
+        """Reads the records that have been appended (e.g. by another process)
+        since the last update."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._clear(0)
+            return
+
+        if stat.st_ino == self._inode and stat.st_size == self._offset:
+            return
+
+        with open(self.path, "rb") as journal_file:
+            header = journal_file.read(len(self.MAGIC) + self.HEADER.size)
+            if not header.startswith(self.MAGIC) or len(header) < (
+                len(self.MAGIC) + self.HEADER.size
+            ):
+                raise IOError("Invalid journal: %s" % self.path)
+
+            offset = len(self.MAGIC)
+            base = self.HEADER.unpack(header[offset:])[0]
+            if (stat.st_ino, base) != (self._inode, self._base):
+                # the journal has been reset, so we start over
+                self._clear(base)
+                self._inode = stat.st_ino
+                self._offset = len(header)
+            journal_file.seek(self._offset)
+
+            while True:
+                record_header = journal_file.read(self.RECORD_HEADER.size)
+                if len(record_header) < self.RECORD_HEADER.size:
+                    break
+
+                length, checksum = self.RECORD_HEADER.unpack(record_header)
+                data = journal_file.read(length)
+                if len(data) < length or zlib.crc32(data) & 0xFFFFFFFF != checksum:
+                    # an incomplete record, which will be overwritten
+                    break
+
+                self.sequence += 1
+                self._records.append((self.sequence, Serializer.deserialize(data)))
+                self._offset += self.RECORD_HEADER.size + length
+
+    def append(self, record):
+        """Appends a record to the journal and flushes it to disk.
+
+        :returns: The sequence number of the record.
+        """
+        self.update()
+        if self._inode is None:
+            self.reset(self.sequence)
+
+        data = Serializer.serialize(record)
+        with open(self.path, "r+b") as journal_file:
+            journal_file.seek(self._offset)
+            journal_file.write(
+                self.RECORD_HEADER.pack(len(data), zlib.crc32(data) & 0xFFFFFFFF)
+            )
+            journal_file.write(data)
+            journal_file.truncate()
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+        self.sequence += 1
+        self._records.append((self.sequence, record))
+        self._offset += self.RECORD_HEADER.size + len(data)
+        return self.sequence
+
+    def reset(self, sequence=None):
+        """Replaces the journal with an empty one.
+
+        :param sequence: The sequence number of the last record, from which
+                         the new journal continues (default: the last record
+                         of the current journal).
+        """
+        if sequence is None:
+            self.update()
+            sequence = self.sequence
+
+        write_file(self.path, self.MAGIC + self.HEADER.pack(sequence))
+        self._clear(sequence)
+        self._inode = os.stat(self.path).st_ino
+        self._offset = len(self.MAGIC) + self.HEADER.size
+
+    def _clear(self, sequence):
+        self.sequence = sequence
+        self._base = sequence
+        self._records = []
+        self._offset = None
+        self._inode = None
+
+
+def write_file(path, data):
+    """Replaces the file at `path` atomically with one that contains `data`
+    and flushes it to disk.
+
+    A crash leaves either the old or the new version of the file behind.
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as output_file:
+        output_file.write(data)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+
+    if hasattr(os, "replace"):
+        os.replace(temporary_path, path)
+    else:
+        # Python 2 (where `rename` is atomic on POSIX systems only)
+        os.rename(temporary_path, path)
+
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        # e.g. on Windows, where directories cannot be opened
+        return
+
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
@@ -0,0 +1,66 @@
+"""File lock that serializes access to a file database among processes."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import contextlib
+
+# will only be available on POSIX systems
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock(object):
+
+    """A reentrant lock (based on `fcntl.flock`) that can be held by several
+    readers (shared) or by a single writer (exclusive).
+
+    Nested acquisitions within the same process only increase a counter, an
+    exclusive acquisition within a shared one upgrades the lock until the
+    outermost acquisition gets released.
+
+    :param path: The path of the lock file (will be created if necessary).
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise AttributeError("File locking is not supported on this platform!")
+
+        self.path = path
+        self.exclusive = False
+        self._file = None
+        self._depth = 0
+
+    def acquire(self, exclusive=True):
+        if self._file is None:
+            self._file = open(self.path, "a")
+
+        if not self._depth or (exclusive and not self.exclusive):
+            operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            fcntl.flock(self._file.fileno(), operation)
+            self.exclusive = self.exclusive or exclusive
+        self._depth += 1
+
+    def release(self):
+        if not self._depth:
+            raise AttributeError("Lock is not held!")
+
+        self._depth -= 1
+        if not self._depth:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self.exclusive = False
+
+    @contextlib.contextmanager
+    def __call__(self, exclusive=True):
+        self.acquire(exclusive)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._depth = 0
+            self.exclusive = False
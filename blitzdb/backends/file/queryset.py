@@ -1,7 +1,10 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import copy
+from collections import OrderedDict
 
+from blitzdb.document import Document, Record
+from blitzdb.helpers import get_value
 from blitzdb.queryset import QuerySet as BaseQuerySet
 
 
@@ -55,6 +58,132 @@ class QuerySet(BaseQuerySet):
             self.objects[key]._store_key = key
         return self.objects[key]
 
+    def as_list(self):
+        return [self[i] for i in range(len(self.keys))]
+
+    def as_records(self):
+        records = []
+        for key in self.keys:
+            if key in self.objects:
+                attributes = self.objects[key].attributes
+            else:
+                attributes = self.backend.get_attributes(self.cls, key)
+            records.append(Record(attributes, self.cls))
+        return records
+
+    def values_list(self, *keys):
+        """Returns the values of the given keys as a list of tuples.
+
+        Values of indexed keys are read directly from the index. A document
+        only gets loaded if one of the keys is not indexed or if the index
+        cannot provide the value (e.g. for lists, dicts or documents, of which
+        the index only stores a hash).
+        """
+        if not keys:
+            raise AttributeError("No keys given!")
+
+        collection = self.backend.get_collection_for_cls(self.cls)
+        indexes = self.backend.get_collection_indexes(collection)
+        key_indexes = [(key, indexes.get(key)) for key in keys]
+
+        rows = []
+        for store_key in self.keys:
+            row = []
+            attributes = None
+            for key, index in key_indexes:
+                if index is not None:
+                    try:
+                        row.append(index.get_indexed_value(store_key))
+                        continue
+                    except KeyError:
+                        pass
+                if attributes is None:
+                    if store_key in self.objects:
+                        attributes = self.objects[store_key].attributes
+                    else:
+                        attributes = self.backend.get_object(
+                            self.cls, store_key
+                        ).attributes
+                try:
+                    row.append(get_value(attributes, key))
+                except (KeyError, IndexError):
+                    row.append(None)
+            rows.append(tuple(row))
+        return rows
+
+    def get_aggregates(self, group_keys, aggregations):
+        collection = self.backend.get_collection_for_cls(self.cls)
+        keys = []
+        for key in list(group_keys) + [key for function, key in aggregations.values()]:
+            if key is not None and key not in keys:
+                keys.append(key)
+
+        # we only use the existing indexes: values of keys without an index
+        # are read from the documents (see `values_list`), which is cheaper
+        # than building an (ephemeral) index that we would read only once
+        indexes = self.backend.get_collection_indexes(collection)
+
+        counts_only = all(key is None for function, key in aggregations.values())
+        if len(group_keys) == 1 and counts_only:
+            # we only count documents per value, which the index can do for us
+            try:
+                counts = indexes[group_keys[0]].get_value_counts(set(self.keys))
+            except KeyError:
+                pass
+            else:
+                return [
+                    dict(
+                        [(group_keys[0], value)]
+                        + [(name, count) for name in aggregations]
+                    )
+                    for value, count in counts.items()
+                ]
+
+        if keys:
+            rows = self.values_list(*keys)
+        else:
+            rows = [() for key in self.keys]
+
+        positions = {key: i for i, key in enumerate(keys)}
+        groups = OrderedDict()
+        for row in rows:
+            group = []
+            for key in group_keys:
+                value = row[positions[key]]
+                if isinstance(value, Document):
+                    # we group documents by their primary key
+                    value = value.pk
+                group.append(value)
+            groups.setdefault(tuple(group), []).append(row)
+
+        results = []
+        for group, group_rows in groups.items():
+            result = dict(zip(group_keys, group))
+            for name, (function, key) in aggregations.items():
+                if key is None:
+                    result[name] = len(group_rows)
+                    continue
+
+                values = [
+                    row[positions[key]]
+                    for row in group_rows
+                    if row[positions[key]] is not None
+                ]
+                if function == "count":
+                    result[name] = len(values)
+                elif not values:
+                    result[name] = None
+                elif function == "sum":
+                    result[name] = sum(values)
+                elif function == "avg":
+                    result[name] = sum(values) / float(len(values))
+                elif function == "min":
+                    result[name] = min(values)
+                elif function == "max":
+                    result[name] = max(values)
+            results.append(result)
+        return results
+
     def __and__(self, other):
         return self._clone(set(self.keys) & set(other.keys))
 
@@ -4,6 +4,8 @@ import copy
 import os
 import os.path
 
+from .journal import write_file
+
 
 """
 """
@@ -25,11 +27,29 @@ class Store(object):
     def _get_path_for_key(self, key):
         return os.path.join(self._properties["path"], key)
 
-    def store_blob(self, blob, key):
+    def store_blob(self, blob, key, sync=False):
+        """Stores a blob under the given key.
+
+        If `sync` is `True`, the blob gets written to a temporary file and
+        flushed to disk before it replaces the old one, so that a crash will
+        leave either the old or the new version of the blob behind.
+        """
+        if sync:
+            write_file(self._get_path_for_key(key), blob)
+            return key
+
         with open(self._get_path_for_key(key), "wb") as output_file:
             output_file.write(blob)
         return key
 
+    def sync_blob(self, key):
+        """Flushes a blob that has been stored without `sync` to disk."""
+        try:
+            with open(self._get_path_for_key(key), "rb") as input_file:
+                os.fsync(input_file.fileno())
+        except (IOError, OSError):
+            pass
+
     def delete_blob(self, key):
         filepath = self._get_path_for_key(key)
         if os.path.exists(filepath):
@@ -73,12 +93,21 @@ class TransactionalStore(Store):
         self._update_cache = {}
 
     def commit(self):
+        self.apply_changes(self.get_changes())
+
+    def get_changes(self):
+        """Returns the uncommitted changes as a `(updates, deletes)` tuple."""
+        return dict(self._update_cache), list(self._delete_cache)
+
+    def apply_changes(self, changes):
+        """Writes changes (as returned by :py:meth:`get_changes`) to disk."""
+        updates, deletes = changes
         try:
             self._enabled = False
-            for store_key in self._delete_cache:
+            for store_key in deletes:
                 if super(TransactionalStore, self).has_blob(store_key):
                     super(TransactionalStore, self).delete_blob(store_key)
-            for store_key, blob in self._update_cache.items():
+            for store_key, blob in updates.items():
                 super(TransactionalStore, self).store_blob(blob, store_key)
         finally:
             self._enabled = True
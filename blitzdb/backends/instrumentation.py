@@ -0,0 +1,200 @@
+"""Instrumentation of the backends: timed spans, counters and slow-query
+logging."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class Span(object):
+
+    """A timed phase of a database operation.
+
+    The backends emit spans for the following phases (not every backend has
+    all of them):
+
+    * `query`: a complete query of the file backend (including `compile`,
+      `index` and `sort`)
+    * `compile`: the compilation of a query
+    * `index`: the index lookups of a query (file backend)
+    * `sort`: the sorting of a query set (file backend)
+    * `execute`: the execution of a query in the database (SQL and MongoDB)
+    * `count`: the counting of the documents of a query set (SQL and MongoDB)
+    * `read`: the reading of a document from its store (file backend)
+    * `decode`: the decoding of a document
+    * `construct`: the creation of a `Document` instance
+
+    Spans of queries (i.e. `query`, `execute` and `count`) contain the query
+    (`info["query"]`) and the plan that the backend has chosen for it
+    (`info["plan"]`, e.g. the indexes used by the file backend). Since the
+    query of the SQL backend is a statement, its spans contain the query
+    document that it was created from as `info["filter"]`.
+
+    If the phase raises an exception, it is stored as `error`.
+
+    :param name: The name of the phase.
+    :param collection: The collection of the operation (if any).
+    :param info: Further information about the operation.
+    """
+
+    def __init__(self, instrumentation, name, collection=None, info=None):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.collection = collection
+        self.info = info if info is not None else {}
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_obj):
+        self.duration = time.time() - self.start
+        self.error = exc_value
+        self.instrumentation.finish(self)
+        return False
+
+    def __repr__(self):
+        return "Span(%r, %r, %.6f)" % (self.name, self.collection, self.duration or 0)
+
+
+class NoSpan(object):
+
+    """Stands in for a span if the instrumentation is disabled."""
+
+    @property
+    def info(self):
+        return {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_obj):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+class Instrumentation(object):
+
+    """Emits timed spans and counters for the operations of a backend.
+
+    Listeners are callables that get called with every finished
+    :py:class:`Span`. As long as there are no listeners, spans only get timed
+    if they belong to a query and slow-query logging is enabled, so the
+    instrumentation can be left enabled in production:
+
+    .. code-block:: python
+
+        backend = FileBackend("/path/to/db", slow_query_time=0.5)
+
+    logs a warning with the query and its plan for every query that takes
+    longer than 0.5 seconds.
+
+    :param slow_query_time: The minimum duration (in seconds) of the queries
+                            that get logged (`None` disables the logging).
+    """
+
+    def __init__(self, slow_query_time=None):
+        self.listeners = []
+        self.counters = defaultdict(int)
+        self.slow_query_time = slow_query_time
+
+    @property
+    def enabled(self):
+        return bool(self.listeners)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def span(self, name, collection=None, **info):
+        """Returns a context manager that times the given phase.
+
+        :param name: The name of the phase (see :py:class:`Span`).
+        :param collection: The collection of the operation.
+        :param info: Further information about the operation, e.g. the `query`.
+        """
+        if not self.listeners and (
+            self.slow_query_time is None or "query" not in info
+        ):
+            return NO_SPAN
+
+        return Span(self, name, collection, info)
+
+    def count(self, name, n=1):
+        """Increases a counter (e.g. of the documents read), if there are
+        listeners."""
+        if self.listeners:
+            self.counters[name] += n
+
+    def finish(self, span):
+        for listener in self.listeners:
+            listener(span)
+
+        if (
+            self.slow_query_time is not None
+            and "query" in span.info
+            and span.duration >= self.slow_query_time
+        ):
+            logger.warning(
+                "Slow query (%.3f s) on collection %s: %s (plan: %s)",
+                span.duration,
+                span.collection,
+                span.info["query"],
+                span.info.get("plan"),
+            )
+
+
+class Profile(object):
+
+    """A listener that collects the spans and counters of the operations in a
+    `with` block (see :py:meth:`blitzdb.backends.base.Backend.profile`).
+
+    .. code-block:: python
+
+        with backend.profile() as profile:
+            movies = list(backend.filter(Movie, {"year": 1999}))
+
+        print(profile.totals)
+    """
+
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+        self.spans = []
+        self.counters = {}
+        self._counters = {}
+
+    def __call__(self, span):
+        self.spans.append(span)
+
+    def __enter__(self):
+        self._counters = dict(self.instrumentation.counters)
+        self.instrumentation.add_listener(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_obj):
+        self.instrumentation.remove_listener(self)
+        self.counters = {
+            name: count - self._counters.get(name, 0)
+            for name, count in self.instrumentation.counters.items()
+            if count != self._counters.get(name, 0)
+        }
+        return False
+
+    @property
+    def totals(self):
+        """The number and total duration of the spans, by phase."""
+        totals = {}
+        for span in self.spans:
+            count, duration = totals.get(span.name, (0, 0.0))
+            totals[span.name] = (count + 1, duration + span.duration)
+        return totals
@@ -1,4 +1,4 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
-from .backend import Backend
+from .backend import Backend, BulkWriteError
 from .queryset import QuerySet
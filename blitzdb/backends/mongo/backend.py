@@ -7,21 +7,50 @@ from collections import defaultdict
 
 import pymongo
 import six
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError as PyMongoBulkWriteError
 
 from blitzdb.backends.base import Backend as BaseBackend
-from blitzdb.backends.base import NotInTransaction
+from blitzdb.backends.base import GroupCommit, NotInTransaction
 from blitzdb.document import Document
 from blitzdb.helpers import delete_value, get_value, set_value
+from blitzdb.queryset import sort_groups
 
 from .queryset import QuerySet
 
 logger = logging.getLogger(__name__)
 
 
+class BulkWriteError(BaseException):
+
+    """Gets raised if some writes of a commit failed.
+
+    All other writes have been applied. In ordered mode, the writes after the
+    first failed one are not executed.
+
+    :ivar errors: The failed writes as dicts with the `collection`, the
+                  `operation` (`save`, `delete` or `update`), the primary keys
+                  (`pks`) of the affected documents and the error `code` and
+                  `message` returned by MongoDB.
+    :ivar unexecuted: The writes that have not been executed as
+                      `(collection, operation, pks)` tuples.
+    """
+
+    def __init__(self, errors, unexecuted=None):
+        super(BulkWriteError, self).__init__(
+            "%d write(s) failed: %s"
+            % (len(errors), "; ".join(error["message"] for error in errors[:5]))
+        )
+        self.errors = errors
+        self.unexecuted = unexecuted or []
+
+
 class DotEncoder(object):
 
     DOT_MAGIC_VALUE = ":a5b8afc131:"
 
+    simple = True
+
     @classmethod
     def encode(cls, obj, path):
         def replace_key(key):
@@ -51,6 +80,21 @@ class Backend(BaseBackend):
     """A MongoDB backend.
 
     :param db: An instance of a `pymongo.database.Database <http://api.mongodb.org/python/current/api/pymongo/database.html>`_ class
+    :param autocommit: If `True`, writes get committed right away.
+    :param autocommit_interval: In autocommit mode, batch writes and commit them at most every
+                                `autocommit_interval` seconds (see
+                                :py:class:`blitzdb.backends.base.GroupCommit`).
+    :param autocommit_batch_size: In autocommit mode, batch writes and commit them once
+                                  `autocommit_batch_size` writes are pending.
+    :param bulk_write_size: The maximal number of writes that a commit sends to MongoDB with a
+                            single `bulk_write` call.
+    :param ordered_writes: If `True`, a commit stops at the first write that fails. Otherwise
+                           all other writes get applied. In both cases, a
+                           :py:class:`BulkWriteError` describes the failed writes.
+    :param cursor_batch_size: The number of documents that query sets fetch per round trip
+                              (default: the one of MongoDB).
+
+    Batched writes get committed before every query and when calling :py:meth:`flush`.
 
     Example usage:
 
@@ -68,14 +112,29 @@ class Backend(BaseBackend):
 
     standard_encoders = BaseBackend.standard_encoders + [DotEncoder]
 
-    def __init__(self, db, autocommit=False, use_pk_based_refs=True, **kwargs):
+    def __init__(
+        self,
+        db,
+        autocommit=False,
+        use_pk_based_refs=True,
+        autocommit_interval=None,
+        autocommit_batch_size=None,
+        bulk_write_size=1000,
+        ordered_writes=False,
+        cursor_batch_size=None,
+        **kwargs
+    ):
         super(Backend, self).__init__(**kwargs)
         self.db = db
         self._autocommit = autocommit
+        self._group_commit = GroupCommit(autocommit_interval, autocommit_batch_size)
         self._save_cache = defaultdict(lambda: {})
         self._delete_cache = defaultdict(lambda: {})
         self._update_cache = defaultdict(lambda: {})
         self._use_pk_based_refs = use_pk_based_refs
+        self.bulk_write_size = bulk_write_size
+        self.ordered_writes = ordered_writes
+        self.cursor_batch_size = cursor_batch_size
         self.in_transaction = False
 
     def begin(self):
@@ -84,36 +143,40 @@ class Backend(BaseBackend):
         self.in_transaction = True
 
     def rollback(self, transaction=None):
-        if not self.in_transaction:
+        """Discards all pending writes (including the writes that have been
+        batched in autocommit mode)."""
+        if not self.in_transaction and not self._group_commit.pending:
             raise NotInTransaction("Not in a transaction!")
 
         self._save_cache = defaultdict(lambda: {})
         self._delete_cache = defaultdict(lambda: {})
         self._update_cache = defaultdict(lambda: {})
 
+        self._group_commit.reset()
         self.in_transaction = False
 
     def commit(self, transaction=None):
+        """Commits all pending writes, using one `bulk_write` call per
+        `bulk_write_size` writes of the same kind to the same collection.
+
+        Saves are written first, followed by deletes and updates.
+
+        :raises BulkWriteError: If some of the writes failed.
+        """
         try:
+            requests = []
             for collection, cache in self._save_cache.items():
                 for pk, attributes in cache.items():
-                    try:
-                        self.db[collection].save(attributes)
-                    except:
-                        logger.error(
-                            "Error when saving the document with pk {} in collection {}".format(
-                                attributes["pk"], collection
-                            )
-                        )
-                        logger.error(
-                            "Attributes (excerpt):"
-                            + str(dict(attributes.items()[:100]))
-                        )
-                        raise
+                    request = ReplaceOne({"_id": pk}, attributes, upsert=True)
+                    requests.append((collection, "save", [pk], request))
 
             for collection, cache in self._delete_cache.items():
-                for pk in cache:
-                    self.db[collection].remove({"_id": pk})
+                pks = list(cache)
+                for i in range(0, len(pks), self.bulk_write_size):
+                    j = i + self.bulk_write_size
+                    chunk = pks[i:j]
+                    request = DeleteMany({"_id": {"$in": chunk}})
+                    requests.append((collection, "delete", chunk, request))
 
             for collection, cache in self._update_cache.items():
                 for pk, attributes in cache.items():
@@ -122,15 +185,69 @@ class Backend(BaseBackend):
                         if key in attributes and attributes[key]:
                             update_dict[key] = attributes[key]
                     if update_dict:
-                        self.db[collection].update({"_id": pk}, update_dict)
+                        request = UpdateOne({"_id": pk}, update_dict)
+                        requests.append((collection, "update", [pk], request))
+
+            self.write_requests(requests)
         finally:
             # regardless what happens in the 'commit' operation, we clear the cache
             self._save_cache = defaultdict(lambda: {})
             self._delete_cache = defaultdict(lambda: {})
             self._update_cache = defaultdict(lambda: {})
+            self._group_commit.reset()
 
             self.in_transaction = True
 
+    def write_requests(self, requests):
+        """Sends `(collection, operation, pks, request)` tuples to MongoDB.
+
+        Consecutive requests of the same kind to the same collection get sent
+        with a single `bulk_write` call (of at most `bulk_write_size`
+        requests), so that saves and updates of the same document never end
+        up in the same (possibly unordered) call.
+        """
+        errors = []
+        i = 0
+        while i < len(requests):
+            collection, operation = requests[i][:2]
+            batch = [requests[i]]
+            while (
+                i + len(batch) < len(requests)
+                and len(batch) < self.bulk_write_size
+                and requests[i + len(batch)][:2] == (collection, operation)
+            ):
+                batch.append(requests[i + len(batch)])
+
+            try:
+                self.db[collection].bulk_write(
+                    [request for _, _, _, request in batch], ordered=self.ordered_writes
+                )
+            except PyMongoBulkWriteError as e:
+                logger.error(
+                    "Error when writing to collection {}: {}".format(collection, e)
+                )
+                write_errors = e.details.get("writeErrors", [])
+                for error in write_errors + e.details.get("writeConcernErrors", []):
+                    errors.append(
+                        {
+                            "collection": collection,
+                            "operation": operation,
+                            # write concern errors do not refer to a single write
+                            "pks": batch[error["index"]][2] if "index" in error else [],
+                            "code": error.get("code"),
+                            "message": error.get("errmsg", ""),
+                        }
+                    )
+                if self.ordered_writes and write_errors:
+                    failed = i + write_errors[0]["index"]
+                    unexecuted = [request[:3] for request in requests[failed:]][1:]
+                    raise BulkWriteError(errors, unexecuted)
+
+            i += len(batch)
+
+        if errors:
+            raise BulkWriteError(errors)
+
     @property
     def autocommit(self):
         return self._autocommit
@@ -140,15 +257,37 @@ class Backend(BaseBackend):
         if value not in (True, False):
             raise TypeError("Value must be boolean!")
 
+        if not value:
+            self.flush()
         self._autocommit = value
 
+    @property
+    def write_directly(self):
+        """Whether writes go to the database right away (in autocommit mode
+        without group commits)."""
+        return self.autocommit and not self._group_commit.enabled
+
+    def autocommit_writes(self, operations=1):
+        """Commits batched writes in autocommit mode if a group commit is
+        due."""
+        if self.autocommit and self._group_commit.add(operations):
+            self.commit()
+
+    def flush(self):
+        """Commits all writes that have been batched in autocommit mode."""
+        if self._group_commit.pending:
+            self.commit()
+
     def delete_by_primary_keys(self, cls, pks):
         collection = self.get_collection_for_cls(cls)
-        if self.autocommit:
+        if self.write_directly:
             for pk in pks:
                 self.db[collection].remove({"_id": pk})
         else:
             self._delete_cache[collection].update({pk: True for pk in pks})
+            for pk in pks:
+                self._save_cache[collection].pop(pk, None)
+            self.autocommit_writes(len(pks))
 
     def delete(self, obj):
 
@@ -158,12 +297,13 @@ class Backend(BaseBackend):
         if obj.pk == None:
             raise obj.DoesNotExist
 
-        if self.autocommit:
+        if self.write_directly:
             self.db[collection].remove({"_id": obj.pk})
         else:
             self._delete_cache[collection][obj.pk] = True
             if obj.pk in self._save_cache[collection]:
                 del self._save_cache[collection][obj.pk]
+            self.autocommit_writes()
 
     def save_multiple(self, objs):
         if not objs:
@@ -179,12 +319,16 @@ class Backend(BaseBackend):
             serialized_attributes["_id"] = obj.pk
             serialized_attributes_list.append(serialized_attributes)
         for attributes in serialized_attributes_list:
-            if self.autocommit:
+            if self.write_directly:
                 self.db[collection].save(attributes)
             else:
                 self._save_cache[collection][attributes["pk"]] = attributes
                 if attributes["pk"] in self._delete_cache[collection]:
                     del self._delete_cache[collection][attributes["pk"]]
+                # the saved document replaces earlier (pending) updates
+                self._update_cache[collection].pop(attributes["pk"], None)
+        if not self.write_directly:
+            self.autocommit_writes(len(serialized_attributes_list))
 
     def save(self, obj):
         return self.save_multiple([obj])
@@ -243,13 +387,19 @@ class Backend(BaseBackend):
         if not update_dict:
             return  # nothing to do...
 
-        if self.autocommit:
+        if self.write_directly:
             self.db[collection].update({"_id": obj.pk}, update_dict)
         else:
             if obj.pk in self._delete_cache[collection]:
-                raise obj.DoesNotExist(
-                    "update() on document that is marked for deletion!"
-                )
+                if not self.autocommit:
+                    raise obj.DoesNotExist(
+                        "update() on document that is marked for deletion!"
+                    )
+
+                # the (batched) delete counts as committed in autocommit mode,
+                # so the update goes to the database after it, as it would
+                # without batching
+                self.flush()
 
             if obj.pk in self._update_cache[collection]:
                 update_cache = self._update_cache[collection][obj.pk]
@@ -269,6 +419,7 @@ class Backend(BaseBackend):
                         update_cache["$unset"][key] = ""
             else:
                 self._update_cache[collection][obj.pk] = update_dict
+            self.autocommit_writes()
 
     def serialize(
         self,
@@ -326,6 +477,24 @@ class Backend(BaseBackend):
             self.db[collection].drop_index(list(kwargs["fields"].items()))
             self.db[collection].ensure_index(list(kwargs["fields"].items()), **opts)
 
+    def get_index_info(self, cls_or_collection):
+        """Returns the indexes of a collection (see
+        :py:meth:`blitzdb.backends.base.Backend.get_index_info`)."""
+        if not isinstance(cls_or_collection, six.string_types):
+            collection = self.get_collection_for_cls(cls_or_collection)
+        else:
+            collection = cls_or_collection
+
+        return [
+            {
+                "name": name,
+                "keys": tuple(key for key, direction in info["key"]),
+                "unique": bool(info.get("unique")) or name == "_id_",
+                "ephemeral": False,
+            }
+            for name, info in sorted(self.db[collection].index_information().items())
+        ]
+
     def _canonicalize_query(self, query):
 
         """Transform the query dictionary to replace e.g. documents with
@@ -403,6 +572,7 @@ class Backend(BaseBackend):
             This function supports most query operators that are available in MongoDB and returns
             a query set that is based on a MongoDB cursor.
         """
+        self.flush()
 
         if not isinstance(cls_or_collection, six.string_types):
             collection = self.get_collection_for_cls(cls_or_collection)
@@ -411,7 +581,8 @@ class Backend(BaseBackend):
             collection = cls_or_collection
             cls = self.get_cls_for_collection(collection)
 
-        canonical_query = self._canonicalize_query(query)
+        with self.instrumentation.span("compile", collection):
+            canonical_query = self._canonicalize_query(query)
 
         args = {}
 
@@ -427,4 +598,106 @@ class Backend(BaseBackend):
             self.db[collection].find(canonical_query, **args),
             raw=raw,
             only=only,
+            query=canonical_query,
+            batch_size=self.cursor_batch_size,
         )
+
+    def explain(self, cls_or_collection, query, sort=None, include=None):
+        """Returns how MongoDB runs a query, without running it.
+
+        See :py:meth:`blitzdb.backends.base.Backend.explain` for the parameters.
+
+        `plan` contains the winning plan of the query planner (see the `explain`
+        command of MongoDB). `estimated_count` is the number of documents that
+        the plan returned when the query planner evaluated it. If the server
+        cannot explain queries (e.g. with `mongomock`), there is no plan and
+        `indexes` contains the indexes whose first key the query uses.
+        """
+        if not isinstance(cls_or_collection, six.string_types):
+            collection = self.get_collection_for_cls(cls_or_collection)
+        else:
+            collection = cls_or_collection
+
+        canonical_query = self._canonicalize_query(query)
+        if sort is None:
+            sort_keys = []
+        elif not isinstance(sort, (list, tuple)):
+            sort_keys = [(sort, pymongo.ASCENDING)]
+        else:
+            sort_keys = list(sort)
+
+        result = {
+            "collection": collection,
+            "query": canonical_query,
+            "sort": sort_keys,
+            "plan": None,
+            "indexes": [],
+            "full_scan": None,
+            "estimated_count": None,
+            "warnings": [],
+        }
+        if include:
+            result["warnings"].append(
+                "The MongoDB backend does not support includes, related documents "
+                "get loaded lazily."
+            )
+
+        cursor = self.db[collection].find(canonical_query)
+        if sort_keys:
+            cursor.sort(sort_keys)
+
+        try:
+            explanation = cursor.explain()
+        except (AttributeError, NotImplementedError):
+            query_keys = set(key.split(".")[0] for key in canonical_query)
+            for name, info in self.db[collection].index_information().items():
+                if info["key"][0][0].split(".")[0] in query_keys:
+                    result["indexes"].append(name)
+            return result
+
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        result["plan"] = winning_plan
+        result["full_scan"] = False
+        result["estimated_count"] = explanation.get("executionStats", {}).get(
+            "nReturned"
+        )
+        stages = [winning_plan]
+        while stages:
+            stage = stages.pop(0)
+            warning = None
+            if stage.get("stage") == "IXSCAN":
+                if stage.get("indexName") not in result["indexes"]:
+                    result["indexes"].append(stage.get("indexName"))
+            elif stage.get("stage") == "COLLSCAN":
+                result["full_scan"] = True
+                warning = "Full scan of collection %s." % collection
+            elif stage.get("stage") == "SORT":
+                warning = "Sorting without an index."
+            if warning is not None and warning not in result["warnings"]:
+                result["warnings"].append(warning)
+            if "inputStage" in stage:
+                stages.append(stage["inputStage"])
+            stages.extend(stage.get("inputStages", []))
+        return result
+
+    def distinct(self, cls_or_collection, key, query=None, with_counts=True):
+        """Returns the distinct values of a given key.
+
+        See :py:meth:`blitzdb.backends.base.Backend.distinct`. Without counts,
+        this uses the `distinct` command of MongoDB.
+        """
+        if with_counts:
+            return super(Backend, self).distinct(
+                cls_or_collection, key, query=query, with_counts=True
+            )
+
+        self.flush()
+        if not isinstance(cls_or_collection, six.string_types):
+            collection = self.get_collection_for_cls(cls_or_collection)
+        else:
+            collection = cls_or_collection
+
+        canonical_query = self._canonicalize_query(query or {})
+        values = self.db[collection].distinct(key, canonical_query)
+        groups = sort_groups([{key: value} for value in values], [key])
+        return [group[key] for group in groups]
@@ -1,109 +1,294 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
+from blitzdb.document import Record
 from blitzdb.queryset import QuerySet as BaseQuerySet
 
 
 class QuerySet(BaseQuerySet):
 
-    """"""
+    """A query set that is based on a MongoDB cursor.
 
-    def __init__(self, backend, cls, cursor, raw=False, only=None):
+    The number of documents gets counted only once (and only if it is needed,
+    e.g. for negative indexes). Slices are translated into `skip` and `limit`
+    on a copy of the cursor, so every page of a paginated query costs a
+    single query.
+
+    :param query: The (canonical) query of the cursor.
+    :param skip: The number of documents that the cursor skips.
+    :param limit: The maximal number of documents that the cursor returns
+                  (`None` for no limit).
+    :param batch_size: The number of documents per batch of the cursor.
+    """
+
+    def __init__(
+        self,
+        backend,
+        cls,
+        cursor,
+        raw=False,
+        only=None,
+        query=None,
+        skip=0,
+        limit=None,
+        batch_size=None,
+    ):
         super(QuerySet, self).__init__(backend, cls)
         self._cursor = cursor
         self._raw = raw
         self._only = only
+        self._query = query
+        self._skip = skip
+        self._limit = limit
+        self._batch_size = batch_size
+        self._sort = []
+        self._count = None
+        if batch_size:
+            self._cursor.batch_size(batch_size)
 
     def __iter__(self):
         return self
 
     def __len__(self):
-        return self._cursor.count()
+        if self._count is None:
+            self._count = self.count()
+        return self._count
 
-    def _create_object_for(self, json_attributes):
-        if self._raw:
-            return json_attributes
+    def count(self):
+        """Counts the documents in the query set (on the server, without
+        caching)."""
+        if self._limit == 0:
+            return 0
 
+        collection = self._cursor.collection
+        with self.backend.instrumentation.span(
+            "count", collection.name, query=self._query, plan=self._get_plan()
+        ):
+            if self._query is not None and hasattr(collection, "count_documents"):
+                kwargs = {"skip": self._skip} if self._skip else {}
+                if self._limit is not None:
+                    kwargs["limit"] = self._limit
+                return collection.count_documents(self._query, **kwargs)
+
+            return self._cursor.count(with_limit_and_skip=True)
+
+    def _get_plan(self):
+        return {
+            "sort": [args for args, kwargs in self._sort],
+            "skip": self._skip,
+            "limit": self._limit,
+            "projection": self._only,
+        }
+
+    def _deserialize(self, json_attributes):
         deserialized_attributes = self.backend.deserialize(
             json_attributes, create_instance=False
         )
         if "_id" in deserialized_attributes:
             del deserialized_attributes["_id"]
-        return self.backend.create_instance(self.cls, deserialized_attributes)
+        return deserialized_attributes
+
+    def _create_object_for(self, json_attributes):
+        if self._raw:
+            return json_attributes
+
+        instrumentation = self.backend.instrumentation
+        collection = self._cursor.collection.name
+        with instrumentation.span("decode", collection):
+            deserialized_attributes = self._deserialize(json_attributes)
+        with instrumentation.span("construct", collection):
+            return self.backend.create_instance(self.cls, deserialized_attributes)
+
+    def _fetch(self):
+        """Fetches all documents of the cursor."""
+        with self.backend.instrumentation.span(
+            "execute",
+            self._cursor.collection.name,
+            query=self._query,
+            plan=self._get_plan(),
+        ):
+            documents = list(self._cursor)
+        self.backend.instrumentation.count("documents", len(documents))
+        return documents
 
     def as_list(self):
-        return [self._create_object_for(json) for json in list(self._cursor)]
+        if self._limit == 0:
+            return []
+        return [self._create_object_for(json) for json in self._fetch()]
+
+    def as_records(self):
+        if self._limit == 0:
+            return []
+        return [Record(self._deserialize(json), self.cls) for json in self._fetch()]
 
     def next(self):
+        if self._limit == 0:
+            # an empty slice (MongoDB interprets a limit of 0 as "no limit")
+            raise StopIteration
         json_attributes = next(self._cursor)
         obj = self._create_object_for(json_attributes)
         return obj
 
     __next__ = next
 
+    def _find(self, projection):
+        """Returns a cursor for the documents of the query set that only
+        fetches the given fields."""
+        cursor = self._cursor.collection.find(self._query, projection)
+        for args, kwargs in self._sort:
+            cursor.sort(*args, **kwargs)
+        if self._batch_size:
+            cursor.batch_size(self._batch_size)
+        if self._limit is None:
+            return cursor.skip(self._skip)
+        start, stop = self._skip, self._skip + self._limit
+        return cursor[start:stop]
+
+    def _resolve(self, index):
+        """Turns a negative index into a positive one."""
+        if index is not None and index < 0:
+            index = max(len(self) + index, 0)
+        return index
+
     def __getitem__(self, key):
         if isinstance(key, slice):
-            start, stop, step = key.start, key.stop, key.step
-            if step != None:
+            if key.step is not None:
                 raise IndexError("MongoDB slices do not support slice steps")
 
-            if key.start == None:
-                start = 0
-            if key.stop == None:
-                stop = self._cursor.count()
-            if start < 0:
-                start = self._cursor.count() + start
-            if stop < 0:
-                stop = self._cursor.count() + stop
-            key = slice(start, stop)
-            return self.__class__(
-                self.backend, self.cls, self._cursor.__getitem__(key), raw=self._raw
+            start = self._resolve(key.start) or 0
+            stop = self._resolve(key.stop)
+            if self._limit is not None:
+                stop = self._limit if stop is None else min(stop, self._limit)
+
+            skip = self._skip + start
+            limit = max(stop - start, 0) if stop is not None else None
+            cursor = self._cursor.clone()
+            if limit is not None:
+                stop = skip + limit
+                cursor = cursor[skip:stop]
+            else:
+                cursor = cursor.skip(skip)
+            queryset = self.__class__(
+                self.backend,
+                self.cls,
+                cursor,
+                raw=self._raw,
+                only=self._only,
+                query=self._query,
+                skip=skip,
+                limit=limit,
+                batch_size=self._batch_size,
             )
+            queryset._sort = self._sort
+            return queryset
 
-        if key < 0:
-            key = self._cursor.count() + key
-        json_attributes = self._cursor[key]
-        obj = self._create_object_for(json_attributes)
-        return obj
+        key = self._resolve(key)
+        if self._limit is not None and key >= self._limit:
+            raise IndexError("Index out of range")
+
+        cursor = self._cursor.clone().skip(self._skip + key).limit(-1)
+        for json_attributes in cursor:
+            return self._create_object_for(json_attributes)
+        raise IndexError("Index out of range")
+
+    def _get_pks(self, pks=None):
+        """Returns the primary keys of the documents in the query set (or the
+        ones of `pks` that are in it), fetching only the `_id` fields."""
+        if self._limit == 0:
+            return set()
+
+        if pks is not None and not self._skip and self._limit is None:
+            query = {"_id": {"$in": list(pks)}}
+            if self._query:
+                query = {"$and": [self._query, query]}
+            cursor = self._cursor.collection.find(query, {"_id": True})
+            cursor.limit(len(pks))
+        else:
+            cursor = self._find({"_id": True})
+
+        found_pks = set(json_attributes["_id"] for json_attributes in cursor)
+        return found_pks if pks is None else found_pks & set(pks)
 
     def __contains__(self, obj):
-        pks = self._cursor.distinct("_id")
         if isinstance(obj, list) or isinstance(obj, tuple):
             obj_list = obj
         else:
             obj_list = [obj]
-        for obj in obj_list:
-            if obj.pk not in pks:
-                return False
 
-        return True
+        pks = set(obj.pk for obj in obj_list)
+        return self._get_pks(pks) == pks
+
+    def get_aggregates(self, group_keys, aggregations):
+        """Computes the aggregations with the aggregation pipeline of MongoDB.
+
+        Since the pipeline gets built from the query of the query set, limits
+        and slices of the query set are not taken into account.
+        """
+        if self._query is None or self._skip or self._limit is not None:
+            raise AttributeError("Cannot aggregate a sliced query set!")
+
+        functions = {"sum": "$sum", "avg": "$avg", "min": "$min", "max": "$max"}
+
+        # keys and names can contain dots, so we use positional field names
+        group = {
+            "_id": {"k%d" % i: "$" + key for i, key in enumerate(group_keys)}
+            if group_keys
+            else None
+        }
+        for i, (name, (function, key)) in enumerate(aggregations.items()):
+            if key is None:
+                group["a%d" % i] = {"$sum": 1}
+            elif function == "count":
+                group["a%d" % i] = {
+                    "$sum": {"$cond": [{"$gt": ["$" + key, None]}, 1, 0]}
+                }
+            else:
+                group["a%d" % i] = {functions[function]: "$" + key}
+
+        collection = self.backend.get_collection_for_cls(self.cls)
+        pipeline = [{"$match": self._query}, {"$group": group}]
+
+        results = []
+        for row in self.backend.db[collection].aggregate(pipeline):
+            result = {}
+            for i, key in enumerate(group_keys):
+                result[key] = row["_id"].get("k%d" % i)
+            for i, name in enumerate(aggregations):
+                result[name] = row["a%d" % i]
+            results.append(result)
+        return results
 
     def rewind(self):
         self._cursor.rewind()
 
     def delete(self):
-        self.backend.delete_by_primary_keys(self.cls, self._cursor.distinct("_id"))
+        # (a sliced query set only deletes the documents of its slice)
+        self.backend.delete_by_primary_keys(self.cls, list(self._get_pks()))
+        self._count = None
 
     def sort(self, *args, **kwargs):
         self._cursor.sort(*args, **kwargs)
+        self._sort = self._sort + [(args, kwargs)]
         return self
 
-    def limit(self, *args, **kwargs):
-        self._cursor.limit(*args, **kwargs)
+    def limit(self, limit):
+        self._cursor.limit(limit)
+        # MongoDB interprets a limit of 0 as "no limit"
+        self._limit = limit or None
+        self._count = None
         return self
 
     def filter(self, *args, **kwargs):
         return self.backend.filter(self.cls, *args, initial_keys=self.keys, **kwargs)
 
-    def __len__(self):
-        return self._cursor.count()
-
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __eq__(self, other):
         if isinstance(other, QuerySet):
-            if self.cls == other.cls and set(self._cursor.distinct("_id")) == set(
-                other._cursor.distinct("_id")
+            if (
+                self.cls == other.cls
+                and len(self) == len(other)
+                and self._get_pks() == other._get_pks()
             ):
                 return True
 
@@ -1,14 +1,19 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
+import copy
+import json
 import logging
 import re
+import threading
 import uuid
+import weakref
 from collections import defaultdict
 from types import LambdaType
 
 import six
+from sqlalchemy import inspect
 from sqlalchemy.ext.compiler import compiles
-from sqlalchemy.schema import Column, ForeignKey, MetaData, Table, \
+from sqlalchemy.schema import Column, ForeignKey, Index, MetaData, Table, \
     UniqueConstraint
 from sqlalchemy.sql import and_, expression, func, not_, null, or_, select
 from sqlalchemy.types import Boolean, Date, DateTime, Enum, Float, Integer, \
@@ -26,8 +31,93 @@ from ..file.serializers import JsonSerializer
 from .queryset import QuerySet
 from .relations import ManyToManyProxy
 
+try:
+    from asyncio import current_task
+except ImportError:
+    # (Python < 3.7)
+    current_task = None
+
 logger = logging.getLogger(__name__)
 
+# `re._pattern_type` does not exist anymore in Python 3.7+
+RegexPattern = type(re.compile(""))
+
+# compiled schemas, shared among the backends with the same classes and settings
+# (with `share_schema=True`) as long as one of these backends exists
+schemas = weakref.WeakValueDictionary()
+
+SCHEMA_ATTRIBUTES = (
+    "_collection_tables",
+    "_index_tables",
+    "_relationship_tables",
+    "_index_fields",
+    "_related_fields",
+    "_table_columns",
+    "_excluded_keys",
+    "_foreign_key_backrefs",
+    "_many_to_many_backrefs",
+)
+
+
+class SharedSchema(object):
+
+    """A compiled schema, as shared by backends with `share_schema=True`.
+
+    The tables and the metadata are shared. The maps of the schema (see
+    `SCHEMA_ATTRIBUTES`) get copied for every backend, so that backends
+    never see each other's changes.
+    """
+
+    def __init__(self, backend):
+        memo = {}
+        for attribute in SCHEMA_ATTRIBUTES:
+            value = copy_schema_map(getattr(backend, attribute), memo)
+            setattr(self, attribute, value)
+        self.metadata = backend._metadata
+        self.relationship_classes = [
+            (cls, backend.classes[cls]["collection"])
+            for cls in backend._relationship_classes
+        ]
+
+    def apply(self, backend):
+        memo = {}
+        for attribute in SCHEMA_ATTRIBUTES:
+            value = copy_schema_map(getattr(self, attribute), memo)
+            setattr(backend, attribute, value)
+        backend._metadata = self.metadata
+
+
+def copy_schema_map(value, memo=None):
+    """Copies the (nested) dictionaries and lists of a schema map, but not the
+    tables, columns and fields in them."""
+    if not isinstance(value, (dict, list)):
+        return value
+    if memo is None:
+        memo = {}
+    # (the parameters of related fields refer to each other)
+    if id(value) in memo:
+        return memo[id(value)]
+
+    if isinstance(value, dict):
+        copied = memo[id(value)] = copy.copy(value)
+        for key, item in value.items():
+            copied[key] = copy_schema_map(item, memo)
+    else:
+        copied = memo[id(value)] = list(value)
+        for i, item in enumerate(value):
+            copied[i] = copy_schema_map(item, memo)
+    return copied
+
+
+class ConnectionState(object):
+
+    """The connection and the stack of open transactions of one thread (or,
+    with Python 3.7+, of one asyncio task)."""
+
+    def __init__(self):
+        self.conn = None
+        self.transactions = []
+
 
 @compiles(DateTime, "sqlite")
 def compile_binary_sqlite(type_, compiler, **kw):
@@ -39,6 +129,11 @@ class ExcludedFieldsEncoder(object):
         self.collection = collection
         self.backend = backend
 
+    @property
+    def simple(self):
+        # without excluded keys, the paths of the values do not matter
+        return not self.backend._excluded_keys[self.collection]
+
     def encode(self, obj, path=()):
         if not path:
             return obj
@@ -56,6 +151,18 @@ class Backend(BaseBackend):
 
     :param db: An instance of a `sqlalchemy.
     <http://www.sqlalchemy.org>`_ class
+    :param lazy_batch_size: The maximum number of lazy documents from the same query set that
+                            get loaded together when one of them is accessed. Set to `0` to
+                            load lazy documents one by one.
+    :param share_schema: If `True`, backends with the same document classes and settings
+                         share the tables built by :py:meth:`init_schema` instead of
+                         building them again (each backend gets its own copy of the
+                         field mappings). Defaults to `False`.
+
+    A backend can be shared among threads: every thread (and, with Python 3.7+, every
+    asyncio task) uses its own connection from the pool of the engine and has its own
+    transactions. Tasks do not inherit the connection or the transactions of the task
+    (or thread) that created them.
 
     Example usage:
 
@@ -73,12 +180,17 @@ class Backend(BaseBackend):
     class Meta(BaseBackend.Meta):
         pass
 
+    # (connections and transactions are kept per thread)
+    thread_safe = True
+
     def __init__(
         self,
         engine,
         table_postfix="",
         ondelete="CASCADE",
         create_schema=False,
+        lazy_batch_size=500,
+        share_schema=False,
         **kwargs
     ):
         super(Backend, self).__init__(**kwargs)
@@ -88,15 +200,66 @@ class Backend(BaseBackend):
         self._ondelete = ondelete
         self._schema_initialized = False
         self._relationship_classes = []
-        self._transactions = []
+        self.reset_connection_state()
         self.table_postfix = table_postfix
+        self.lazy_batch_size = lazy_batch_size
+        self.share_schema = share_schema
 
         self.init_schema()
 
         if create_schema:
             self.create_schema()
 
-        self._conn = None
+    def reset_connection_state(self):
+        """Forgets the connections and transactions of all threads.
+
+        Connections and transactions are kept per thread (and per asyncio task
+        with Python 3.7+), so that a single backend can be used by several
+        threads or tasks at the same time, each one with its own connection
+        from the pool of the engine.
+        """
+        self._connection_states = weakref.WeakKeyDictionary()
+
+    def get_connection_owner(self):
+        """Returns the object that the connection state of the caller belongs
+        to: the current asyncio task or, outside of tasks, the current thread.
+
+        The state is not kept in a context variable, since tasks would inherit
+        (and share) the state of the context that they were created in.
+        """
+        if current_task is not None:
+            try:
+                task = current_task()
+            except RuntimeError:
+                # there is no running event loop in this thread
+                task = None
+            if task is not None:
+                return task
+        return threading.current_thread()
+
+    @property
+    def connection_state(self):
+        owner = self.get_connection_owner()
+        state = self._connection_states.get(owner)
+        if state is None:
+            state = self._connection_states[owner] = ConnectionState()
+        return state
+
+    @property
+    def _conn(self):
+        return self.connection_state.conn
+
+    @_conn.setter
+    def _conn(self, conn):
+        self.connection_state.conn = conn
+
+    @property
+    def _transactions(self):
+        return self.connection_state.transactions
+
+    @_transactions.setter
+    def _transactions(self, transactions):
+        self.connection_state.transactions = transactions
 
     @property
     def engine(self):
@@ -178,6 +341,13 @@ class Backend(BaseBackend):
             collection = self.get_collection_for_cls(cls_or_collection)
         return self._table_columns[collection]
 
+    def get_related_fields(self, cls_or_collection):
+        if isinstance(cls_or_collection, six.string_types):
+            collection = cls_or_collection
+        else:
+            collection = self.get_collection_for_cls(cls_or_collection)
+        return self._related_fields[collection]
+
     def get_key_for_column(self, cls_or_collection, key):
         if isinstance(cls_or_collection, six.string_types):
             collection = cls_or_collection
@@ -193,7 +363,53 @@ class Backend(BaseBackend):
     def metadata(self):
         return self._metadata
 
+    def get_schema_key(self):
+        """Returns the key under which the compiled schema of this backend
+        gets shared with other backends."""
+        return (
+            type(self),
+            frozenset(self.collections.items()),
+            self.table_postfix,
+            self._ondelete,
+        )
+
+    @classmethod
+    def clear_schema_cache(cls):
+        """Forgets all shared schemas, e.g. after document classes have been
+        modified."""
+        schemas.clear()
+
     def init_schema(self):
+        for cls in self._relationship_classes:
+            self.unregister(cls)
+
+        self._relationship_classes = []
+        self._include_plans = {}
+        self._schema_initialized = True
+
+        self._shared_schema = None
+        schema_key = self.get_schema_key()
+        schema = schemas.get(schema_key) if self.share_schema else None
+        if schema is not None:
+            # another backend already built the schema for these classes
+            schema.apply(self)
+            for cls, collection in schema.relationship_classes:
+                self._relationship_classes.append(cls)
+                self.register(
+                    cls, parameters={"collection": collection}, overwrite=True
+                )
+            self._shared_schema = schema
+            return
+
+        self.build_schema()
+
+        if self.share_schema:
+            schema = SharedSchema(self)
+            schemas[schema_key] = schema
+            # (the schema is kept as long as one of its backends exists)
+            self._shared_schema = schema
+
+    def build_schema(self):
         self._collection_tables = {}
         self._index_tables = defaultdict(dict)
         self._relationship_tables = defaultdict(dict)
@@ -204,12 +420,7 @@ class Backend(BaseBackend):
         self._foreign_key_backrefs = defaultdict(dict)
         self._many_to_many_backrefs = defaultdict(dict)
         self._metadata = MetaData()
-        self._schema_initialized = True
-
-        for cls in self._relationship_classes:
-            self.unregister(cls)
 
-        self._relationship_classes = []
         for collection, cls in list(self.collections.items()):
             if cls.__dict__.get("__abstract__"):
                 # we skip abstract base classes...
@@ -566,6 +777,18 @@ class Backend(BaseBackend):
                 name = "unique_together_%s_%s" % (collection, "_".join(columns))
                 extra_columns.append(UniqueConstraint(*columns, name=name))
 
+        if "indexes" in meta_attributes:
+            for params in meta_attributes["indexes"]:
+                columns = self.get_index_columns(collection, params["fields"])
+                opts = params.get("opts", {})
+                extra_columns.append(
+                    Index(
+                        opts.get("name") or self.get_index_name(collection, columns),
+                        *columns,
+                        unique=opts.get("unique", False)
+                    )
+                )
+
         if table is None:
             table = Table(
                 "%s%s" % (collection, self.table_postfix),
@@ -624,14 +847,12 @@ class Backend(BaseBackend):
 
     def replace_engine(self, engine):
         self._engine = engine
-        self._conn = None
-        self._transactions = []
+        self.reset_connection_state()
 
     def replace_engine_getter(self, engine_getter):
         self._engine_getter = engine_getter
         self._engine = None
-        self._conn = None
-        self._transactions = []
+        self.reset_connection_state()
 
     def create_schema(self, indexes=None):
         if not self._schema_initialized:
@@ -1046,7 +1267,7 @@ class Backend(BaseBackend):
                 saved_obj.backend = backend
             raise
 
-    def initialize_relations(self, obj, data=None):
+    def initialize_relations(self, obj, data=None, loader=None):
 
         if data is None:
             data = obj.attributes
@@ -1086,8 +1307,16 @@ class Backend(BaseBackend):
                         }
                     try:
                         d, lazy_foreign_obj = self.deserialize_db_data(foreign_key_data)
+                        if lazy_foreign_obj and loader is not None and "pk" in d:
+                            db_loader = loader.get_db_loader(params["class"], d["pk"])
+                        else:
+                            db_loader = None
                         foreign_obj = self.create_instance(
-                            params["class"], d, lazy=lazy_foreign_obj
+                            params["class"],
+                            d,
+                            lazy=lazy_foreign_obj,
+                            db_loader=db_loader,
+                            loader=loader,
                         )
                     except:
                         logger.warning(
@@ -1132,6 +1361,17 @@ class Backend(BaseBackend):
                             set_value(data, key, qs[0])
                         except IndexError:
                             set_value(data, key, None)
+                    elif loader is not None:
+                        set_value(
+                            data,
+                            key,
+                            self.create_instance(
+                                params["class"],
+                                {},
+                                lazy=True,
+                                db_loader=loader.get_backref_loader(params, data["pk"]),
+                            ),
+                        )
                     else:
 
                         def db_loader(params=params, qs=qs):
@@ -1322,8 +1562,38 @@ class Backend(BaseBackend):
             set_value(d, key, value)
         return d, lazy
 
+    def copy_relation_paths(self, collection, attributes):
+        """Copies the dicts that contain nested relation keys (e.g.
+        `credits.director`), as :py:meth:`initialize_relations` replaces the
+        values of these keys and the dicts can be shared with the caller
+        (e.g. the data of a reference that gets deserialized).
+
+        :returns: The attributes, which are copied as well if necessary.
+        """
+        nested_keys = [key for key in self._related_fields[collection] if "." in key]
+        if not nested_keys or attributes is None:
+            return attributes
+
+        attributes = dict(attributes)
+        for key in nested_keys:
+            current_dict = attributes
+            for key_fragment in key.split(".")[:-1]:
+                value = current_dict.get(key_fragment)
+                if not isinstance(value, dict):
+                    break
+                value = dict(value)
+                current_dict[key_fragment] = value
+                current_dict = value
+        return attributes
+
     def create_instance(
-        self, cls_or_collection, attributes, lazy=False, db_loader=None
+        self,
+        cls_or_collection,
+        attributes,
+        lazy=False,
+        db_loader=None,
+        loader=None,
+        attribute_loader=None,
     ):
 
         if not isinstance(cls_or_collection, six.string_types):
@@ -1339,9 +1609,11 @@ class Backend(BaseBackend):
             lazy=lazy,
             deserialize=False,
             db_loader=db_loader,
+            attribute_loader=attribute_loader,
         )
         # then, we initialize it with the relationship data
-        self.initialize_relations(obj, attributes)
+        attributes = self.copy_relation_paths(collection, attributes)
+        self.initialize_relations(obj, attributes, loader=loader)
         # then, we deserialize the attributes and assign them to the object
         obj.attributes = self.deserialize(attributes)
         # finally, we call the after_load hook
@@ -1349,14 +1621,136 @@ class Backend(BaseBackend):
 
         return obj
 
-    def create_index(self, cls_or_collection, *args, **kwargs):
+    def get_index_columns(self, collection, fields):
+        """Returns the columns of the keys of an index.
+
+        :param fields: A dictionary that maps the keys of the index to their
+                       order, as for the MongoDB backend.
+        """
+        columns = []
+        for key in fields:
+            try:
+                columns.append(self.get_column_for_key(collection, key))
+            except KeyError:
+                raise AttributeError(
+                    "Cannot index key %s of collection %s, since it has no column "
+                    "(declare a field for it with `indexed=True`)!" % (key, collection)
+                )
+        return columns
+
+    def get_index_name(self, collection, columns):
+        return "ix_%s%s_%s" % (collection, self.table_postfix, "_".join(columns))
+
+    def create_index(self, cls_or_collection, fields=None, opts=None):
+        """Creates an index over one or more columns of a collection in the
+        database.
+
+        :param fields: A dictionary that maps the keys of the index to their
+                       order, as for the MongoDB backend (use an `OrderedDict`
+                       for composite indexes). The orders are ignored, since
+                       the database can read an index in both directions.
+        :param opts: The options of the index (`name` and `unique`).
+
+        Only keys with a column (i.e. the keys of fields) can be indexed.
+        Indexes can also be declared in the `indexes` meta attribute of a
+        document class (a list of the parameters of this function), so that
+        they get created with the schema.
+        """
+        if not fields:
+            raise AttributeError(
+                "You must specify the 'fields' parameter when creating an index!"
+            )
+
         if not isinstance(cls_or_collection, six.string_types):
             collection = self.get_collection_for_cls(cls_or_collection)
         else:
             collection = cls_or_collection
-        self.db[collection].ensure_index(*args, **kwargs)
 
-    def get(self, cls_or_collection, query, raw=False, only=None, include=None):
+        opts = opts or {}
+        table = self._collection_tables[collection]
+        columns = self.get_index_columns(collection, fields)
+        name = opts.get("name") or self.get_index_name(collection, columns)
+
+        index = Index(
+            name,
+            *[table.c[column] for column in columns],
+            unique=opts.get("unique", False)
+        )
+        # the table can be shared with backends of other databases (see
+        # `share_schema`), so the index only gets created in this database
+        table.indexes.discard(index)
+
+        with self.transaction():
+            existing_indexes = inspect(self.connection).get_indexes(table.name)
+            if name not in [existing["name"] for existing in existing_indexes]:
+                index.create(bind=self.connection)
+        return index
+
+    def get_index_info(self, cls_or_collection):
+        """Returns the indexes of a collection (see
+        :py:meth:`blitzdb.backends.base.Backend.get_index_info`), including
+        its primary key and its unique constraints.
+
+        The indexes are read from the database, since indexes created with
+        :py:meth:`create_index` are not part of the schema of the backend.
+        """
+        if not isinstance(cls_or_collection, six.string_types):
+            collection = self.get_collection_for_cls(cls_or_collection)
+        else:
+            collection = cls_or_collection
+
+        table = self._collection_tables[collection]
+        keys = {
+            params["column"]: key
+            for key, params in self._table_columns[collection].items()
+        }
+
+        def get_keys(columns):
+            return tuple(keys.get(column, column) for column in columns)
+
+        with self.transaction():
+            inspector = inspect(self.connection)
+            primary_key = inspector.get_pk_constraint(table.name)
+            existing_indexes = inspector.get_indexes(table.name)
+            unique_constraints = inspector.get_unique_constraints(table.name)
+
+        indexes = [
+            {
+                "name": "pk",
+                "keys": get_keys(primary_key["constrained_columns"]),
+                "unique": True,
+                "ephemeral": False,
+            }
+        ]
+        for index in sorted(existing_indexes, key=lambda index: index["name"]):
+            indexes.append(
+                {
+                    "name": index["name"],
+                    "keys": get_keys(index["column_names"]),
+                    "unique": bool(index["unique"]),
+                    "ephemeral": False,
+                }
+            )
+        for constraint in unique_constraints:
+            indexes.append(
+                {
+                    "name": constraint["name"],
+                    "keys": get_keys(constraint["column_names"]),
+                    "unique": True,
+                    "ephemeral": False,
+                }
+            )
+        return indexes
+
+    def get(
+        self,
+        cls_or_collection,
+        query,
+        raw=False,
+        only=None,
+        include=None,
+        include_strategy=None,
+    ):
 
         if not isinstance(cls_or_collection, six.string_types):
             collection = self.get_collection_for_cls(cls_or_collection)
@@ -1366,7 +1760,12 @@ class Backend(BaseBackend):
             cls = self.get_cls_for_collection(collection)
 
         result = self.filter(
-            cls_or_collection, query, raw=raw, only=only, include=include
+            cls_or_collection,
+            query,
+            raw=raw,
+            only=only,
+            include=include,
+            include_strategy=include_strategy,
         )
         try:
             if len(result) > 1:
@@ -1378,12 +1777,29 @@ class Backend(BaseBackend):
         except IndexError:
             raise cls.DoesNotExist
 
-    def filter(self, cls_or_collection, query, raw=False, only=None, include=None):
+    def filter(
+        self,
+        cls_or_collection,
+        query,
+        raw=False,
+        only=None,
+        include=None,
+        include_strategy=None,
+    ):
         """Filter objects from the database that correspond to a given set of
         properties.
 
         See :py:meth:`blitzdb.backends.base.Backend.filter` for documentation of individual parameters
 
+        :param include_strategy: How included many-to-many and one-to-many relations get loaded.
+                                 `"join"` joins them into the main query, `"select"` loads them
+                                 with one separate `WHERE ... IN (...)` query per relation. Pass a
+                                 dictionary to choose the strategy per include path (e.g.
+                                 `{"movies": "select", "movies.cast": "join"}`). By default, the
+                                 separate queries are used as soon as more than one to-many
+                                 relation is included, since joining them would multiply the
+                                 number of fetched rows.
+
         .. note::
 
             This function supports all query operators that are available in SQLAlchemy and returns a query set
@@ -1723,7 +2139,7 @@ class Backend(BaseBackend):
             for key, value in query.items():
                 for field_name, params in self._index_fields[collection].items():
                     if key == field_name:
-                        if isinstance(value, re._pattern_type):
+                        if isinstance(value, RegexPattern):
                             value = {"$regex": value.pattern}
                         if isinstance(value, dict):
                             # this is a special query
@@ -1965,7 +2381,8 @@ class Backend(BaseBackend):
 
             return where_statements
 
-        compiled_query = compile_query(collection, query)
+        with self.instrumentation.span("compile", collection, filter=query):
+            compiled_query = compile_query(collection, query)
 
         if len(compiled_query) > 1:
             compiled_query = and_(*compiled_query)
@@ -1984,5 +2401,129 @@ class Backend(BaseBackend):
             group_bys=group_bys,
             only=only,
             include=include,
+            include_strategy=include_strategy,
             havings=havings,
+            query=query,
         )
+
+    def explain(self, cls_or_collection, query, sort=None, include=None):
+        """Returns how the database runs a query, without running it.
+
+        See :py:meth:`blitzdb.backends.base.Backend.explain` for the parameters.
+
+        The result contains the generated SQL (`sql`, with its `params`). On
+        SQLite, `plan` contains the lines of `EXPLAIN QUERY PLAN`, on
+        PostgreSQL the output of `EXPLAIN (FORMAT JSON)`, from which the
+        `estimated_count` is taken (SQLite does not estimate row counts).
+        Other databases return no plan.
+
+        Conditions over keys without a column (which the backend cannot
+        query) and sort keys without a column are left out of the plan, with
+        a warning for each of them.
+        """
+        warnings = []
+        queryable_query = {}
+        for key, value in query.items():
+            try:
+                self.filter(cls_or_collection, {key: value})
+            except AttributeError as e:
+                warnings.append("%s The plan leaves out this condition." % e)
+            else:
+                queryable_query[key] = value
+
+        qs = self.filter(cls_or_collection, queryable_query, include=include)
+        if sort is not None:
+            if not isinstance(sort, (list, tuple)):
+                sort = [(sort, QuerySet.ASCENDING)]
+            collection = self.get_collection_for_cls(qs.cls)
+            sortable = []
+            for key, order in sort:
+                try:
+                    self.filter(collection, {}).sort([(key, order)]).get_select()
+                except KeyError:
+                    warnings.append(
+                        "Sort over non-indexed field %s in collection %s! The plan "
+                        "leaves out this sort key." % (key, collection)
+                    )
+                else:
+                    sortable.append((key, order))
+            if sortable:
+                qs = qs.sort(sortable)
+
+        with self.transaction():
+            compiled = qs.get_select().compile(dialect=self.engine.dialect)
+            sql = six.text_type(compiled)
+            result = {
+                "collection": self.get_collection_for_cls(qs.cls),
+                "query": query,
+                "sql": sql,
+                "params": compiled.params,
+                "plan": None,
+                "indexes": [],
+                "full_scan": None,
+                "estimated_count": None,
+                "warnings": warnings,
+            }
+
+            dialect = self.engine.dialect.name
+            if dialect == "sqlite":
+                params = [compiled.params[name] for name in compiled.positiontup]
+                rows = self.connection.execute("EXPLAIN QUERY PLAN " + sql, *params)
+                self._explain_sqlite_plan(result, [row[-1] for row in rows])
+            elif dialect == "postgresql":
+                row = self.connection.execute(
+                    "EXPLAIN (FORMAT JSON) " + sql, compiled.params
+                ).first()
+                plan = row[0]
+                if isinstance(plan, six.string_types):
+                    plan = json.loads(plan)
+                self._explain_postgresql_plan(result, plan)
+
+        # several rows of a plan can produce the same warning
+        warnings = []
+        for warning in result["warnings"]:
+            if warning not in warnings:
+                warnings.append(warning)
+        result["warnings"] = warnings
+        return result
+
+    def _explain_sqlite_plan(self, result, details):
+        result["plan"] = details
+        result["full_scan"] = False
+        for detail in details:
+            match = re.match(
+                r"^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS \S+)?"
+                r"(?: USING (?:COVERING )?INDEX (\S+))?",
+                detail,
+            )
+            if match:
+                operation, table, index = match.groups()
+                if index is not None and index not in result["indexes"]:
+                    result["indexes"].append(index)
+                if operation == "SCAN":
+                    # (a scan using an index reads the whole index)
+                    result["full_scan"] = True
+                    result["warnings"].append(
+                        "Full scan of table %s%s."
+                        % (table, " using index %s" % index if index else "")
+                    )
+            elif detail.startswith("USE TEMP B-TREE FOR ORDER BY"):
+                result["warnings"].append("Sorting without an index.")
+
+    def _explain_postgresql_plan(self, result, plan):
+        result["plan"] = plan
+        result["full_scan"] = False
+        root = plan[0]["Plan"]
+        result["estimated_count"] = root.get("Plan Rows")
+        nodes = [root]
+        while nodes:
+            node = nodes.pop(0)
+            if "Index Name" in node:
+                if node["Index Name"] not in result["indexes"]:
+                    result["indexes"].append(node["Index Name"])
+            elif node.get("Node Type") == "Seq Scan":
+                result["full_scan"] = True
+                result["warnings"].append(
+                    "Full scan of table %s." % node.get("Relation Name")
+                )
+            nodes.extend(node.get("Plans", []))
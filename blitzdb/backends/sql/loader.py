@@ -0,0 +1,154 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+from collections import OrderedDict, defaultdict
+
+
+class BatchLoader(object):
+
+    """Loads lazy documents that belong to the same query set in batches.
+
+    Every lazy foreign key document (and every lazy unique one-to-many
+    backreference) that gets created while deserializing the results of a
+    query set registers its primary key (or the primary key of the owning
+    document) with the loader of that query set. When the first of these
+    documents gets loaded, the loader fetches all pending documents of the
+    same kind with a single `WHERE ... IN (...)` query, so that iterating
+    over a query set and touching a lazy relation of every document costs
+    one query per batch instead of one query per document.
+
+    Likewise, documents that have been fetched with only some of their fields
+    register with the loader, which then fetches a missing attribute for all
+    of them with a single query that only selects the column(s) of that
+    attribute (see :py:meth:`get_attribute_loader`).
+
+    :param backend: The SQL backend to load the documents from.
+    :param batch_size: The maximum number of documents fetched by one query.
+    """
+
+    def __init__(self, backend, batch_size=500):
+        self.backend = backend
+        self.batch_size = batch_size
+        self._pending = defaultdict(OrderedDict)
+        self._rows = defaultdict(dict)
+        self._partial = defaultdict(OrderedDict)
+
+    def get_db_loader(self, cls, pk):
+        """Returns a `db_loader` for a lazy document of class `cls` with the
+        given primary key."""
+
+        def get_obj(rows):
+            if not rows:
+                raise cls.DoesNotExist
+
+            qs, row = rows[0]
+            return qs.deserialize(row)
+
+        return self._get_loader((cls, "pk"), pk, get_obj)
+
+    def get_backref_loader(self, params, pk):
+        """Returns a `db_loader` for the unique one-to-many relation described
+        by `params` of the document with the given primary key."""
+
+        def get_obj(rows):
+            if not rows:
+                raise params["class"].DoesNotExist
+
+            if len(rows) > 1:
+                raise params["class"].MultipleDocumentsReturned
+
+            qs, row = rows[0]
+            return qs.deserialize(row)
+
+        source = (params["class"], params["backref"]["key"])
+        return self._get_loader(source, pk, get_obj)
+
+    def get_attribute_loader(self, cls, pk):
+        """Returns an `attribute_loader` for a partially loaded document of
+        class `cls` with the given primary key.
+
+        The loader returns the attributes that have been fetched together with
+        the requested one, or `None` if the attribute cannot be fetched on its
+        own (e.g. a many-to-many relation), in which case the document gets
+        loaded completely.
+        """
+        self._partial[cls][pk] = True
+        for source in self._pending:
+            if source[0] is cls and len(source) > 2:
+                self._pending[source][pk] = True
+
+        def attribute_loader(key):
+            include = self._get_attribute_include(cls, key)
+            if include is None:
+                # the document gets loaded completely
+                self._partial[cls].pop(pk, None)
+                return None
+
+            source = (cls, "pk", include)
+            if source not in self._pending:
+                # the first query for an attribute fetches it for all partially
+                # loaded documents (and the ones that get registered later)
+                self._pending[source].update(self._partial[cls])
+            rows = self._load(source, pk)
+            if not rows:
+                self._partial[cls].pop(pk, None)
+                raise cls.DoesNotExist
+
+            qs, row = rows[0]
+            return qs.deserialize(row).lazy_attributes
+
+        return attribute_loader
+
+    def _get_attribute_include(self, cls, key):
+        collection = self.backend.get_collection_for_cls(cls)
+        if key not in self.backend._related_fields[collection]:
+            # an indexed field is fetched from its column(s), any other
+            # attribute from the `data` column
+            return (key,)
+
+        if key in self.backend._table_columns[collection]:
+            # for a foreign key, we only fetch the primary key of the related document
+            return ((key, "pk"),)
+
+        return None
+
+    def _get_loader(self, source, value, get_obj):
+        self._pending[source][value] = True
+        state = {"loaded": False}
+
+        def db_loader():
+            if state["loaded"]:
+                # an explicit `revert` should always return the current database state
+                rows = self._fetch(source, [value]).get(value, [])
+            else:
+                state["loaded"] = True
+                rows = self._load(source, value)
+            return get_obj(rows)
+
+        return db_loader
+
+    def _load(self, source, value):
+        rows = self._rows[source]
+        if value not in rows:
+            values = [value]
+            for pending_value in self._pending[source]:
+                if len(values) >= self.batch_size:
+                    break
+
+                if pending_value != value and pending_value not in rows:
+                    values.append(pending_value)
+            fetched_rows = self._fetch(source, values)
+            for v in values:
+                rows[v] = fetched_rows.get(v, [])
+                if v in self._pending[source]:
+                    del self._pending[source][v]
+        return rows[value]
+
+    def _fetch(self, source, values):
+        cls, key = source[:2]
+        include = source[2] if len(source) > 2 else None
+        qs = self.backend.filter(cls, {key: {"$in": values}}, include=include)
+        qs.get_objects()
+        fetched_rows = defaultdict(list)
+        for row in qs.objects:
+            fetched_rows[row[key]].append((qs, row))
+        return fetched_rows
@@ -10,11 +10,13 @@ from sqlalchemy.sql.expression import asc, desc, nullsfirst, nullslast, \
     outerjoin
 from sqlalchemy.sql.functions import Function as SqlFunction
 
-from blitzdb.document import Document
+from blitzdb.document import Document, Record
 from blitzdb.fields import ForeignKeyField, ManyToManyField, OneToManyField
-from blitzdb.helpers import get_value
+from blitzdb.helpers import get_value, set_value
 from blitzdb.queryset import QuerySet as BaseQuerySet
 
+from .loader import BatchLoader
+
 
 class QuerySet(BaseQuerySet):
     def __init__(
@@ -26,6 +28,7 @@ class QuerySet(BaseQuerySet):
         intersects=None,
         raw=False,
         include=None,
+        include_strategy=None,
         only=None,
         joins=None,
         group_bys=None,
@@ -34,6 +37,7 @@ class QuerySet(BaseQuerySet):
         havings=None,
         limit=None,
         offset=None,
+        query=None,
     ):
         super(QuerySet, self).__init__(backend=backend, cls=cls)
 
@@ -43,6 +47,8 @@ class QuerySet(BaseQuerySet):
         self.havings = havings
         self.only = only
         self.include = include
+        self.include_strategy = include_strategy
+        self.separate_includes = OrderedDict()
         self.group_bys = group_bys
         self.cls = cls
         self._limit = limit
@@ -50,6 +56,8 @@ class QuerySet(BaseQuerySet):
         self.table = table
         self.raw = raw
         self.intersects = intersects
+        # the query document of the query set (if any), for the instrumentation
+        self.query = query
         self.objects = objects
         if self.objects:
             self.pop_objects = self.objects[:]
@@ -71,12 +79,28 @@ class QuerySet(BaseQuerySet):
         if isinstance(data, Document):
             return data
 
-        d, lazy = self.backend.deserialize_db_data(data)
+        instrumentation = self.backend.instrumentation
+        collection = self.backend.get_collection_for_cls(self.cls)
+        with instrumentation.span("decode", collection):
+            d, lazy = self.backend.deserialize_db_data(data)
 
         if self.raw:
             return d
 
-        obj = self.backend.create_instance(self.cls, d, lazy=lazy)
+        if lazy and self.loader is not None and "pk" in d:
+            # the document has been fetched with only some of its fields
+            attribute_loader = self.loader.get_attribute_loader(self.cls, d["pk"])
+        else:
+            attribute_loader = None
+
+        with instrumentation.span("construct", collection):
+            obj = self.backend.create_instance(
+                self.cls,
+                d,
+                lazy=lazy,
+                loader=self.loader,
+                attribute_loader=attribute_loader,
+            )
 
         return obj
 
@@ -118,7 +142,6 @@ class QuerySet(BaseQuerySet):
             self.get_deserialized_objects()
         for obj in self.deserialized_objects:
             yield obj
-        raise StopIteration
 
     def __contains__(self, obj):
         # todo: optimize this so we don't go to the database
@@ -145,6 +168,82 @@ class QuerySet(BaseQuerySet):
 
     def get_select(self, columns=None, with_joins=True):
 
+        plan = self.include_plan = self.get_include_plan()
+        self.include_joins = plan["include_joins"]
+        self.separate_includes = plan["separate_includes"]
+        column_map = plan["column_map"]
+
+        select_table = self.table
+
+        if plan["joins"] and with_joins:
+            for i, j in enumerate(plan["joins"]):
+                select_table = select_table.outerjoin(*j)
+
+        bare_select = self.get_bare_select(columns=[self.table.c.pk])
+
+        s = (
+            select(
+                [column_map[key] for key in columns]
+                if columns is not None
+                else plan["all_columns"]
+            )
+            .select_from(select_table)
+            .where(column_map["pk"].in_(bare_select))
+        )
+
+        # we order again, this time including the joined columns
+        if self.order_bys:
+            s = s.order_by(
+                *[direction(column_map[key]) for (key, direction) in self.order_bys]
+            )
+
+        return s
+
+    def get_include_plan(self):
+        """Returns the include plan of this query set, i.e. the join tree, the
+        selected (labeled) columns and the field map that is used to fold
+        result rows back into nested objects.
+
+        The plan only depends on the class, the table and the shape of the
+        `include`, `only`, `order_bys` and `include_strategy` arguments, so it
+        is cached by the backend and shared among all query sets with the same
+        shape. The cache gets cleared when the schema is (re)initialized.
+        """
+
+        def freeze(value):
+            if isinstance(value, (list, tuple)):
+                return tuple(freeze(v) for v in value)
+
+            elif isinstance(value, dict):
+                return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+
+            elif isinstance(value, (set, frozenset)):
+                return tuple(sorted(value))
+
+            return value
+
+        order_by_keys = tuple(key for key, direction in self.order_bys or ())
+        include_plans = self.backend._include_plans
+        try:
+            plan_key = (
+                self.cls,
+                self.table,
+                freeze(self.include),
+                freeze(self.only),
+                order_by_keys,
+                freeze(self.include_strategy),
+            )
+            plan = include_plans.get(plan_key)
+        except TypeError:
+            # unhashable include/only arguments, we do not cache the plan
+            return self.build_include_plan()
+
+        if plan is None:
+            plan = include_plans[plan_key] = self.build_include_plan()
+        return plan
+
+    def build_include_plan(self):
+
         all_columns = []
         column_map = {}
         joins = []
@@ -229,6 +328,113 @@ class QuerySet(BaseQuerySet):
                 related_collection, related_table, params, key_path
             )
 
+        def compile_node(params, column_index):
+            pk_index = column_index[params["table_fields"]["pk"]]
+            fields = [
+                (column_index[label], key)
+                for key, label in params["table_fields"].items()
+                if key not in params["joins"] and label in column_index
+            ]
+            children = []
+            for name, join_params in sorted(
+                params["joins"].items(), key=lambda i: i[0]
+            ):
+                to_many = isinstance(
+                    join_params["relation"]["field"], (ManyToManyField, OneToManyField)
+                )
+                children.append(
+                    (name, to_many, compile_node(join_params, column_index))
+                )
+            to_many_names = [name for name, to_many, node in children if to_many]
+            return (
+                pk_index,
+                fields,
+                params["lazy"],
+                params["collection"],
+                to_many_names,
+                children,
+            )
+
+        def compile_fold(params):
+            """Compiles a function that folds the flat result rows of the
+            select back into (nested) documents.
+
+            All row positions get resolved once per include plan, so that
+            folding a row boils down to a few tuple lookups per joined table.
+            """
+            column_index = {column.name: i for i, column in enumerate(all_columns)}
+            root = compile_node(params, column_index)
+
+            def make_entry(node, row):
+                pk_index, fields, lazy, collection, to_many_names, children = node
+                d = {"__lazy__": lazy, "__collection__": collection}
+                for i, key in fields:
+                    d[key] = row[i]
+                for name in to_many_names:
+                    d[name] = []
+                # the entry keeps track of the related documents we've seen so far
+                return d, {}
+
+            def fold_children(entry, children, row):
+                d, related = entry
+                for name, to_many, node in children:
+                    pk_value = row[node[0]]
+                    if to_many:
+                        if pk_value is None:
+                            continue
+                        seen = related.get(name)
+                        if seen is None:
+                            seen = related[name] = {}
+                        child = seen.get(pk_value)
+                        if child is None:
+                            child = seen[pk_value] = make_entry(node, row)
+                            d[name].append(child[0])
+                    else:
+                        if pk_value is None:
+                            # we set the key value to "None", to indicate that the FK is None
+                            d[name] = None
+                            continue
+                        child = related.get(name)
+                        if child is None:
+                            child = related[name] = make_entry(node, row)
+                            d[name] = child[0]
+                    if node[5]:
+                        fold_children(child, node[5], row)
+
+            def fold(rows):
+                pk_index, children = root[0], root[5]
+                entries = OrderedDict()
+                for row in rows:
+                    pk_value = row[pk_index]
+                    entry = entries.get(pk_value)
+                    if entry is None:
+                        entry = entries[pk_value] = make_entry(root, row)
+                    if children:
+                        fold_children(entry, children, row)
+                return [d for d, related in entries.values()]
+
+            def fold_flat(rows):
+                pk_index, fields, lazy, collection = root[:4]
+                keys = [key for i, key in fields]
+                entries = OrderedDict()
+                for row in rows:
+                    pk_value = row[pk_index]
+                    if pk_value not in entries:
+                        d = dict(zip(keys, row))
+                        d["__lazy__"] = lazy
+                        d["__collection__"] = collection
+                        entries[pk_value] = d
+                return list(entries.values())
+
+            # without joins every row holds the fields of a single document
+            # in the order of the columns, so we can zip them right away
+            # (iterating over a row is cheaper than indexing it repeatedly)
+            if not root[5] and [i for i, key in root[1]] == list(
+                range(len(all_columns))
+            ):
+                return fold_flat
+            return fold
+
         if self.include:
             include = copy.deepcopy(self.include)
             if isinstance(include, tuple):
@@ -255,176 +461,186 @@ class QuerySet(BaseQuerySet):
                 if not only_key in include:
                     include.append(only_key)
 
+        include, separate_includes = self.split_includes(include)
+
         order_by_keys = []
         if self.order_bys:
             for key, direction in self.order_bys:
                 order_by_keys.append(key)
 
-        self.include_joins = self.backend.get_include_joins(
+        include_joins = self.backend.get_include_joins(
             self.cls, includes=include, excludes=exclude, order_by_keys=order_by_keys
         )
 
-        # we only select the columns that we actually need
-        my_columns = list(self.include_joins["fields"].values()) + [
-            params["relation"]["column"]
-            for params in self.include_joins["joins"].values()
-            if isinstance(params["relation"]["field"], ForeignKeyField)
-        ]
-
         process_fields_and_subkeys(
-            self.include_joins["collection"], self.table, self.include_joins, []
+            include_joins["collection"], self.table, include_joins, []
         )
 
-        select_table = self.table
+        return {
+            "include_joins": include_joins,
+            "separate_includes": separate_includes,
+            "joins": joins,
+            "all_columns": all_columns,
+            "column_map": column_map,
+            "fold": compile_fold(include_joins),
+        }
+
+    def get_include_strategy(self, path, to_many_count):
+        if isinstance(self.include_strategy, dict):
+            if path in self.include_strategy:
+                return self.include_strategy[path]
+
+        elif self.include_strategy is not None:
+            return self.include_strategy
+
+        # joining more than one to-many relation multiplies the number of rows
+        return "select" if to_many_count > 1 else "join"
+
+    def split_includes(self, include):
+        """Splits the given includes into the ones that get joined into the main
+        select and the many-to-many/one-to-many relations that get loaded with
+        separate queries (see :py:meth:`load_separate_includes`)."""
+
+        def parse_include(include):
+            if isinstance(include, (tuple, list)):
+                return include[0], list(include[1:])
+
+            return include, []
+
+        def is_to_many(params):
+            return isinstance(params["field"], (ManyToManyField, OneToManyField))
+
+        def count_to_many(include, collection):
+            main_include, sub_includes = parse_include(include)
+            related_fields = self.backend.get_related_fields(collection)
+            if main_include == "*":
+                return len([p for p in related_fields.values() if is_to_many(p)])
+
+            if main_include not in related_fields:
+                return 0
+
+            params = related_fields[main_include]
+            return (1 if is_to_many(params) else 0) + sum(
+                count_to_many(sub_include, params["collection"])
+                for sub_include in sub_includes
+            )
 
-        if joins and with_joins:
-            for i, j in enumerate(joins):
-                select_table = select_table.outerjoin(*j)
+        related_fields = self.backend.get_related_fields(self.cls)
+        to_many_count = sum(count_to_many(i, self.cls) for i in include)
 
-        bare_select = self.get_bare_select(columns=[self.table.c.pk])
+        joined_includes = []
+        separate_includes = OrderedDict()
+        for i in include:
+            main_include, sub_includes = parse_include(i)
+            if (
+                main_include in related_fields
+                and is_to_many(related_fields[main_include])
+                and self.get_include_strategy(main_include, to_many_count)
+                == "select"
+            ):
+                if main_include not in separate_includes:
+                    separate_includes[main_include] = []
+                separate_includes[main_include].extend(sub_includes)
+            else:
+                joined_includes.append(i)
 
-        s = (
-            select(
-                [column_map[key] for key in columns]
-                if columns is not None
-                else all_columns
+        return joined_includes, separate_includes
+
+    def load_separate_includes(self):
+        """Loads the relations in `self.separate_includes` with one query per
+        relation and adds them to the (already fetched) objects."""
+
+        if not self.separate_includes or not self.objects:
+            return
+
+        related_fields = self.backend.get_related_fields(self.cls)
+        pk_select = self.get_bare_select(columns=[self.table.c.pk])
+
+        for key, sub_includes in self.separate_includes.items():
+            params = related_fields[key]
+            related_table = self.backend.get_collection_table(params["collection"])
+            if isinstance(params["field"], ManyToManyField):
+                relationship_table = params["relationship_table"]
+                pk_column = relationship_table.c[params["pk_field_name"]]
+                related_pk_column = relationship_table.c[
+                    params["related_pk_field_name"]
+                ]
+            else:
+                pk_column = related_table.c[params["backref"]["column"]]
+                related_pk_column = related_table.c.pk
+
+            link_select = select([pk_column, related_pk_column]).where(
+                pk_column.in_(pk_select)
             )
-            .select_from(select_table)
-            .where(column_map["pk"].in_(bare_select))
-        )
 
-        # we order again, this time including the joined columns
-        if self.order_bys:
-            s = s.order_by(
-                *[direction(column_map[key]) for (key, direction) in self.order_bys]
+            if isinstance(self.include_strategy, dict):
+                prefix = len(key) + 1
+                include_strategy = {
+                    path[prefix:]: strategy
+                    for path, strategy in self.include_strategy.items()
+                    if path.startswith(key + ".")
+                }
+            else:
+                include_strategy = self.include_strategy
+
+            qs = QuerySet(
+                backend=self.backend,
+                table=related_table,
+                cls=params["class"],
+                condition=related_table.c.pk.in_(
+                    select([link_select.alias().c[related_pk_column.name]])
+                ),
+                include=sub_includes or None,
+                include_strategy=include_strategy,
             )
 
-        return s
+            with self.backend.transaction():
+                result = self.backend.connection.execute(link_select)
+                links = result.fetchall()
+                qs.get_objects()
 
-    def get_objects(self):
-        def build_field_map(params, path=None, current_map=None):
-            def m2m_o2m_getter(join_params, name, pk_key):
-                def f(d, obj):
-                    pk_value = obj[pk_key]
-                    try:
-                        v = d[name]
-                    except KeyError:
-                        v = d[name] = OrderedDict()
-                    if pk_value is None:
-                        return None
-
-                    if pk_value not in v:
-                        v[pk_value] = {}
-                    if "__lazy__" not in v[pk_value]:
-                        v[pk_value]["__lazy__"] = join_params["lazy"]
-                    if "__collection__" not in v[pk_value]:
-                        v[pk_value]["__collection__"] = join_params["collection"]
-                    return v[pk_value]
-
-                return f
-
-            def fk_getter(join_params, key):
-                def f(d, obj):
-                    pk_value = obj[join_params["table_fields"]["pk"]]
-                    if pk_value is None:
-                        # we set the key value to "None", to indicate that the FK is None
-                        d[key] = None
-                        return None
-
-                    if not key in d:
-                        d[key] = {}
-                    v = d[key]
-                    if "__lazy__" not in v:
-                        v["__lazy__"] = join_params["lazy"]
-                    if "__collection__" not in v:
-                        v["__collection__"] = join_params["collection"]
-                    return v
-
-                return f
-
-            if current_map is None:
-                current_map = {}
-            if path is None:
-                path = []
-            for key, field in params["table_fields"].items():
-                if key in params["joins"]:
-                    continue
+            related_objects = {obj["pk"]: obj for obj in qs.objects}
+            related_pks = {}
+            for pk, related_pk in links:
+                if related_pk in related_objects:
+                    related_pks.setdefault(pk, []).append(related_pk)
 
-                current_map[field] = path + [key]
-            for name, join_params in params["joins"].items():
-                if name in current_map:
-                    del current_map[name]
-                if isinstance(
-                    join_params["relation"]["field"], (ManyToManyField, OneToManyField)
-                ):
-                    build_field_map(
-                        join_params,
-                        path
-                        + [
-                            m2m_o2m_getter(
-                                join_params, name, join_params["table_fields"]["pk"]
-                            )
-                        ],
-                        current_map,
-                    )
-                else:
-                    build_field_map(
-                        join_params, path + [fk_getter(join_params, name)], current_map
-                    )
-            return current_map
-
-        def replace_ordered_dicts(d):
-            for key, value in d.items():
-                if isinstance(value, OrderedDict):
-                    replace_ordered_dicts(value)
-                    d[key] = list(value.values())
-                elif isinstance(value, dict):
-                    d[key] = replace_ordered_dicts(value)
-            return d
+            for obj in self.objects:
+                obj[key] = [
+                    dict(related_objects[related_pk])
+                    for related_pk in related_pks.get(obj["pk"], [])
+                ]
 
-        s = self.get_select()
-        field_map = build_field_map(self.include_joins)
+    def get_objects(self):
+        instrumentation = self.backend.instrumentation
+        collection = self.backend.get_collection_for_cls(self.cls)
+        with instrumentation.span("compile", collection):
+            s = self.get_select()
+        fold = self.include_plan["fold"]
+        plan = {
+            "joins": sorted(self.include_joins["joins"]),
+            "separate_includes": list(self.separate_includes),
+            "sort": [key for key, direction in self.order_bys or ()],
+        }
 
         with self.backend.transaction():
-            try:
-                result = self.backend.connection.execute(s)
-                if result.returns_rows:
-                    objects = list(result.fetchall())
-                else:
-                    objects = []
-            except sqlalchemy.exc.ResourceClosedError:
-                objects = None
-                raise
-
-        # we "fold" the objects back into one list structure
-        self.objects = []
-        pks = []
-
-        unpacked_objects = OrderedDict()
-        for obj in objects:
-            if not obj["pk"] in unpacked_objects:
-                unpacked_objects[obj["pk"]] = {
-                    "__lazy__": self.include_joins["lazy"],
-                    "__collection__": self.include_joins["collection"],
-                }
-            unpacked_obj = unpacked_objects[obj["pk"]]
-            for key, path in field_map.items():
-                d = unpacked_obj
-                for element in path[:-1]:
-                    if callable(element):
-                        d = element(d, obj)
-                        if d is None:
-                            break
-
+            with instrumentation.span(
+                "execute", collection, query=s, plan=plan, filter=self.query
+            ):
+                try:
+                    result = self.backend.connection.execute(s)
+                    if result.returns_rows:
+                        objects = result.fetchall()
                     else:
-                        d = get_value(d, element, create=True)
-                else:
-                    d[path[-1]] = obj[key]
+                        objects = []
+                except sqlalchemy.exc.ResourceClosedError:
+                    objects = None
+                    raise
+        instrumentation.count("rows", len(objects))
 
-        self.objects = [
-            replace_ordered_dicts(unpacked_obj)
-            for unpacked_obj in unpacked_objects.values()
-        ]
+        # we "fold" the objects back into one list structure
+        self.objects = fold(objects)
+        self.load_separate_includes()
         self.pop_objects = self.objects[:]
 
     def as_list(self):
@@ -432,6 +648,42 @@ class QuerySet(BaseQuerySet):
             self.get_deserialized_objects()
         return [obj for obj in self.deserialized_objects]
 
+    def as_records(self):
+        """Returns the documents as records, see
+        :py:meth:`blitzdb.queryset.QuerySet.as_records`.
+
+        Foreign keys become (lazy) documents, other relations only show up
+        if they have been included in the query.
+        """
+        if self.objects is None:
+            self.get_objects()
+
+        collection = self.backend.get_collection_for_cls(self.cls)
+        foreign_keys = [
+            (key, params["class"])
+            for key, params in self.backend._related_fields[collection].items()
+            if isinstance(params["field"], ForeignKeyField)
+        ]
+
+        records = []
+        for data in self.objects:
+            attributes, lazy = self.backend.deserialize_db_data(data)
+            for key, cls in foreign_keys:
+                try:
+                    value = get_value(attributes, key)
+                except KeyError:
+                    continue
+
+                if isinstance(value, dict):
+                    value, lazy = self.backend.deserialize_db_data(value)
+                    value = self.backend.create_instance(cls, value, lazy=lazy)
+                elif value is not None:
+                    value = self.backend.create_instance(cls, {"pk": value}, lazy=True)
+                set_value(attributes, key, value)
+            attributes = self.backend.deserialize(attributes, create_instance=False)
+            records.append(Record(attributes, self.cls))
+        return records
+
     def __getitem__(self, key):
         if isinstance(key, slice):
             start, stop, step = key.start, key.stop, key.step
@@ -459,6 +711,10 @@ class QuerySet(BaseQuerySet):
         return self.deserialized_objects[key]
 
     def revert(self):
+        if getattr(self.backend, "lazy_batch_size", None):
+            self.loader = BatchLoader(self.backend, self.backend.lazy_batch_size)
+        else:
+            self.loader = None
         self.deserialized_objects = None
         self.deserialized_pop_objects = None
         self._it = None
@@ -492,6 +748,7 @@ class QuerySet(BaseQuerySet):
             order_bys=self.order_bys,
             raw=self.raw,
             include=self.include,
+            include_strategy=self.include_strategy,
             only=self.only,
         )
         return new_qs
@@ -564,6 +821,67 @@ class QuerySet(BaseQuerySet):
 
         return s
 
+    def values_list(self, *keys):
+        """Returns the values of the given keys as a list of tuples.
+
+        Only the corresponding columns get selected and the rows are returned
+        as they are, i.e. no documents get created and the JSON data of the
+        documents is not decoded. All keys therefore need to be stored in a
+        column of the table (e.g. indexed fields and foreign keys, for which
+        the primary key of the related document gets returned).
+        """
+        if not keys:
+            raise AttributeError("No keys given!")
+
+        columns = [self.get_table_column(key) for key in keys]
+
+        with self.backend.transaction():
+            s = self.get_bare_select(columns=columns)
+            result = self.backend.connection.execute(s)
+            return [tuple(row) for row in result.fetchall()]
+
+    def get_aggregates(self, group_keys, aggregations):
+        functions = {
+            "count": func.count,
+            "sum": func.sum,
+            "avg": func.avg,
+            "min": func.min,
+            "max": func.max,
+        }
+
+        group_columns = [self.get_table_column(key) for key in group_keys]
+        aggregate_columns = []
+        for name, (function, key) in aggregations.items():
+            if key is None:
+                aggregate_columns.append(func.count())
+            else:
+                column = self.get_table_column(key)
+                aggregate_columns.append(functions[function](column))
+
+        bare_select = self.get_bare_select(columns=[self.table.c.pk])
+        s = (
+            select(group_columns + aggregate_columns)
+            .select_from(self.table)
+            .where(self.table.c.pk.in_(bare_select))
+        )
+        if group_columns:
+            s = s.group_by(*group_columns)
+
+        with self.backend.transaction():
+            result = self.backend.connection.execute(s)
+            rows = result.fetchall()
+
+        keys = list(group_keys) + list(aggregations)
+        return [dict(zip(keys, row)) for row in rows]
+
+    def get_table_column(self, key):
+        try:
+            column_name = self.backend.get_column_for_key(self.cls, key)
+        except KeyError as e:
+            raise AttributeError(*e.args)
+
+        return self.table.c[column_name]
+
     def get_count_select(self):
         s = self.get_bare_select(columns=[self.table.c.pk])
         count_select = select([func.count()]).select_from(s.alias())
@@ -574,11 +892,15 @@ class QuerySet(BaseQuerySet):
             if self.objects is not None:
                 self.count = len(self.objects)
             else:
+                collection = self.backend.get_collection_for_cls(self.cls)
                 with self.backend.transaction():
                     count_select = self.get_count_select()
-                    result = self.backend.connection.execute(count_select)
-                    self.count = result.first()[0]
-                    result.close()
+                    with self.backend.instrumentation.span(
+                        "count", collection, query=count_select, filter=self.query
+                    ):
+                        result = self.backend.connection.execute(count_select)
+                        self.count = result.first()[0]
+                        result.close()
         return self.count
 
     def distinct_pks(self):
@@ -30,6 +30,29 @@ class MultipleDocumentsReturned(BaseException):
         )
 
 
+class DocumentAttribute(object):
+
+    """Gets installed on document classes for every declared field, so that
+    reading the field from a document (e.g. `movie.title`) is a plain dict
+    lookup instead of a failed attribute lookup followed by a call of
+    `Document.__getattr__`, which behaves the same but is much slower."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            # like before, the field is not an attribute of the class
+            raise AttributeError(self.key)
+
+        try:
+            if not obj._properties:
+                return obj._attributes[self.key]
+        except (KeyError, AttributeError):
+            pass
+        return obj.__getattr__(self.key)
+
+
 class MetaDocument(type):
 
     """Here we inject class-dependent exceptions into the Document class."""
@@ -54,6 +77,12 @@ class MetaDocument(type):
                     field_key = key
                 fields[field_key] = value
                 delattr(class_type, key)
+                if (
+                    field_key == key
+                    and not key.startswith("_")
+                    and not hasattr(class_type, key)
+                ):
+                    setattr(class_type, key, DocumentAttribute(key))
 
         class_type.fields = fields
 
@@ -143,6 +172,11 @@ class Document(object):
 
     abstract = True
 
+    # documents are loaded unless they get created as lazy ones (which also
+    # makes `_lazy` available before `__init__` sets it)
+    _lazy = False
+    _attribute_loader = None
+
     class Meta:
 
         PkType = CharField(length=32, primary_key=True, indexed=True, nullable=False)
@@ -150,7 +184,13 @@ class Document(object):
         indexes = {}
 
     def __init__(
-        self, attributes=None, lazy=False, backend=None, autoload=True, db_loader=None
+        self,
+        attributes=None,
+        lazy=False,
+        backend=None,
+        autoload=True,
+        db_loader=None,
+        attribute_loader=None,
     ):
         """
         Initializes a document instance with the given attributes. If `lazy = True`, a *lazy*
@@ -165,36 +205,33 @@ class Document(object):
         :param autoload: if True, will automatically fetch the document from the database if it is
                          lazy and the user tries to access an attribute that does not yet exist.
         :param backend: the backend for use in the `save`, `delete` and `revert` functions.
+        :param attribute_loader: a function that fetches a single missing attribute of a lazy
+                                 document from the database (see :py:meth:`load_attribute`).
 
         """
         if not attributes:
             attributes = {}
 
-        self._attributes = attributes
-        self._autoload = autoload
-        self._backend = backend
-        self._properties = {}
-        self._db_loader = db_loader
-
-        if not lazy:
-            self._lazy = False
-        else:
-            self._lazy = True
-
-        self._embed = False
+        # we bypass `__setattr__`, which is only needed for document attributes
+        self.__dict__.update(
+            _attributes=attributes,
+            _autoload=autoload,
+            _backend=backend,
+            _properties={},
+            _db_loader=db_loader,
+            _attribute_loader=attribute_loader,
+            _lazy=bool(lazy),
+            _embed=False,
+        )
         self.initialize()
 
     def __getitem__(self, key):
-        try:
-            lazy = super(Document, self).__getattribute__("_lazy")
-        except AttributeError:
-            lazy = False
-        if lazy:
-            if key in self.lazy_attributes:
-                return self.lazy_attributes[key]
+        if self._lazy:
+            if key in self._attributes:
+                return self._attributes[key]
 
-            self.revert(implicit=True)
-        return self.attributes[key]
+            self.load_attribute(key)
+        return self._attributes[key]
 
     @property
     def lazy(self):
@@ -257,32 +294,40 @@ class Document(object):
         # we make sure not to revert the document...
         return object.__getattribute__(self, key)
 
-    def __getattr__(self, key, load_if_lazy=True):
+    def __getattr__(self, key):
+        # only gets called if the normal lookup fails, i.e. for the attributes
+        # of the document (and for instance attributes that are not yet set)
+        instance_dict = self.__dict__
         try:
-            return super(Document, self).__getattr__(key)
+            properties = instance_dict["_properties"]
+            attributes = instance_dict["_attributes"]
+        except KeyError:
+            raise AttributeError(key)
+
+        if properties and key in properties:
+            return properties[key]
 
-        except AttributeError:
-            pass
         try:
-            if key in self._properties:
-                return self._properties[key]
+            return attributes[key]
+        except KeyError:
+            pass
 
-            if key in self._attributes:
+        if instance_dict["_lazy"]:
+            self.load_attribute(key)
+            try:
                 return self._attributes[key]
-
-            if self._lazy:
-                self.revert(implicit=True)
-            return self._attributes[key]
-
-        except KeyError:
-            raise AttributeError(key)
+            except KeyError:
+                pass
+        raise AttributeError(key)
 
     def __setattr__(self, key, value):
-        if key.startswith("_") or key in ("attributes", "pk", "lazy", "backend"):
+        if key[:1] == "_" or key in ("attributes", "pk", "lazy", "backend"):
             return super(Document, self).__setattr__(key, value)
 
         else:
-            self.attributes[key] = value
+            if self._lazy:
+                self.revert(implicit=True)
+            self._attributes[key] = value
 
     def __delattr__(self, key):
         if key.startswith("_"):
@@ -547,7 +592,114 @@ class Document(object):
         self._attributes = obj.attributes
         self.initialize()
 
+    def load_attribute(self, key):
+        """Loads a missing attribute of a lazy document from the database.
+
+        If the document has an `attribute_loader` (e.g. because it has been
+        fetched with only some of its fields), only the given attribute gets
+        fetched and the document stays lazy. Otherwise (or if the attribute
+        cannot be fetched on its own), the whole document gets loaded
+        implicitly (see :py:meth:`revert`).
+
+        :param key: the name of the attribute to load.
+        """
+        if self._attribute_loader is not None and key[:1] != "_" and self._autoload:
+            attributes = self._attribute_loader(key)
+            if attributes is not None:
+                for name, value in attributes.items():
+                    if name not in self._attributes:
+                        self._attributes[name] = value
+                return
+
+        self.revert(implicit=True)
+
     def load_if_lazy(self, implicit=False):
         if self._lazy:
             self.revert(implicit=implicit)
         return self
+
+
+class Record(object):
+
+    """A lightweight, read-only representation of a document, as returned by
+    :py:meth:`blitzdb.queryset.QuerySet.as_records`.
+
+    Unlike a `Document`, a record is not bound to a backend, never gets loaded
+    lazily and calls no hooks, which makes records much cheaper to create and
+    to read. Their attributes can be read as attributes or as items:
+
+    .. code-block:: python
+
+        for record in backend.filter(Movie, {}).as_records():
+            print(record.title, record["year"])
+
+    :param attributes: The (deserialized) attributes of the document.
+    :param cls: The document class of the record.
+    """
+
+    __slots__ = ("_attributes", "_cls")
+
+    def __init__(self, attributes, cls=Document):
+        object.__setattr__(self, "_attributes", attributes)
+        object.__setattr__(self, "_cls", cls)
+
+    def __getattr__(self, key):
+        if key == "_attributes":
+            # e.g. when copying a record
+            raise AttributeError(key)
+
+        try:
+            return self._attributes[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Records are read-only!")
+
+    def __delattr__(self, key):
+        raise AttributeError("Records are read-only!")
+
+    def __getstate__(self):
+        return self._attributes, self._cls
+
+    def __setstate__(self, state):
+        object.__setattr__(self, "_attributes", state[0])
+        object.__setattr__(self, "_cls", state[1])
+
+    def __getitem__(self, key):
+        return self._attributes[key]
+
+    def __contains__(self, key):
+        return key in self._attributes
+
+    def get(self, key, default=None):
+        return self._attributes.get(key, default)
+
+    def keys(self):
+        return self._attributes.keys()
+
+    @property
+    def attributes(self):
+        return self._attributes
+
+    @property
+    def pk(self):
+        return self._attributes.get(self._cls.get_pk_name())
+
+    @property
+    def cls(self):
+        return self._cls
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return False
+
+        return self._cls == other._cls and self._attributes == other._attributes
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s.Record(%r)" % (self._cls.__name__, self._attributes)
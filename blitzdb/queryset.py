@@ -1,6 +1,59 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import abc
+from collections import OrderedDict
+
+import six
+
+from blitzdb.document import Record
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "avg", "min", "max")
+
+
+def parse_aggregations(aggregations):
+    """Normalizes the aggregations passed to :py:meth:`QuerySet.aggregate`
+    into an ordered dict that maps every name to a `(function, key)` tuple.
+
+    A bare `"count"` counts documents and gets normalized to `("count", None)`.
+    """
+    if not aggregations:
+        raise AttributeError("No aggregations given!")
+
+    parsed_aggregations = OrderedDict()
+    for name, aggregation in sorted(aggregations.items()):
+        if aggregation == "count":
+            aggregation = ("count", None)
+        if not isinstance(aggregation, (list, tuple)) or len(aggregation) != 2:
+            raise AttributeError(
+                "Invalid aggregation for %s: %s" % (name, repr(aggregation))
+            )
+
+        function, key = aggregation
+        if function not in AGGREGATE_FUNCTIONS:
+            raise AttributeError("Unknown aggregate function: %s" % function)
+
+        if key is None and function != "count":
+            raise AttributeError("%s requires a key" % function)
+
+        if key is not None and not isinstance(key, six.string_types):
+            raise AttributeError("Invalid key for %s: %s" % (name, repr(key)))
+
+        parsed_aggregations[name] = (function, key)
+    return parsed_aggregations
+
+
+def sort_groups(groups, keys):
+    """Sorts the groups returned by :py:meth:`QuerySet.get_aggregates` by
+    their values of the given keys (`None` first)."""
+
+    def sort_key(group):
+        return [(group[key] is not None, group[key]) for key in keys]
+
+    try:
+        return sorted(groups, key=sort_key)
+    except TypeError:
+        # values of different types that cannot be compared
+        return groups
 
 
 class QuerySet(object):
@@ -58,6 +111,103 @@ class QuerySet(object):
         """
         raise NotImplementedError
 
+    def values_list(self, *keys):
+        """Returns the values of the given keys for all documents in the query
+        set as a list of tuples (one per document), without creating any
+        documents. Implement this in your derived query set class.
+
+        :param keys: The (possibly nested) keys to return the values for.
+        """
+        raise NotImplementedError
+
+    def as_records(self):
+        """Returns the documents in the query set as read-only
+        :py:class:`blitzdb.document.Record` instances, e.g. for reports that
+        only read many documents.
+
+        Records are cheaper than documents: they are created directly from
+        the stored attributes and no hooks get called. Referenced documents
+        stay lazy. This default implementation creates the records from the
+        documents instead, implement this in your derived query set class.
+        """
+        return [Record(obj.attributes, self.cls) for obj in self.as_list()]
+
+    def columns(self, *keys, **kwargs):
+        """Returns the values of the given keys for all documents in the query
+        set column by column.
+
+        :param keys: The (possibly nested) keys to return the values for.
+        :param numpy: If `True`, returns the columns as NumPy arrays instead
+                      of lists (requires NumPy).
+        :returns: An ordered dict that maps every key to its column.
+        """
+        use_numpy = kwargs.pop("numpy", False)
+        if kwargs:
+            raise AttributeError("Unexpected arguments: %s" % ", ".join(kwargs))
+
+        rows = self.values_list(*keys)
+        if rows:
+            columns = [list(column) for column in zip(*rows)]
+        else:
+            columns = [[] for key in keys]
+
+        if use_numpy:
+            import numpy
+
+            columns = [numpy.array(column) for column in columns]
+
+        return OrderedDict(zip(keys, columns))
+
+    def get_aggregates(self, group_keys, aggregations):
+        """Computes the given (parsed) aggregations for every group of
+        documents that share the same values of `group_keys`. Implement this
+        in your derived query set class.
+
+        :returns: A list with one dict per group, which contains the values of
+                  the group keys and of all aggregations.
+        """
+        raise NotImplementedError
+
+    def aggregate(self, **aggregations):
+        """Computes aggregates over all documents in the query set. Backends
+        compute them natively where they can (the file backend has to load the
+        documents for keys without an index).
+
+        Every aggregation is given as a `(function, key)` tuple, where
+        `function` is one of `count`, `sum`, `avg`, `min` and `max`. Documents
+        that do not define the key are ignored. A bare `"count"` counts the
+        documents of the query set.
+
+        Example::
+
+            backend.filter(Movie, {}).aggregate(
+                movies="count", first_year=("min", "year")
+            )
+            # {"movies": 42, "first_year": 1927}
+
+        :returns: A dict with the value of every aggregation.
+        """
+        aggregations = parse_aggregations(aggregations)
+        results = self.get_aggregates((), aggregations)
+        if results:
+            return results[0]
+
+        return {
+            name: 0 if function == "count" else None
+            for name, (function, key) in aggregations.items()
+        }
+
+    def group_by(self, *keys):
+        """Groups the documents in the query set by the values of the given
+        keys, see :py:class:`GroupBy`.
+
+        Example::
+
+            backend.filter(Movie, {}).group_by("year").aggregate(movies="count")
+            # [{"year": 1927, "movies": 3}, {"year": 1931, "movies": 1}, ...]
+        """
+        return GroupBy(self, keys)
+
     @abc.abstractmethod
     def __len__(self):
         """Return the number of documents contained in this query set."""
@@ -79,3 +229,37 @@ class QuerySet(object):
         :param other: The object this query set is compared to.
         """
         raise NotImplementedError
+
+
+class GroupBy(object):
+
+    """The documents of a query set grouped by the values of one or more
+    keys, as returned by :py:meth:`QuerySet.group_by`.
+
+    :param queryset: The query set that contains the documents.
+    :param keys: The keys to group the documents by.
+    """
+
+    def __init__(self, queryset, keys):
+        if not keys:
+            raise AttributeError("No keys given!")
+
+        self.queryset = queryset
+        self.keys = tuple(keys)
+
+    def aggregate(self, **aggregations):
+        """Computes aggregates for every group (see
+        :py:meth:`QuerySet.aggregate`).
+
+        :returns: A list with one dict per group, which contains the values of
+                  the group keys and of all aggregations, sorted by the
+                  values of the group keys.
+        """
+        aggregations = parse_aggregations(aggregations)
+        for name in aggregations:
+            if name in self.keys:
+                raise AttributeError("Aggregation %s clashes with a group key" % name)
+
+        return sort_groups(
+            self.queryset.get_aggregates(self.keys, aggregations), self.keys
+        )
@@ -2,6 +2,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import os
 import subprocess
+import sys
 import tempfile
 
 import pytest
@@ -10,6 +11,11 @@ from blitzdb.backends.file import Backend as FileBackend
 
 from .helpers.movie_data import Actor, Movie, generate_test_data
 
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # the asyncio facade requires Python 3.7+
+    collect_ignore.append("test_async.py")
+
 
 def _mongodb_backend(config, autoload_embedded=True):
     con = pymongo.MongoClient(connectTimeoutMS=1000)
@@ -52,6 +58,26 @@ def mongodb_backend(request):
     return _mongodb_backend({})
 
 
+def _mongomock_backend(autoload_embedded=True):
+    pytest.importorskip("pymongo")
+    mongomock = pytest.importorskip("mongomock")
+    from blitzdb.backends.mongo import Backend as MongoBackend
+
+    db = mongomock.MongoClient()["blitzdb_test_3243213121435312431"]
+    backend = MongoBackend(db, autoload_embedded=autoload_embedded)
+    _init_indexes(backend)
+    return backend
+
+
+@pytest.fixture(params=(["mongo"] if test_mongo else []) + ["mongomock"])
+def mongodb_or_mongomock_backend(request):
+    """A MongoDB backend (if a server is available) and a `mongomock` one, for
+    tests that do not depend on the query engine of MongoDB."""
+    if request.param == "mongo":
+        return _mongodb_backend({})
+    return _mongomock_backend()
+
+
 @pytest.fixture
 def small_mongodb_test_data(request, mongodb_backend):
     return generate_test_data(request, mongodb_backend, 20)
@@ -0,0 +1,176 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+
+import pytest
+
+from blitzdb.backends.file import Backend
+from blitzdb.backends.file.index import Index
+from blitzdb.backends.file.journal import Journal
+from blitzdb.backends.file.serializers import PickleSerializer
+from blitzdb.backends.file.store import TransactionalStore
+
+from ..helpers.movie_data import Movie
+
+
+def new_backend(path, **config):
+    backend = Backend(path, config=config or None, overwrite_config=bool(config))
+    backend.register(Movie)
+    backend.create_index(Movie, "year")
+    return backend
+
+
+def test_journal(temporary_path):
+
+    journal = Journal(os.path.join(temporary_path, "journal"))
+    assert journal.get_records() == []
+    assert journal.append({"foo": "bar"}) == 1
+    assert journal.append({"foo": "baz"}) == 2
+
+    other_journal = Journal(journal.path)
+    assert other_journal.get_records() == [(1, {"foo": "bar"}), (2, {"foo": "baz"})]
+    assert other_journal.get_records(after=1) == [(2, {"foo": "baz"})]
+
+    # records that have been written partially get ignored and overwritten
+    with open(journal.path, "ab") as journal_file:
+        journal_file.write(b"\x00\x00\x01\x00\x12")
+    assert len(Journal(journal.path).get_records()) == 2
+    assert other_journal.append({"foo": "qux"}) == 3
+    assert Journal(journal.path).get_records(after=2) == [(3, {"foo": "qux"})]
+
+    journal.reset()
+    assert journal.get_records() == []
+    assert other_journal.get_records() == []
+    assert other_journal.append({}) == 4
+    assert Journal(journal.path).get_records() == [(4, {})]
+
+
+def test_commits_are_journaled(temporary_path):
+
+    backend = new_backend(temporary_path)
+    index_store = backend.indexes["movie"]["year"]._store
+    index_blob = index_store.get_blob("all_keys_with_undefined")
+
+    backend.save(Movie({"title": "The Godfather", "year": 1972}))
+    backend.commit()
+
+    assert len(backend.journal.get_records()) == 1
+    assert len(backend.filter(Movie, {"year": 1972})) == 1
+    # indexes only get written when the journal is checkpointed
+    assert index_store.get_blob("all_keys_with_undefined") == index_blob
+
+    other_backend = new_backend(temporary_path)
+    assert len(other_backend.filter(Movie, {"year": 1972})) == 1
+    assert other_backend.journal.get_records() == []
+    assert index_store.get_blob("all_keys_with_undefined") != index_blob
+
+
+def test_checkpoint(temporary_path):
+
+    backend = new_backend(temporary_path, journal_size=1000)
+    for i in range(20):
+        backend.save(Movie({"title": "Movie %d" % i, "year": 1960 + i}))
+        backend.commit()
+        assert backend.journal.size <= 1000
+
+    assert backend.journal.sequence == 20
+    backend.checkpoint()
+    assert backend.journal.get_records() == []
+
+    backend = new_backend(temporary_path)
+    assert len(backend.filter(Movie, {})) == 20
+    assert len(backend.filter(Movie, {"year": 1965})) == 1
+    assert backend.indexes["movie"]["year"].journal_sequence == 20
+
+
+def test_recovery(temporary_path, monkeypatch):
+
+    backend = new_backend(temporary_path)
+    backend.save(Movie({"title": "The Godfather", "year": 1972}))
+    backend.commit()
+
+    def crash(self, changes):
+        raise IOError("Crash!")
+
+    # we crash right after the commit has been written to the journal
+    monkeypatch.setattr(TransactionalStore, "apply_changes", crash)
+    backend.save(Movie({"title": "Scarface", "year": 1983}))
+    with pytest.raises(IOError):
+        backend.commit()
+    monkeypatch.undo()
+
+    backend = new_backend(temporary_path)
+    assert len(backend.filter(Movie, {})) == 2
+    scarface = backend.get(Movie, {"year": 1983})
+    assert scarface.title == "Scarface"
+
+
+def test_corrupted_index(temporary_path, caplog):
+
+    backend = new_backend(temporary_path)
+    backend.save(Movie({"title": "The Godfather", "year": 1972}))
+    backend.commit()
+    backend.checkpoint()
+
+    index_store = backend.indexes["movie"]["year"]._store
+    index_store.store_blob(b"\x80\x04corrupted", "all_keys_with_undefined")
+
+    backend = new_backend(temporary_path)
+    assert len(backend.filter(Movie, {"year": 1972})) == 1
+    assert "Cannot load index year" in caplog.text
+
+
+def get_index_data(index_store):
+    blob = index_store.get_blob("all_keys_with_undefined")
+    return PickleSerializer.deserialize(blob)
+
+
+def store_index_data(index_store, data):
+    blob = PickleSerializer.serialize(data)
+    index_store.store_blob(blob, "all_keys_with_undefined")
+
+
+def test_index_formats(temporary_path, caplog):
+
+    backend = new_backend(temporary_path)
+    backend.save(Movie({"title": "The Godfather", "year": 1972}))
+    backend.commit()
+    backend.checkpoint()
+
+    index_store = backend.indexes["movie"]["year"]._store
+    data = get_index_data(index_store)
+    assert data["version"] == Index.FORMAT_VERSION
+
+    # indexes that have been stored without a format version (0 and 1)
+    old_data = (data["index"], data["undefined_keys"])
+    for old_data in (old_data, old_data + (data["hashed_keys"], 1)):
+        store_index_data(index_store, old_data)
+        backend = new_backend(temporary_path)
+        assert backend.indexes["movie"]["year"].loaded
+        assert len(backend.filter(Movie, {"year": 1972})) == 1
+
+    # ...get upgraded when they are saved the next time
+    backend.save(Movie({"title": "Scarface", "year": 1983}))
+    backend.commit()
+    backend.checkpoint()
+    data = get_index_data(index_store)
+    assert data["version"] == Index.FORMAT_VERSION
+    assert "Cannot load index year" not in caplog.text
+
+    # indexes in a newer format get rebuilt
+    data["version"] = Index.FORMAT_VERSION + 1
+    store_index_data(index_store, data)
+    backend = new_backend(temporary_path)
+    assert len(backend.filter(Movie, {"year": 1983})) == 1
+    assert "Cannot load index year" in caplog.text
+
+
+def test_without_journal(temporary_path):
+
+    backend = new_backend(temporary_path, journal=False)
+    backend.save(Movie({"title": "The Godfather", "year": 1972}))
+    backend.commit()
+
+    assert backend.journal is None
+    assert not os.path.exists(os.path.join(temporary_path, "journal"))
+    assert len(new_backend(temporary_path).filter(Movie, {"year": 1972})) == 1
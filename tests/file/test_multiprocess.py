@@ -0,0 +1,97 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import multiprocessing
+
+from blitzdb.backends.file import Backend
+
+from ..helpers.movie_data import Director, Movie
+
+
+def new_backend(path):
+    backend = Backend(path, multiprocess=True)
+    backend.register(Movie)
+    backend.register(Director)
+    return backend
+
+
+def save_movies(path, offset):
+    backend = new_backend(path)
+    for i in range(10):
+        backend.save(Movie({"title": "Movie %d" % (offset + i)}))
+        backend.commit()
+
+
+def test_readers_see_commits(temporary_path):
+
+    writer = new_backend(temporary_path)
+    reader = new_backend(temporary_path)
+
+    sequence = writer.config["sequence"]
+    writer.save(Movie({"title": "The Godfather", "year": 1972}))
+    assert len(reader.filter(Movie, {})) == 0
+    writer.commit()
+
+    assert writer.config["sequence"] == sequence + 1
+    assert len(reader.filter(Movie, {})) == 1
+    assert len(reader.filter(Movie, {"year": 1972})) == 1
+
+    # ephemeral indexes of changed collections get rebuilt
+    writer.save(Movie({"title": "Scarface", "year": 1983}))
+    writer.commit()
+    assert len(reader.filter(Movie, {"year": 1983})) == 1
+
+    # indexes created by other processes get loaded
+    writer.create_index(Movie, "title")
+    assert len(reader.filter(Movie, {"title": "Scarface"})) == 1
+    assert "title" in reader.indexes["movie"]
+    assert not reader.indexes["movie"]["title"].ephemeral
+
+
+def test_writers_do_not_overwrite_each_other(temporary_path):
+
+    backend = new_backend(temporary_path)
+    other_backend = new_backend(temporary_path)
+    sequence = backend.config["sequence"]
+
+    backend.save(Movie({"title": "The Godfather"}))
+    other_backend.save(Movie({"title": "Scarface"}))
+    other_backend.save(Director({"name": "Brian de Palma"}))
+    backend.commit()
+    other_backend.commit()
+
+    assert other_backend.config["sequence"] == sequence + 2
+    assert other_backend.config["sequences"]["movie"] == sequence + 2
+    assert other_backend.config["sequences"]["director"] == sequence + 2
+    for b in (backend, other_backend, new_backend(temporary_path)):
+        assert len(b.filter(Movie, {})) == 2
+        assert len(b.filter(Director, {})) == 1
+
+
+def test_multiple_processes(temporary_path):
+
+    sequence = new_backend(temporary_path).config["sequence"]
+    processes = [
+        multiprocessing.Process(target=save_movies, args=(temporary_path, i * 10))
+        for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    backend = new_backend(temporary_path)
+    assert backend.config["sequence"] == sequence + 40
+    assert sorted(backend.filter(Movie, {}).values_list("title")) == sorted(
+        ("Movie %d" % i,) for i in range(40)
+    )
+
+
+def test_single_process_mode(temporary_path):
+
+    backend = Backend(temporary_path)
+    backend.register(Movie)
+    backend.save(Movie({"title": "The Godfather"}))
+    backend.commit()
+
+    assert backend.lock is None
+    assert "sequence" not in backend.config
@@ -0,0 +1,147 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from blitzdb.backends.file import Backend
+
+from ..helpers.movie_data import Actor, Director, Movie
+
+
+def prepare_data(backend):
+    director = Director({"name": "Stanley Kubrick"})
+    backend.save(director)
+    for i in range(5):
+        backend.save(
+            Movie({"title": "Movie %d" % i, "year": 1960 + i, "director": director})
+        )
+    backend.save(Movie({"title": "Untitled"}))
+    backend.commit()
+    return director
+
+
+def test_values_list(file_backend):
+
+    director = prepare_data(file_backend)
+
+    movies = file_backend.filter(Movie, {"director": director}).sort("year", 1)
+    assert movies.values_list("title", "year") == [
+        ("Movie %d" % i, 1960 + i) for i in range(5)
+    ]
+
+    values = dict(file_backend.filter(Movie, {}).values_list("title", "director"))
+    assert values["Untitled"] is None
+    assert values["Movie 0"] == director
+
+    with pytest.raises(AttributeError):
+        movies.values_list()
+
+
+def test_values_list_reads_from_indexes(file_backend, monkeypatch):
+
+    prepare_data(file_backend)
+    file_backend.create_index(Movie, fields={"title": 1})
+    file_backend.create_index(Movie, fields={"year": 1})
+
+    def get_object(cls, key):
+        raise AssertionError("documents should not be loaded")
+
+    monkeypatch.setattr(file_backend, "get_object", get_object)
+    values = file_backend.filter(Movie, {}).values_list("title", "year")
+    assert sorted(values) == sorted(
+        [("Movie %d" % i, 1960 + i) for i in range(5)] + [("Untitled", None)]
+    )
+
+
+def test_values_list_with_persisted_indexes(temporary_path):
+
+    backend = Backend(temporary_path, overwrite_config=True)
+    backend.create_index(Movie, fields={"director": 1})
+    director = prepare_data(backend)
+    backend.create_index(Movie, fields={"title": 1})
+
+    backend = Backend(temporary_path)
+    values = dict(backend.filter(Movie, {}).values_list("title", "director"))
+    assert values["Movie 0"] == director
+    assert values["Untitled"] is None
+
+
+def test_values_list_of_uncommitted_documents(file_backend):
+
+    prepare_data(file_backend)
+    file_backend.create_index(Movie, fields={"year": 1})
+
+    file_backend.begin()
+    movie = file_backend.get(Movie, {"title": "Movie 0"})
+    movie.year = 2000
+    file_backend.save(movie)
+
+    movies = file_backend.filter(Movie, {"title": "Movie 0"})
+    assert movies.values_list("year") == [(2000,)]
+
+
+def test_columns(file_backend):
+
+    prepare_data(file_backend)
+
+    columns = file_backend.filter(Movie, {"year": {"$gte": 1963}}).columns(
+        "year", "title"
+    )
+    assert list(columns) == ["year", "title"]
+    assert sorted(columns["year"]) == [1963, 1964]
+
+    columns = file_backend.filter(Actor, {}).columns("name")
+    assert columns == {"name": []}
+
+    with pytest.raises(AttributeError):
+        file_backend.filter(Movie, {}).columns("year", numbers=True)
+
+
+def test_aggregates_from_indexes(file_backend, monkeypatch):
+
+    director = prepare_data(file_backend)
+    file_backend.create_index(Movie, fields={"year": 1})
+
+    def get_object(cls, key):
+        raise AssertionError("documents should not be loaded")
+
+    monkeypatch.setattr(file_backend, "get_object", get_object)
+    movies = file_backend.filter(Movie, {"year": {"$lte": 1962}})
+    assert movies.group_by("year").aggregate(movies="count") == [
+        {"year": 1960 + i, "movies": 1} for i in range(3)
+    ]
+    assert movies.aggregate(first_year=("min", "year")) == {"first_year": 1960}
+
+    monkeypatch.undo()
+    movies = file_backend.filter(Movie, {})
+    assert movies.group_by("director").aggregate(movies="count") == [
+        {"director": None, "movies": 1},
+        {"director": director.pk, "movies": 5},
+    ]
+
+
+def test_distinct_from_indexes(file_backend, monkeypatch):
+
+    prepare_data(file_backend)
+    file_backend.create_index(Movie, fields={"year": 1})
+    file_backend.create_index(Movie, fields={"title": 1})
+
+    def get_object(cls, key):
+        raise AssertionError("documents should not be loaded")
+
+    monkeypatch.setattr(file_backend, "get_object", get_object)
+    assert file_backend.distinct(Movie, "year", {"title": "Movie 1"}) == {1961: 1}
+    assert file_backend.distinct(Movie, "year", with_counts=False) == [None] + [
+        1960 + i for i in range(5)
+    ]
+
+
+def test_distinct_without_index(file_backend):
+
+    prepare_data(file_backend)
+    index_info = file_backend.get_index_info(Movie)
+
+    assert file_backend.distinct(Movie, "year") == dict(
+        [(None, 1)] + [(1960 + i, 1) for i in range(5)]
+    )
+    # no (ephemeral) index has been left behind
+    assert file_backend.get_index_info(Movie) == index_info
@@ -0,0 +1,88 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from ..helpers.movie_data import Actor
+
+pytest.importorskip("pymongo")
+
+from blitzdb.backends.mongo import BulkWriteError  # noqa: E402
+
+
+@pytest.fixture
+def mongodb_backend(mongodb_or_mongomock_backend):
+    return mongodb_or_mongomock_backend
+
+
+def _insert_duplicates(backend):
+    collection = backend.get_collection_for_cls(Actor)
+    backend.db[collection].create_index("nickname", unique=True)
+
+    backend.autocommit = False
+    backend.begin()
+    actors = [Actor({"pk": i, "nickname": "actor %d" % (i % 3)}) for i in range(5)]
+    for actor in actors:
+        backend.save(actor)
+    return actors
+
+
+def test_bulk_write_batches(mongodb_backend):
+
+    mongodb_backend.bulk_write_size = 3
+    mongodb_backend.autocommit = False
+    mongodb_backend.begin()
+
+    actors = [Actor({"name": "actor %d" % i}) for i in range(10)]
+    for actor in actors:
+        mongodb_backend.save(actor)
+    mongodb_backend.commit()
+
+    assert len(mongodb_backend.filter(Actor, {})) == 10
+
+    for actor in actors[:7]:
+        mongodb_backend.delete(actor)
+    mongodb_backend.update(actors[8], {"name": "updated"})
+    mongodb_backend.commit()
+
+    assert len(mongodb_backend.filter(Actor, {})) == 3
+    assert mongodb_backend.get(Actor, {"pk": actors[8].pk}).name == "updated"
+
+
+def test_unordered_bulk_write_errors(mongodb_backend):
+
+    _insert_duplicates(mongodb_backend)
+
+    with pytest.raises(BulkWriteError) as excinfo:
+        mongodb_backend.commit()
+
+    errors = excinfo.value.errors
+    assert sorted(pk for error in errors for pk in error["pks"]) == [3, 4]
+    assert all(error["operation"] == "save" for error in errors)
+    assert excinfo.value.unexecuted == []
+
+    # all other documents have been written
+    assert len(mongodb_backend.filter(Actor, {})) == 3
+
+
+def test_ordered_bulk_write_errors(mongodb_backend):
+
+    mongodb_backend.ordered_writes = True
+    old_actor = Actor({"pk": "old", "name": "old actor"})
+    mongodb_backend.save(old_actor)
+    mongodb_backend.commit()
+
+    _insert_duplicates(mongodb_backend)
+    mongodb_backend.delete(old_actor)
+
+    with pytest.raises(BulkWriteError) as excinfo:
+        mongodb_backend.commit()
+
+    errors = excinfo.value.errors
+    assert [error["pks"] for error in errors] == [[3]]
+
+    collection = mongodb_backend.get_collection_for_cls(Actor)
+    assert excinfo.value.unexecuted == [
+        (collection, "save", [4]),
+        (collection, "delete", ["old"]),
+    ]
+    assert len(mongodb_backend.filter(Actor, {})) == 4
@@ -0,0 +1,88 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from ..helpers.movie_data import Actor
+
+
+@pytest.fixture
+def mongodb_backend(mongodb_or_mongomock_backend):
+    return mongodb_or_mongomock_backend
+
+
+@pytest.fixture
+def actors(mongodb_backend):
+    mongodb_backend.filter(Actor, {}).delete()
+    for i in range(20):
+        mongodb_backend.save(Actor({"pk": i, "name": "actor %d" % i, "rank": i}))
+    mongodb_backend.commit()
+    return mongodb_backend.filter(Actor, {}).sort("rank", 1)
+
+
+def test_cached_count(mongodb_backend, actors):
+
+    assert len(actors) == 20
+
+    mongodb_backend.save(Actor({"pk": 20, "name": "actor 20", "rank": 20}))
+    mongodb_backend.commit()
+
+    # the count is cached, but can be refreshed explicitly
+    assert len(actors) == 20
+    assert actors.count() == 21
+
+
+def test_slices(actors):
+
+    page = actors[5:10]
+    assert [actor.rank for actor in page] == [5, 6, 7, 8, 9]
+    assert len(page) == 5
+
+    assert [actor.rank for actor in page[1:3]] == [6, 7]
+    assert [actor.rank for actor in page[3:]] == [8, 9]
+    assert [actor.rank for actor in actors[-3:]] == [17, 18, 19]
+    assert page[-1].rank == 9
+    assert actors[19].rank == 19
+
+    assert len(page[3:1]) == 0
+    assert list(page[3:1]) == []
+    assert len(actors[25:]) == 0
+
+    with pytest.raises(IndexError):
+        page[5]
+
+    with pytest.raises(IndexError):
+        actors[20]
+
+
+def test_contains(mongodb_backend, actors):
+
+    first, last = actors[0], actors[19]
+    outsider = Actor({"pk": 100, "name": "outsider"})
+
+    assert first in actors
+    assert [first, last] in actors
+    assert outsider not in actors
+    assert [first, outsider] not in actors
+
+    page = actors[:10]
+    assert first in page
+    assert last not in page
+
+    ranked = mongodb_backend.filter(Actor, {"rank": {"$gte": 10}})
+    assert last in ranked
+    assert first not in ranked
+
+
+def test_delete_slice(mongodb_backend, actors):
+
+    actors[5:10].delete()
+    mongodb_backend.commit()
+
+    ranks = [actor.rank for actor in mongodb_backend.filter(Actor, {}).sort("rank", 1)]
+    assert ranks == list(range(5)) + list(range(10, 20))
+
+
+def test_cursor_batch_size(mongodb_backend, actors):
+
+    mongodb_backend.cursor_batch_size = 3
+    assert len(list(mongodb_backend.filter(Actor, {}))) == 20
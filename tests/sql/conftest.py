@@ -1,6 +1,7 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import pytest
+from sqlalchemy import event
 
 from ..conftest import _sql_backend, get_sql_engine
 from ..helpers.movie_data import Actor, Director, Food, Movie
@@ -28,3 +29,15 @@ def empty_backend(request):
     backend = _sql_backend(request, engine)
 
     return backend
+
+
+@pytest.fixture
+def statements(backend):
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(backend.engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(backend.engine, "before_cursor_execute", before_cursor_execute)
@@ -1,7 +1,12 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
+import copy
+
 import pytest
 
+from blitzdb import Document
+from blitzdb.fields import ForeignKeyField
+
 from ..helpers.movie_data import Actor, Director, Movie
 
 
@@ -177,3 +182,33 @@ def test_basics(backend):
 
     assert len(result) == 1
     assert the_godfather in result
+
+
+class Screening(Document):
+
+    director = ForeignKeyField(Director, key="credits.director", backref="screenings")
+
+
+def test_deserialize_nested_relations(empty_backend):
+
+    empty_backend.register(Director)
+    empty_backend.register(Screening)
+    empty_backend.create_schema()
+
+    director = Director({"pk": "1", "name": "Francis Coppola"})
+    empty_backend.save(director)
+    empty_backend.commit()
+
+    serialized = {
+        "__collection__": "screening",
+        "pk": "1",
+        "credits": {"director": "1"},
+    }
+    reference = copy.deepcopy(serialized)
+
+    deserialized = empty_backend.deserialize(serialized)
+
+    assert isinstance(deserialized, Screening)
+    assert deserialized.lazy_attributes["credits"]["director"] == director
+    # the relations were initialized on a copy of the data
+    assert serialized == reference
@@ -0,0 +1,86 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+from ..helpers.movie_data import Director, Movie
+
+
+def prepare_data(backend, n=10):
+    for i in range(n):
+        director = Director({"name": "Director %d" % i})
+        movie = Movie({"title": "Movie %d" % i, "director": director})
+        backend.save(director)
+        backend.update(director, {"best_movie": movie})
+        backend.save(movie)
+    backend.commit()
+
+
+def test_foreign_keys_are_loaded_in_batches(backend, statements):
+
+    prepare_data(backend)
+
+    movies = list(backend.filter(Movie, {}))
+    assert all(movie.director.lazy for movie in movies)
+
+    del statements[:]
+    names = {movie.director.name for movie in movies}
+
+    assert names == {"Director %d" % i for i in range(10)}
+    assert len(statements) == 1
+    assert all(not movie.director.lazy for movie in movies)
+
+
+def test_unique_backrefs_are_loaded_in_batches(backend, statements):
+
+    prepare_data(backend)
+
+    movies = list(backend.filter(Movie, {}))
+
+    del statements[:]
+    for movie in movies:
+        assert movie.best_of_director.name == movie.director.name
+
+    # one query for the backrefs and one query for the foreign keys
+    assert len(statements) == 2
+
+
+def test_batch_size(backend, statements):
+
+    prepare_data(backend)
+
+    backend.lazy_batch_size = 3
+    movies = list(backend.filter(Movie, {}))
+
+    del statements[:]
+    for movie in movies:
+        assert movie.director.name
+
+    assert len(statements) == 4
+
+
+def test_explicit_revert_reloads(backend):
+
+    prepare_data(backend, n=2)
+
+    movies = list(backend.filter(Movie, {}))
+    director = movies[0].director
+    assert director.name
+
+    backend.update(Director(director.attributes.copy()), {"name": "Changed"})
+    backend.commit()
+
+    director.revert()
+    assert director.name == "Changed"
+
+
+def test_without_batching(backend, statements):
+
+    prepare_data(backend)
+
+    backend.lazy_batch_size = 0
+    movies = list(backend.filter(Movie, {}))
+
+    del statements[:]
+    for movie in movies:
+        assert movie.director.name
+
+    # `get` issues a COUNT and a SELECT for every single document
+    assert len(statements) == 20
@@ -219,3 +219,136 @@ def test_only(backend):
     }
     assert isinstance(actors[0]["movies"], ManyToManyProxy)
     assert actors[0]["movies"]._objects is None
+
+
+def test_include_strategies(backend):
+
+    prepare_data(backend)
+
+    include = (("movies", ("director",), "title"), "best_movies", "favorite_food")
+
+    def get_movies(actors):
+        return {
+            actor.name: (
+                sorted(movie.title for movie in actor.movies),
+                sorted(movie.pk for movie in actor.best_movies),
+                [
+                    movie.director.pk if movie.director else None
+                    for movie in actor.movies
+                ],
+            )
+            for actor in actors
+        }
+
+    joined = backend.filter(Actor, {}, include=include, include_strategy="join")
+    selected = backend.filter(Actor, {}, include=include, include_strategy="select")
+    default = backend.filter(Actor, {}, include=include)
+
+    assert get_movies(joined) == get_movies(selected) == get_movies(default)
+
+    for actor in selected:
+        assert actor.movies._objects is not None
+        assert actor.best_movies.objects is not None
+        for movie in actor.movies:
+            assert movie.lazy
+            assert "title" in movie.lazy_attributes
+
+    assert not joined.separate_includes
+    assert list(selected.separate_includes) == [
+        "movies",
+        "best_movies",
+        "favorite_food",
+    ]
+    # with more than one to-many include we use separate queries by default
+    assert list(default.separate_includes) == list(selected.separate_includes)
+
+
+def test_include_strategy_per_path(backend):
+
+    prepare_data(backend)
+
+    actors = backend.filter(
+        Actor,
+        {},
+        include=(("movies", "cast"), "best_movies"),
+        include_strategy={"movies": "select", "best_movies": "join"},
+    )
+
+    al_pacino = [actor for actor in actors if actor.name == "Al Pacino"][0]
+    assert list(actors.separate_includes) == ["movies"]
+    assert len(al_pacino.best_movies) == 2
+    assert {movie.title for movie in al_pacino.movies} == {"The Godfather", "Scarface"}
+
+    # a single to-many include is joined by default
+    actors = backend.filter(Actor, {}, include=("movies",))
+    assert not actors.separate_includes
+
+
+def test_include_strategy_raw(backend):
+
+    prepare_data(backend)
+
+    actors = backend.filter(
+        Actor,
+        {"name": "Al Pacino"},
+        include=(("movies", "title"), "best_movies"),
+        include_strategy="select",
+        raw=True,
+    )
+
+    assert isinstance(actors[0]["movies"], list)
+    assert {movie["title"] for movie in actors[0]["movies"]} == {
+        "The Godfather",
+        "Scarface",
+    }
+
+
+def test_include_plans_are_cached(backend):
+
+    prepare_data(backend)
+
+    include = (("movies", ("director",), "title"), ("movies", "year"))
+
+    actors = backend.filter(Actor, {}, include=include)
+    other_actors = backend.filter(Actor, {"name": "Al Pacino"}, include=list(include))
+    assert len(actors) and len(other_actors)
+
+    plan = actors.get_include_plan()
+    assert other_actors.get_include_plan() is plan
+    other_plans = [
+        backend.filter(Actor, {}, include=("movies",)).get_include_plan(),
+        backend.filter(Actor, {}, include=include, only=("name",)).get_include_plan(),
+    ]
+    assert all(other_plan is not plan for other_plan in other_plans)
+
+    al_pacino = other_actors[0]
+    assert {movie.title for movie in al_pacino.movies} == {"The Godfather", "Scarface"}
+
+    # re-initializing the schema invalidates all plans
+    backend.init_schema()
+    assert backend.filter(Actor, {}, include=include).get_include_plan() is not plan
+
+
+def test_folding_of_joined_rows(backend):
+
+    prepare_data(backend)
+
+    actors = backend.filter(
+        Actor,
+        {},
+        include=(("movies", ("director", "name"), "title"),),
+        include_strategy="join",
+        raw=True,
+    )
+
+    actors = {actor["name"]: actor for actor in actors}
+    assert len(actors) == 4
+
+    assert actors["Andreas Dewes"]["movies"] == []
+    movies = {movie["title"]: movie for movie in actors["Al Pacino"]["movies"]}
+    assert len(actors["Al Pacino"]["movies"]) == 2
+    assert movies["Scarface"]["director"]["name"] == "Brian de Palma"
+    assert movies["Scarface"]["director"]["__collection__"] == "director"
+
+    star_wars_v = actors["Harrison Ford"]["movies"][0]
+    assert star_wars_v["director"] is None
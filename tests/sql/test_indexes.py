@@ -0,0 +1,113 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+from collections import OrderedDict
+
+import pytest
+from sqlalchemy import create_engine
+
+from blitzdb.backends.advisor import IndexAdvisor
+from blitzdb.fields import CharField, IntegerField
+
+from ..conftest import _sql_backend
+from ..helpers.movie_data import Actor, Director, Document, Food, Movie
+
+
+class Paperback(Document):
+
+    title = CharField(indexed=True)
+    year = IntegerField()
+    genre = CharField()
+
+    class Meta(Document.Meta):
+
+        autoregister = False
+        indexes = [{"fields": OrderedDict([("genre", 1), ("year", -1)])}]
+
+
+def get_index_keys(backend, cls):
+    return [index["keys"] for index in backend.get_index_info(cls)]
+
+
+def test_indexes_of_meta_attributes(backend):
+
+    backend.register(Paperback)
+    backend.init_schema()
+    backend.create_schema()
+
+    assert ("genre", "year") in get_index_keys(backend, Paperback)
+    assert ("title",) in get_index_keys(backend, Paperback)
+    assert ("year",) not in get_index_keys(backend, Paperback)
+
+
+def test_create_index(backend):
+
+    backend.save(Movie({"title": "Movie 1", "year": 2001}))
+    backend.commit()
+
+    index = backend.create_index(Movie, fields=OrderedDict([("year", 1), ("title", 1)]))
+    assert index.name == "ix_movie_year_title"
+    assert ("year", "title") in get_index_keys(backend, Movie)
+
+    # creating an existing index does nothing
+    backend.create_index(Movie, fields=OrderedDict([("year", 1), ("title", 1)]))
+    assert get_index_keys(backend, Movie).count(("year", "title")) == 1
+
+    explanation = backend.explain(Movie, {"year": 2001, "title": "Movie 1"})
+    if backend.engine.dialect.name == "sqlite":
+        assert "ix_movie_year_title" in explanation["indexes"]
+
+    with pytest.raises(AttributeError):
+        backend.create_index(Movie, fields={"tagline": 1})
+    with pytest.raises(AttributeError):
+        backend.create_index(Movie)
+
+
+def test_create_index_with_shared_schema(request):
+
+    backend, other_backend = [
+        _sql_backend(request, create_engine("sqlite://"), share_schema=True)
+        for i in range(2)
+    ]
+    for shared_backend in (backend, other_backend):
+        for cls in (Actor, Director, Movie, Food):
+            shared_backend.register(cls)
+        shared_backend.init_schema()
+        shared_backend.create_schema()
+    assert other_backend.get_table(Movie) is backend.get_table(Movie)
+
+    fields = OrderedDict([("year", 1), ("title", 1)])
+    backend.create_index(Movie, fields=fields)
+    assert ("year", "title") in get_index_keys(backend, Movie)
+    assert ("year", "title") not in get_index_keys(other_backend, Movie)
+
+    # the index gets created in the other database as well
+    with other_backend.record_workload() as workload:
+        list(other_backend.filter(Movie, {"year": 2001}).sort("title", 1))
+    advisor = IndexAdvisor(other_backend, workload)
+    assert [recommendation["keys"] for recommendation in advisor.apply()] == [
+        ("year", "title")
+    ]
+    assert ("year", "title") in get_index_keys(other_backend, Movie)
+
+    # the shared table is not changed
+    assert ("year", "title") not in [
+        tuple(column.name for column in index.columns)
+        for index in backend.get_table(Movie).indexes
+    ]
+
+
+def test_advisor_records_queries_over_non_indexed_fields(backend):
+
+    with backend.record_workload() as workload:
+        with pytest.raises(AttributeError):
+            backend.filter(Movie, {"tagline": "foo"})
+
+    advisor = IndexAdvisor(backend, workload)
+    recommendations = advisor.recommend()
+    assert [recommendation["keys"] for recommendation in recommendations] == [
+        ("tagline",)
+    ]
+    assert recommendations[0]["errors"] == 1
+
+    # the key needs a field with `indexed=True`
+    assert advisor.apply() == []
@@ -0,0 +1,113 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from ..helpers.movie_data import Director, Movie
+
+
+def prepare_data(backend, n=10):
+    for i in range(n):
+        director = Director({"name": "Director %d" % i})
+        movie = Movie(
+            {
+                "title": "Movie %d" % i,
+                "year": 2000 + i,
+                "director": director,
+                "tagline": "Tagline %d" % i,
+            }
+        )
+        backend.save(director)
+        backend.save(movie)
+    backend.commit()
+
+
+def test_missing_columns_are_loaded_in_batches(backend, statements):
+
+    prepare_data(backend)
+
+    movies = list(backend.filter(Movie, {}, include=("title",)))
+    assert all(movie.lazy for movie in movies)
+
+    del statements[:]
+    years = [movie.year for movie in movies]
+
+    assert sorted(years) == [2000 + i for i in range(10)]
+    assert len(statements) == 1
+    assert "data" not in str(statements[0])
+
+    # the documents are still only partially loaded
+    assert all(movie.lazy for movie in movies)
+    assert all("tagline" not in movie.lazy_attributes for movie in movies)
+
+
+def test_attributes_from_data(backend, statements):
+
+    prepare_data(backend)
+
+    movies = list(backend.filter(Movie, {}, include=("title",)))
+
+    del statements[:]
+    for movie in movies:
+        assert movie["tagline"] == movie.title.replace("Movie", "Tagline")
+
+    assert len(statements) == 1
+
+
+def test_foreign_keys(backend, statements):
+
+    prepare_data(backend)
+
+    movies = list(backend.filter(Movie, {}, include=("title",)))
+
+    del statements[:]
+    directors = [movie.director for movie in movies]
+
+    assert len(statements) == 1
+    assert all(director.lazy for director in directors)
+    assert {director.name for director in directors} == {
+        "Director %d" % i for i in range(10)
+    }
+    assert len(statements) == 2
+
+
+def test_missing_attributes(backend):
+
+    prepare_data(backend, n=2)
+
+    movie = backend.filter(Movie, {}, include=("title",))[0]
+
+    with pytest.raises(AttributeError):
+        movie.rating
+    with pytest.raises(KeyError):
+        movie["rating"]
+
+    assert movie.lazy
+
+
+def test_explicit_revert_loads_everything(backend):
+
+    prepare_data(backend, n=2)
+
+    movie = backend.filter(Movie, {}, include=("title",))[0]
+    assert movie.year
+
+    movie.revert()
+    assert not movie.lazy
+    assert movie.attributes["tagline"] == movie.title.replace("Movie", "Tagline")
+
+
+def test_loaded_documents_are_no_longer_pending(backend, statements):
+
+    prepare_data(backend)
+    backend.lazy_batch_size = 4
+
+    movies = backend.filter(Movie, {}, include=("title",))
+    del statements[:]
+    for movie in movies:
+        assert movie.year == int(movie.title.split()[1]) + 2000
+        assert movie["tagline"] == movie.title.replace("Movie", "Tagline")
+
+    # (one query for the documents, and three batches for each attribute)
+    assert len(statements) == 7
+    assert not movies.loader._pending[(Movie, "pk", ("year",))]
+    assert not movies.loader._pending[(Movie, "pk", ("tagline",))]
@@ -0,0 +1,93 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import gc
+
+from sqlalchemy import create_engine
+
+from blitzdb.backends.sql import Backend
+from blitzdb.backends.sql.backend import schemas
+
+from ..helpers.movie_data import Actor, Director, Food, Movie
+
+
+def new_backend(engine, **kwargs):
+    kwargs.setdefault("share_schema", True)
+    backend = Backend(engine=engine, **kwargs)
+    for cls in (Actor, Director, Movie, Food):
+        backend.register(cls)
+    backend.init_schema()
+    return backend
+
+
+def test_schema_is_shared(backend):
+
+    first_backend = new_backend(backend.engine)
+    other_backend = new_backend(backend.engine)
+
+    assert other_backend.metadata is first_backend.metadata
+    movie_table = first_backend.get_collection_table("movie")
+    assert other_backend.get_collection_table("movie") is movie_table
+    assert other_backend._include_plans is not first_backend._include_plans
+
+    relationship_classes = set(first_backend._relationship_classes)
+    assert set(other_backend._relationship_classes) == relationship_classes
+    for cls in relationship_classes:
+        collection = first_backend.get_collection_for_cls(cls)
+        assert other_backend.get_collection_for_cls(cls) == collection
+
+    actor = Actor({"name": "Al Pacino", "movies": [Movie({"title": "Scarface"})]})
+    other_backend.save(actor)
+    other_backend.commit()
+
+    al_pacino = first_backend.get(Actor, {"name": "Al Pacino"}, include=("movies",))
+    assert [movie.title for movie in al_pacino.movies] == ["Scarface"]
+
+
+def test_shared_schemas_stay_independent(backend):
+
+    first_backend = new_backend(backend.engine)
+    other_engine = create_engine("sqlite://")
+    other_backend = new_backend(other_engine)
+    other_backend.create_schema()
+
+    assert other_backend.metadata is first_backend.metadata
+    assert other_backend._table_columns is not first_backend._table_columns
+    assert (
+        other_backend._table_columns["movie"]
+        is not first_backend._table_columns["movie"]
+    )
+
+    first_backend._table_columns["movie"]["rating"] = {"column": "rating"}
+    first_backend._index_fields["movie"]["rating"] = {"column": "rating"}
+    first_backend.create_index(Movie, fields={"year": 1, "title": 1})
+
+    assert "rating" not in other_backend._table_columns["movie"]
+    assert "rating" not in other_backend._index_fields["movie"]
+    assert len(other_backend.get_collection_table("movie").indexes) == len(
+        first_backend.get_collection_table("movie").indexes
+    )
+    for some_backend, created in ((first_backend, True), (other_backend, False)):
+        names = [index["name"] for index in some_backend.get_index_info(Movie)]
+        assert ("ix_movie_year_title" in names) == created
+
+    # a new backend gets the schema as it was built
+    assert "rating" not in new_backend(backend.engine)._table_columns["movie"]
+
+
+def test_schema_is_not_shared(backend):
+
+    metadata = new_backend(backend.engine).metadata
+    assert new_backend(backend.engine, table_postfix="_v2").metadata is not metadata
+    assert new_backend(backend.engine, share_schema=False).metadata is not metadata
+    assert backend.metadata is not metadata
+
+    Backend.clear_schema_cache()
+    assert new_backend(backend.engine).metadata is not metadata
+
+
+def test_unused_schemas_are_dropped(backend):
+
+    Backend.clear_schema_cache()
+    new_backend(backend.engine)
+    gc.collect()
+    assert len(schemas) == 0
@@ -0,0 +1,116 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+
+from ..conftest import _sql_backend
+from ..helpers.movie_data import Actor, Director, Food, Movie
+
+
+@pytest.fixture
+def file_backend(request, temporary_path):
+    engine = create_engine("sqlite:///%s" % os.path.join(temporary_path, "test.db"))
+    backend = _sql_backend(request, engine)
+
+    for cls in (Actor, Director, Movie, Food):
+        backend.register(cls)
+
+    backend.init_schema()
+    backend.create_schema()
+
+    return backend
+
+
+def test_transactions_are_kept_per_thread(file_backend):
+
+    backend = file_backend
+    started = threading.Event()
+    done = threading.Event()
+    results = {}
+
+    def writer():
+        with backend.transaction():
+            backend.save(Movie({"title": "The Godfather"}))
+            started.set()
+            done.wait(5)
+
+    def reader():
+        started.wait(5)
+        results["transaction"] = backend.current_transaction
+        results["movies"] = len(backend.filter(Movie, {}))
+        done.set()
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # the reader neither sees nor commits the transaction of the writer
+    assert results == {"transaction": None, "movies": 0}
+    assert len(backend.filter(Movie, {})) == 1
+    assert backend.current_transaction is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires Python 3.7+")
+def test_transactions_are_kept_per_task(file_backend):
+
+    backend = file_backend
+    results = {}
+
+    async def writer(started, done):
+        backend.begin()
+        backend.save(Movie({"title": "The Godfather"}))
+        results["writer"] = backend.connection
+        started.set()
+        await done.wait()
+        backend.commit()
+
+    async def reader(started, done):
+        await started.wait()
+        results["transaction"] = backend.current_transaction
+        with backend.transaction():
+            results["movies"] = len(backend.filter(Movie, {}))
+            results["reader"] = backend.connection
+        done.set()
+
+    async def main():
+        # the parent task uses the backend before it creates the other tasks
+        with backend.transaction():
+            assert len(backend.filter(Movie, {})) == 0
+            parent = backend.connection
+            started = asyncio.Event()
+            done = asyncio.Event()
+            await asyncio.gather(writer(started, done), reader(started, done))
+            assert backend.connection is parent
+            assert backend.current_transaction is not None
+        return parent
+
+    loop = asyncio.new_event_loop()
+    try:
+        parent = loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+    # the reader neither sees nor commits the transaction of the writer
+    assert results["transaction"] is None
+    assert results["movies"] == 0
+    connections = set(id(results[task]) for task in ("writer", "reader"))
+    assert len(connections | set([id(parent)])) == 3
+    assert len(backend.filter(Movie, {})) == 1
+
+
+def test_replace_engine_resets_connection_state(file_backend):
+
+    backend = file_backend
+    backend.begin()
+    assert backend._conn is not None
+
+    backend.replace_engine(backend.engine)
+    assert backend._conn is None
+    assert backend.current_transaction is None
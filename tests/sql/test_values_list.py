@@ -0,0 +1,94 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from ..helpers.movie_data import Director, Movie
+
+
+def prepare_data(backend):
+    director = Director({"name": "Stanley Kubrick"})
+    backend.save(director)
+    for i in range(5):
+        backend.save(
+            Movie({"title": "Movie %d" % i, "year": 1960 + i, "director": director})
+        )
+    backend.save(Movie({"title": "Untitled"}))
+    backend.commit()
+    return director
+
+
+def test_values_list(backend, statements):
+
+    director = prepare_data(backend)
+
+    del statements[:]
+    movies = backend.filter(Movie, {"director": director}).sort([("year", 1)])
+    assert movies.values_list("title", "year") == [
+        ("Movie %d" % i, 1960 + i) for i in range(5)
+    ]
+    assert len(statements) == 1
+    assert "__data__" not in statements[0]
+
+    values = dict(backend.filter(Movie, {}).values_list("title", "director"))
+    assert values["Untitled"] is None
+    assert values["Movie 0"] == director.pk
+
+    # relational queries are supported as well
+    movies = backend.filter(Movie, {"director.name": "Stanley Kubrick"})
+    assert sorted(movies.values_list("title")) == [
+        ("Movie %d" % i,) for i in range(5)
+    ]
+    assert len(movies[1:3].values_list("title")) == 2
+
+
+def test_values_list_with_invalid_keys(backend):
+
+    prepare_data(backend)
+
+    with pytest.raises(AttributeError):
+        backend.filter(Movie, {}).values_list()
+
+    with pytest.raises(AttributeError):
+        backend.filter(Movie, {}).values_list("cast")
+
+
+def test_columns(backend):
+
+    prepare_data(backend)
+
+    movies = backend.filter(Movie, {"year": {"$gte": 1963}}).sort([("year", 1)])
+    columns = movies.columns("year", "title")
+    assert list(columns) == ["year", "title"]
+    assert columns["year"] == [1963, 1964]
+    assert columns["title"] == ["Movie 3", "Movie 4"]
+
+    columns = backend.filter(Movie, {"year": 1900}).columns("year")
+    assert columns == {"year": []}
+
+
+def test_columns_as_arrays(backend):
+
+    numpy = pytest.importorskip("numpy")
+    prepare_data(backend)
+
+    columns = backend.filter(Movie, {"year": {"$ne": None}}).columns(
+        "year", numpy=True
+    )
+    assert isinstance(columns["year"], numpy.ndarray)
+    assert columns["year"].sum() == sum(1960 + i for i in range(5))
+
+
+def test_aggregates(backend, statements):
+
+    director = prepare_data(backend)
+
+    del statements[:]
+    movies = backend.filter(Movie, {"director.name": "Stanley Kubrick"})
+    assert movies.group_by("director").aggregate(
+        movies="count", last_year=("max", "year")
+    ) == [{"director": director.pk, "movies": 5, "last_year": 1964}]
+    assert len(statements) == 1
+    assert "GROUP BY" in statements[0]
+
+    with pytest.raises(AttributeError):
+        movies.aggregate(movies=("count", "cast"))
@@ -0,0 +1,153 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+from collections import OrderedDict
+
+from blitzdb.backends.advisor import IndexAdvisor, Workload, get_query_keys, \
+    get_sort_keys
+from blitzdb.backends.file import Backend as FileBackend
+
+from .helpers.movie_data import Movie
+
+
+def prepare_data(backend):
+    for i in range(10):
+        backend.save(Movie({"pk": str(i), "title": "Movie %d" % i, "year": 2000 + i}))
+    backend.commit()
+
+
+def run_queries(backend):
+    for i in range(3):
+        movies = backend.filter(Movie, {"year": 2001 + i}).sort("title", 1)
+        assert len(movies) == 1
+        assert movies[0].year == 2001 + i
+
+
+def test_query_keys():
+
+    assert get_query_keys(
+        {"year": {"$gt": 2000}, "$or": [{"title": "foo"}, {"$not": {"pk": 1}}]}
+    ) == set(["year", "title", "pk"])
+    assert get_sort_keys([("year", -1), ("title", 1)]) == ["year", "title"]
+    assert get_sort_keys([(("year", 1),), ([("title", 1)],)]) == ["year", "title"]
+
+
+def test_recommend_and_apply(backend):
+
+    prepare_data(backend)
+
+    with backend.record_workload() as workload:
+        run_queries(backend)
+
+    assert not backend.instrumentation.listeners
+    shapes = [shape for shape in workload.shapes.values() if shape.keys]
+    assert shapes
+    assert all(shape.collection == "movie" for shape in shapes)
+    assert all(shape.count >= 3 for shape in shapes)
+    assert "movie" in workload.collections
+
+    advisor = IndexAdvisor(backend, workload)
+    recommendations = advisor.recommend()
+    assert recommendations
+    for recommendation in recommendations:
+        assert recommendation["collection"] == "movie"
+        assert set(recommendation["keys"]) <= set(["year", "title"])
+        assert recommendation["count"] >= 3
+        assert recommendation["reason"]
+
+    assert advisor.apply() == recommendations
+    assert advisor.recommend() == []
+
+    # the queries use the new indexes
+    run_queries(backend)
+
+
+def test_recommend_min_count(backend):
+
+    prepare_data(backend)
+
+    with backend.record_workload() as workload:
+        run_queries(backend)
+
+    assert IndexAdvisor(backend, workload, min_count=100).recommend() == []
+
+
+def test_unused_indexes(backend):
+
+    prepare_data(backend)
+    backend.create_index(Movie, fields={"title": 1})
+
+    workload = Workload()
+    with backend.record_workload(workload):
+        list(backend.filter(Movie, {"year": 2001}))
+
+    unused = IndexAdvisor(backend, workload).unused_indexes()
+    assert ("title",) in [index["keys"] for index in unused]
+    for index in unused:
+        assert index["collection"] == "movie"
+        assert not index["unique"]
+        assert index["used_keys"] == ()
+        assert "year" not in index["keys"][:1]
+
+    with backend.record_workload(workload):
+        list(backend.filter(Movie, {"title": "Movie 1"}))
+
+    unused = IndexAdvisor(backend, workload).unused_indexes()
+    assert ("title",) not in [index["keys"] for index in unused]
+
+
+def test_ephemeral_indexes_get_promoted(tmpdir):
+
+    backend = FileBackend(str(tmpdir), autodiscover_classes=False)
+    backend.register(Movie)
+    prepare_data(backend)
+
+    with backend.record_workload() as workload:
+        run_queries(backend)
+
+    indexes = {index["name"]: index for index in backend.get_index_info(Movie)}
+    assert indexes["year"]["ephemeral"]
+    assert indexes["title"]["ephemeral"]
+    assert indexes["pk"]["unique"]
+
+    advisor = IndexAdvisor(backend, workload)
+    recommendations = advisor.recommend()
+    assert sorted(recommendation["keys"] for recommendation in recommendations) == [
+        ("title",),
+        ("year",),
+    ]
+    assert all(recommendation["full_scans"] for recommendation in recommendations)
+    advisor.apply()
+
+    indexes = {index["name"]: index for index in backend.get_index_info(Movie)}
+    assert not indexes["year"]["ephemeral"]
+    assert not indexes["title"]["ephemeral"]
+    run_queries(backend)
+
+    # the indexes are persistent
+    backend = FileBackend(str(tmpdir), autodiscover_classes=False)
+    backend.register(Movie)
+    assert set(["year", "title"]) <= set(backend.get_collection_indexes("movie"))
+    run_queries(backend)
+
+
+def test_unused_composite_indexes(backend):
+
+    if not backend.composite_indexes:
+        return
+
+    prepare_data(backend)
+    backend.create_index(Movie, fields=OrderedDict([("title", 1), ("year", 1)]))
+
+    def get_unused(query):
+        with backend.record_workload() as workload:
+            list(backend.filter(Movie, query))
+        return {
+            index["keys"]: index["used_keys"]
+            for index in IndexAdvisor(backend, workload).unused_indexes()
+        }
+
+    # only the first key of the index is used
+    assert get_unused({"title": "Movie 1"})[("title", "year")] == ("title",)
+    # an index cannot be used from its second key on
+    assert get_unused({"year": 2001})[("title", "year")] == ()
+    assert ("title", "year") not in get_unused({"year": 2001, "title": "Movie 1"})
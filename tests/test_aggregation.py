@@ -0,0 +1,107 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from .helpers.movie_data import Movie
+
+
+def prepare_data(backend):
+    backend.begin()
+    backend.filter(Movie, {}).delete()
+    for title, year in [
+        ("The Godfather", 1972),
+        ("Solaris", 1972),
+        ("Scarface", 1983),
+        ("Untitled", None),
+    ]:
+        backend.save(Movie({"title": title, "year": year}))
+    backend.commit()
+
+
+def test_aggregate(backend):
+
+    prepare_data(backend)
+
+    movies = backend.filter(Movie, {})
+    assert movies.aggregate(
+        movies="count",
+        years=("count", "year"),
+        first_year=("min", "year"),
+        last_year=("max", "year"),
+        total=("sum", "year"),
+        average=("avg", "year"),
+    ) == {
+        "movies": 4,
+        "years": 3,
+        "first_year": 1972,
+        "last_year": 1983,
+        "total": 1972 * 2 + 1983,
+        "average": pytest.approx((1972 * 2 + 1983) / 3.0),
+    }
+
+    movies = backend.filter(Movie, {"year": 1983})
+    assert movies.aggregate(movies="count", first_year=("min", "year")) == {
+        "movies": 1,
+        "first_year": 1983,
+    }
+
+
+def test_aggregate_empty_query_set(backend):
+
+    prepare_data(backend)
+
+    movies = backend.filter(Movie, {"year": 1900})
+    assert movies.aggregate(movies="count", last_year=("max", "year")) == {
+        "movies": 0,
+        "last_year": None,
+    }
+
+
+def test_group_by(backend):
+
+    prepare_data(backend)
+
+    movies = backend.filter(Movie, {})
+    assert movies.group_by("year").aggregate(movies="count") == [
+        {"year": None, "movies": 1},
+        {"year": 1972, "movies": 2},
+        {"year": 1983, "movies": 1},
+    ]
+
+    movies = backend.filter(Movie, {"year": {"$ne": None}})
+    assert movies.group_by("year").aggregate(
+        movies="count", first_title=("min", "title")
+    ) == [
+        {"year": 1972, "movies": 2, "first_title": "Solaris"},
+        {"year": 1983, "movies": 1, "first_title": "Scarface"},
+    ]
+
+
+def test_invalid_aggregations(backend):
+
+    prepare_data(backend)
+
+    movies = backend.filter(Movie, {})
+    with pytest.raises(AttributeError):
+        movies.aggregate()
+    with pytest.raises(AttributeError):
+        movies.aggregate(movies=("median", "year"))
+    with pytest.raises(AttributeError):
+        movies.aggregate(total=("sum", None))
+    with pytest.raises(AttributeError):
+        movies.group_by()
+    with pytest.raises(AttributeError):
+        movies.group_by("year").aggregate(year="count")
+
+
+def test_distinct(backend):
+
+    prepare_data(backend)
+
+    assert backend.distinct(Movie, "year") == {None: 1, 1972: 2, 1983: 1}
+    assert list(backend.distinct(Movie, "year")) == [None, 1972, 1983]
+    assert backend.distinct(Movie, "year", with_counts=False) == [None, 1972, 1983]
+
+    query = {"title": {"$in": ["Solaris", "Scarface"]}}
+    assert backend.distinct(Movie, "year", query) == {1972: 1, 1983: 1}
+    assert backend.distinct(Movie, "year", {"title": "Nothing"}) == {}
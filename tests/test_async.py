@@ -0,0 +1,167 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import asyncio
+
+import pytest
+
+from blitzdb.aio import AsyncBackend
+
+from .conftest import _file_backend, _sql_backend, test_sql
+from .helpers.movie_data import Movie
+
+
+@pytest.fixture(params=["file"] + (["sql"] if test_sql else []))
+def backend(request, temporary_path):
+    if request.param == "file":
+        return _file_backend(request, temporary_path, {})
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    # the backend runs on a worker thread, so all threads need to share the
+    # connection to the in-memory database
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    return _sql_backend(request, engine, autodiscover_classes=True)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_basics(backend):
+
+    async def main():
+        async_backend = AsyncBackend(backend)
+        movies = [Movie({"title": "Movie %d" % i, "year": 1960 + i}) for i in range(5)]
+
+        async with async_backend.transaction():
+            await async_backend.save_multiple(movies)
+
+        queryset = await async_backend.filter(Movie, {})
+        assert await queryset.count() == 5
+        assert sorted([movie.title async for movie in queryset]) == [
+            movie.title for movie in movies
+        ]
+
+        movie = await async_backend.get(Movie, {"title": "Movie 2"})
+        assert movie.year == 1962
+
+        queryset = await async_backend.filter(Movie, {"year": 1962})
+        assert await queryset.values_list("title") == [("Movie 2",)]
+        assert await queryset.aggregate(movies="count") == {"movies": 1}
+        assert await async_backend.distinct(Movie, "year", with_counts=False) == [
+            1960 + i for i in range(5)
+        ]
+
+    run(main())
+
+
+def test_rollback(backend):
+
+    async def main():
+        async_backend = AsyncBackend(backend)
+        await async_backend.save(Movie({"title": "Committed"}))
+        await async_backend.commit()
+
+        with pytest.raises(ValueError):
+            async with async_backend.transaction():
+                await async_backend.save(Movie({"title": "Rolled back"}))
+                raise ValueError
+
+        queryset = await async_backend.filter(Movie, {})
+        assert [movie.title async for movie in queryset] == ["Committed"]
+
+    run(main())
+
+
+def test_transactions_are_scoped_to_tasks(backend):
+
+    events = []
+
+    async def main():
+        # (the SQL backend of the fixture shares one connection among threads)
+        async_backend = AsyncBackend(backend, max_workers=1)
+        started = asyncio.Event()
+
+        async def writer():
+            async with async_backend.transaction():
+                await async_backend.save(Movie({"title": "Apocalypse Now"}))
+                started.set()
+                # other tasks have to wait until we are done
+                await asyncio.sleep(0.05)
+                events.append("committed")
+
+        async def reader():
+            await started.wait()
+            queryset = await async_backend.filter(Movie, {"title": "Apocalypse Now"})
+            events.append(("read", await queryset.count()))
+
+        await asyncio.gather(writer(), reader())
+
+    run(main())
+    assert events == ["committed", ("read", 1)]
+
+
+def test_close(backend):
+
+    async def main():
+        async with AsyncBackend(backend) as async_backend:
+            await async_backend.save(Movie({"title": "Alien", "year": 1979}))
+            await async_backend.commit()
+        return async_backend
+
+    async_backend = run(main())
+    with pytest.raises(RuntimeError):
+        async_backend._workers[0].submit(len, [])
+    assert backend.get(Movie, {"title": "Alien"}).year == 1979
+
+
+@pytest.mark.skipif(not test_sql, reason="requires SQLAlchemy")
+def test_queries_overlap_with_transactions(request, temporary_path):
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine("sqlite:///%s/test.db" % temporary_path)
+    backend = _sql_backend(request, engine, autodiscover_classes=True)
+    events = []
+
+    async def main():
+        async with AsyncBackend(backend, max_workers=2) as async_backend:
+            started = asyncio.Event()
+            read = asyncio.Event()
+
+            async def writer():
+                async with async_backend.transaction():
+                    await async_backend.save(Movie({"title": "Apocalypse Now"}))
+                    started.set()
+                    # other tasks can query while the transaction is open
+                    await read.wait()
+                    events.append("committed")
+
+            async def reader():
+                await started.wait()
+                queryset = await async_backend.filter(Movie, {})
+                events.append(("read", await queryset.count()))
+                read.set()
+
+            await asyncio.gather(writer(), reader())
+
+            queryset = await async_backend.filter(Movie, {})
+            events.append(("read", await queryset.count()))
+
+    run(main())
+    assert events == [("read", 0), "committed", ("read", 1)]
+
+
+def test_single_worker_for_other_backends(backend):
+
+    async_backend = AsyncBackend(backend, max_workers=3)
+    assert len(async_backend._workers) == (3 if backend.thread_safe else 1)
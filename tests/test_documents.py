@@ -6,6 +6,7 @@ import pytest
 import six
 
 from blitzdb import Document
+from blitzdb.fields import CharField, FloatField
 
 
 @pytest.fixture
@@ -234,3 +235,38 @@ def test_delete():
 
     with pytest.raises(KeyError):
         doc["foo"]
+
+
+def test_declared_fields(mockup_backend):
+    class FieldDocument(Document):
+
+        foo = CharField()
+        keys = CharField()
+        amount = FloatField(key="salary.amount")
+
+    doc = FieldDocument({"foo": "faz", "keys": "value", "salary": {"amount": 1.0}})
+
+    assert doc.foo == "faz"
+    # fields do not shadow methods or become class attributes
+    assert list(doc.keys()) == list(doc.attributes.keys())
+    assert not hasattr(FieldDocument, "foo")
+    with pytest.raises(AttributeError):
+        doc.amount
+
+    doc.properties["foo"] = "bar"
+    assert doc.foo == "bar"
+    del doc.properties["foo"]
+
+    doc.foo = "baz"
+    assert doc.foo == "baz"
+    assert doc.attributes["foo"] == "baz"
+
+    del doc.foo
+    with pytest.raises(AttributeError):
+        doc.foo
+
+    lazy_doc = FieldDocument({"pk": 1}, lazy=True, backend=mockup_backend)
+    assert lazy_doc.foo == "bar"
+    assert not lazy_doc.lazy
+
+    assert copy.copy(doc).attributes == doc.attributes
@@ -0,0 +1,118 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+from blitzdb.backends.file import Backend as FileBackend
+
+from .helpers.movie_data import Movie
+
+try:
+    from blitzdb.backends.sql import Backend as SqlBackend
+except ImportError:
+    SqlBackend = None
+
+
+def prepare_data(backend):
+    for i in range(10):
+        backend.save(Movie({"pk": str(i), "title": "Movie %d" % i, "year": 2000 + i}))
+    backend.commit()
+
+
+def test_explain(backend):
+
+    prepare_data(backend)
+
+    explanation = backend.explain(Movie, {"year": {"$gte": 2005}}, sort="title")
+
+    assert explanation["collection"] == "movie"
+    assert isinstance(explanation["indexes"], list)
+    assert all(isinstance(index, str) for index in explanation["indexes"])
+    assert isinstance(explanation["warnings"], list)
+    for key in ("query", "full_scan", "estimated_count"):
+        assert key in explanation
+
+    # explaining a query does not change the results
+    assert len(backend.filter(Movie, {"year": {"$gte": 2005}})) == 5
+
+
+def test_explain_file_backend(tmpdir):
+
+    backend = FileBackend(str(tmpdir), autodiscover_classes=False)
+    prepare_data(backend)
+
+    explanation = backend.explain(Movie, {"year": {"$gte": 2005}})
+    assert explanation["indexes"] == []
+    assert explanation["conditions"] == [
+        {"key": "year", "index": None, "count": None}
+    ]
+    assert explanation["ephemeral_indexes"] == ["year"]
+    assert explanation["full_scan"]
+    assert explanation["estimated_count"] is None
+    assert explanation["documents"] == 10
+    assert "year" in explanation["warnings"][0]
+
+    # explain does not create any indexes
+    assert "year" not in backend.get_collection_indexes("movie")
+
+    backend.create_index(Movie, "year")
+    explanation = backend.explain(Movie, {"year": {"$gte": 2005}}, sort="title")
+    assert explanation["indexes"] == ["year"]
+    assert explanation["conditions"] == [
+        {"key": "year", "index": "persistent", "count": 5}
+    ]
+    assert explanation["ephemeral_indexes"] == ["title"]
+
+    backend.create_index(Movie, "title")
+    explanation = backend.explain(Movie, {"year": {"$gte": 2005}}, sort="title")
+    assert explanation["indexes"] == ["year", "title"]
+    assert not explanation["full_scan"]
+    assert explanation["estimated_count"] == 5
+    assert not explanation["warnings"]
+
+
+def test_explain_does_not_create_the_primary_index(tmpdir):
+
+    backend = FileBackend(str(tmpdir), autodiscover_classes=False)
+    backend.register(Movie)
+    prepare_data(backend)
+
+    pk_index = backend.indexes["movie"].pop("pk")
+    explanation = backend.explain(Movie, {})
+    assert "pk" not in backend.get_collection_indexes("movie")
+    assert explanation["documents"] is None
+    assert explanation["ephemeral_indexes"] == ["pk"]
+    assert explanation["estimated_count"] is None
+
+    backend.indexes["movie"]["pk"] = pk_index
+    explanation = backend.explain(Movie, {})
+    assert explanation["indexes"] == ["pk"]
+    assert explanation["estimated_count"] == 10
+
+
+def test_explain_sql_backend(backend):
+
+    if SqlBackend is None or not isinstance(backend, SqlBackend):
+        return
+
+    prepare_data(backend)
+
+    explanation = backend.explain(Movie, {"title": "Movie 1"}, include=("director",))
+    assert "FROM movie" in explanation["sql"]
+    assert list(explanation["params"].values()) == ["Movie 1"]
+    if backend.engine.dialect.name == "sqlite":
+        assert explanation["plan"]
+        assert "ix_movie_title" in explanation["indexes"]
+        assert not explanation["full_scan"]
+
+
+def test_explain_sql_backend_with_unindexed_keys(backend):
+
+    if SqlBackend is None or not isinstance(backend, SqlBackend):
+        return
+
+    explanation = backend.explain(
+        Movie, {"title": "Movie 1", "tagline": "Tagline 1"}, sort="tagline"
+    )
+    assert "movie.title" in explanation["sql"]
+    assert list(explanation["params"].values()) == ["Movie 1"]
+    assert len(explanation["warnings"]) == 2
+    assert "non-indexed field tagline" in explanation["warnings"][0]
+    assert "sort key" in explanation["warnings"][1]
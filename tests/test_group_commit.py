@@ -0,0 +1,120 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from blitzdb.backends.base import GroupCommit
+
+from .conftest import _file_backend, _mongomock_backend, test_mongo
+from .helpers.movie_data import Movie
+
+if test_mongo:
+    from .conftest import _mongodb_backend
+
+
+@pytest.fixture(params=["file"] + (["mongo"] if test_mongo else []) + ["mongomock"])
+def batching_backend(request, temporary_path):
+    if request.param == "file":
+        backend = _file_backend(
+            request, temporary_path, {"autocommit": True, "autocommit_batch_size": 3}
+        )
+    else:
+        if request.param == "mongo":
+            backend = _mongodb_backend({})
+        else:
+            backend = _mongomock_backend()
+        backend.autocommit = True
+        backend._group_commit.size = 3
+
+    commits = []
+    commit = backend.commit
+
+    def count_commits(*args, **kwargs):
+        commits.append(True)
+        return commit(*args, **kwargs)
+
+    backend.commit = count_commits
+    backend.commits = commits
+    return backend
+
+
+def test_group_commit():
+
+    group_commit = GroupCommit()
+    assert not group_commit.enabled
+    assert group_commit.add()
+
+    group_commit = GroupCommit(size=2)
+    assert not group_commit.add()
+    assert group_commit.pending
+    assert group_commit.add()
+    group_commit.reset()
+    assert not group_commit.pending
+
+    group_commit = GroupCommit(interval=0)
+    assert group_commit.add()
+    group_commit = GroupCommit(interval=60)
+    assert not group_commit.add()
+
+
+def test_batched_writes(batching_backend):
+
+    backend = batching_backend
+    movies = [Movie({"title": "Movie %d" % i, "year": 1960 + i}) for i in range(7)]
+    for movie in movies:
+        backend.save(movie)
+
+    assert len(backend.commits) == 2
+    assert backend._group_commit.operations == 1
+
+    # pending writes get committed before queries
+    assert len(backend.filter(Movie, {})) == 7
+    assert len(backend.commits) == 3
+
+    backend.delete(movies[0])
+    backend.update(movies[1], {"year": 2000})
+    backend.flush()
+    assert len(backend.commits) == 4
+    assert len(backend.filter(Movie, {})) == 6
+    assert backend.get(Movie, {"year": 2000}) == movies[1]
+
+    # rolling back discards the pending writes
+    backend.delete(movies[2])
+    backend.update(movies[3], {"year": 2001})
+    backend.rollback()
+    assert not backend._group_commit.pending
+    assert len(backend.commits) == 4
+    assert len(backend.filter(Movie, {})) == 6
+    assert len(backend.filter(Movie, {"year": 2001})) == 0
+
+    backend.delete(movies[3])
+    backend.autocommit = False
+    assert len(backend.commits) == 5
+    backend.delete(movies[4])
+    backend.rollback()
+    assert len(backend.filter(Movie, {})) == 5
+
+
+def test_update_with_pending_delete(mongodb_or_mongomock_backend):
+
+    backend = mongodb_or_mongomock_backend
+    backend.autocommit = True
+    backend._group_commit.size = 3
+    movie = Movie({"title": "The Movie", "year": 1960})
+    backend.save(movie)
+    backend.flush()
+
+    # the pending delete is committed first, so the update has nothing to
+    # write to
+    backend.delete(movie)
+    backend.update(movie, {"year": 2000})
+    assert not backend._delete_cache[backend.get_collection_for_obj(movie)]
+    backend.flush()
+    assert len(backend.filter(Movie, {})) == 0
+
+    backend.autocommit = False
+    other_movie = Movie({"title": "The Other Movie", "year": 1961})
+    backend.save(other_movie)
+    backend.commit()
+    backend.delete(other_movie)
+    with pytest.raises(Movie.DoesNotExist):
+        backend.update(other_movie, {"year": 2000})
@@ -0,0 +1,70 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+
+from blitzdb.backends.file import Backend as FileBackend
+from blitzdb.backends.instrumentation import NO_SPAN
+
+from .helpers.movie_data import Movie
+
+
+def prepare_data(backend):
+    for i in range(10):
+        backend.save(Movie({"pk": str(i), "title": "Movie %d" % i, "year": 2000 + i}))
+    backend.commit()
+
+
+def test_profile(backend):
+
+    prepare_data(backend)
+
+    with backend.profile() as profile:
+        movies = list(backend.filter(Movie, {"year": {"$gte": 2005}}))
+
+    assert len(movies) == 5
+    totals = profile.totals
+    assert totals["compile"][0] >= 1
+    assert totals["construct"][0] >= 5
+    assert all(duration >= 0 for count, duration in totals.values())
+
+    query_spans = [span for span in profile.spans if "query" in span.info]
+    assert query_spans
+    assert all(span.collection == "movie" for span in query_spans)
+
+    if isinstance(backend, FileBackend):
+        # the ephemeral index on `year` reads all documents (with a nested query)
+        assert profile.counters["ephemeral_indexes"] == 1
+        assert profile.counters["documents"] == 15
+        assert totals["read"][0] == 15
+        query_span = [span for span in profile.spans if span.name == "query"][-1]
+        assert query_span.info["query"] == {"year": {"$gte": 2005}}
+        assert query_span.info["plan"] == {
+            "indexes": ["year"],
+            "ephemeral_indexes": ["year"],
+            "full_scan": True,
+        }
+
+    # without listeners, nothing gets timed
+    assert not backend.instrumentation.listeners
+    assert backend.instrumentation.span("construct", "movie") is NO_SPAN
+
+
+def test_slow_query_log(backend, caplog):
+
+    prepare_data(backend)
+
+    backend.instrumentation.slow_query_time = 0
+    with caplog.at_level(logging.WARNING, logger="blitzdb.backends.instrumentation"):
+        assert len(list(backend.filter(Movie, {"year": 2001}))) == 1
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(
+        message.startswith("Slow query") and "movie" in message for message in messages
+    )
+
+    caplog.clear()
+    backend.instrumentation.slow_query_time = 60
+    with caplog.at_level(logging.WARNING, logger="blitzdb.backends.instrumentation"):
+        list(backend.filter(Movie, {"year": 2001}))
+
+    assert not caplog.records
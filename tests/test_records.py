@@ -0,0 +1,57 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from blitzdb import Document, Record
+
+from .helpers.movie_data import Director, Movie
+
+
+class ReportedDocument(Document):
+    def after_load(self):
+        self.loaded = True
+
+
+def test_as_records(backend):
+
+    director = Director({"pk": "1", "name": "Francis Ford Coppola"})
+    movie = Movie(
+        {"pk": "2", "title": "The Godfather", "year": 1972, "director": director}
+    )
+    backend.save(director)
+    backend.save(movie)
+    backend.commit()
+
+    records = backend.filter(Movie, {"year": 1972}).as_records()
+    assert len(records) == 1
+
+    record = records[0]
+    assert isinstance(record, Record)
+    assert record.cls is Movie
+    assert record.pk == "2"
+    assert record.title == "The Godfather"
+    assert record["year"] == 1972
+    assert record.get("budget") is None
+    assert "title" in record
+    assert isinstance(record.director, Director)
+    assert record.director.pk == "1"
+
+    with pytest.raises(AttributeError):
+        record.budget
+
+    with pytest.raises(AttributeError):
+        record.title = "The Godfather: Part II"
+
+    assert record == backend.filter(Movie, {"year": 1972}).as_records()[0]
+
+
+def test_as_records_without_hooks(backend):
+
+    backend.save(ReportedDocument({"pk": "1", "value": 42}))
+    backend.commit()
+
+    assert backend.get(ReportedDocument, {"pk": "1"}).loaded
+
+    record = backend.filter(ReportedDocument, {}).as_records()[0]
+    assert record.value == 42
+    assert "loaded" not in record
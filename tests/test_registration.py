@@ -0,0 +1,82 @@
+from __future__ import absolute_import, print_function, unicode_literals
+
+import pytest
+
+from blitzdb import Document, FileBackend
+
+
+class Book(Document):
+    class Meta(Document.Meta):
+        dbref_includes = ["title", "author.name"]
+
+
+class Novel(Book):
+    pass
+
+
+class Magazine(Document):
+    class Meta(Document.Meta):
+        primary_key = "issn"
+
+
+@pytest.fixture
+def backend(tmpdir):
+    return FileBackend(str(tmpdir), autodiscover_classes=False)
+
+
+def test_lookups(backend):
+
+    backend.register(Book)
+
+    assert backend.get_cls_for_collection("book") is Book
+    assert backend.get_collection_for_cls_name("Book") == "book"
+    assert backend.get_class_meta(Book) == {
+        "collection": "book",
+        "pk_name": "pk",
+        "dbref_includes": [("title", ["title"]), ("author_name", ["author", "name"])],
+    }
+
+    # a subclass replaces its parent class in the collection
+    backend.register(Novel, {"collection": "book"})
+    assert backend.get_cls_for_collection("book") is Novel
+    assert backend.get_collection_for_cls_name("Novel") == "book"
+    with pytest.raises(AttributeError):
+        backend.get_collection_for_cls_name("Book")
+
+    backend.unregister(Novel)
+    with pytest.raises(AttributeError):
+        backend.get_cls_for_collection("book")
+    with pytest.raises(AttributeError):
+        backend.get_collection_for_cls_name("Novel")
+
+
+def test_custom_primary_key(backend):
+
+    backend.register(Magazine)
+    assert backend.get_class_meta(Magazine)["pk_name"] == "issn"
+
+    magazine = Magazine({"issn": "0028-792X", "title": "The New Yorker"})
+    serialized = backend.serialize({"magazine": magazine}, autosave=False)
+    assert serialized["magazine"]["pk"] == "0028-792X"
+    assert serialized["magazine"]["__ref__"] == "magazine:0028-792X"
+
+
+def test_changed_collection(backend):
+
+    backend.register(Book)
+    backend.register(Book, {"collection": "books"})
+
+    assert backend.get_cls_for_collection("books") is Book
+    assert backend.get_class_meta(Book)["collection"] == "books"
+    with pytest.raises(AttributeError):
+        backend.get_cls_for_collection("book")
+
+
+def test_meta_attributes(backend):
+
+    attributes = backend.get_meta_attributes(Book)
+    assert attributes["dbref_includes"] == ["title", "author.name"]
+
+    # the returned attributes are a copy of the cached ones
+    attributes["collection"] = "other"
+    assert "collection" not in backend.get_meta_attributes(Book)
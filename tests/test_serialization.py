@@ -14,3 +14,70 @@ def test_basic_storage(backend):
     recovered_movie = backend.get(Movie, {})
 
     assert "foo.bar.baz" in recovered_movie and recovered_movie["foo.bar.baz"] == "bar"
+
+
+class PathEncoder(object):
+
+    """An encoder that looks at the paths of the values (so serialize cannot
+    take its shortcut for simple encoders), without changing anything."""
+
+    def __init__(self):
+        self.paths = []
+
+    def encode(self, obj, path):
+        self.paths.append(tuple(path))
+        return obj
+
+
+def test_simple_encoders(backend):
+
+    movie = Movie({"pk": "1", "title": "The Godfather", "year": 1972})
+    lazy_movie = Movie({"pk": "2", "title": "Apocalypse Now", "year": 1979}, lazy=True)
+    attributes = {
+        "name": "Marlon Brando",
+        "birth_year": 1924,
+        "gross_income_m": 1.453,
+        "is_funny": False,
+        "spouse": None,
+        "born.in": "Omaha",
+        "salary": {"amount": 1.5e6, "currency": "USD", "bonus": 1j + 2},
+        "movies": [movie, lazy_movie, ("tuple", 1)],
+        1: "one",
+    }
+
+    encoder = PathEncoder()
+    expected = backend.serialize(attributes, encoders=[encoder], autosave=False)
+    assert ("movies", 2, 1) in encoder.paths
+
+    assert backend.serialize(attributes, autosave=False) == expected
+    assert expected["movies"][0]["title"] == "The Godfather"
+    assert "__ref__" not in expected["movies"][1]
+    assert expected["movies"][1]["year"] == 1979
+    assert lazy_movie.lazy
+
+
+def test_deserialize_references(backend):
+
+    movie = Movie({"pk": "1", "title": "The Godfather", "year": 1972})
+    serialized = backend.serialize(
+        {"movies": [movie], "favorite": movie, "ratings": {"imdb": 9.2}},
+        autosave=False,
+    )
+    reference = dict(serialized["favorite"])
+
+    deserialized = backend.deserialize(serialized)
+
+    for obj in (deserialized["movies"][0], deserialized["favorite"]):
+        assert isinstance(obj, Movie)
+        assert obj.lazy
+        assert obj.lazy_attributes["pk"] == "1"
+        assert obj.lazy_attributes["title"] == "The Godfather"
+
+    assert deserialized["ratings"] == {"imdb": 9.2}
+    assert serialized["favorite"] == reference
+
+    # changing the instances does not change the data they were created from
+    deserialized["favorite"].lazy_attributes["title"] = "The Godfather: Part II"
+    assert serialized["favorite"] == reference
+
+    assert backend.deserialize(serialized, create_instance=False)["favorite"].lazy